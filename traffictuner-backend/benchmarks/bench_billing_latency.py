@@ -0,0 +1,90 @@
+"""
+Billing Endpoint Latency Benchmark
+Measures GET /api/billing/subscription against a fake Stripe API with
+added latency, next to the cost of the synchronous Stripe call the
+endpoint avoids by reading the local Stripe object cache.
+
+Usage: python benchmarks/bench_billing_latency.py [--latency 0.3] [--requests 200]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fake_stripe import start_fake_stripe, FakeStripeHandler
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def summarize(samples):
+    return {
+        'requests': len(samples),
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 2),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2)
+    }
+
+def measure(count, func):
+    samples = []
+    for _ in range(count):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def run(latency, requests):
+    server, url = start_fake_stripe(latency=latency)
+
+    # Both must be set before the app is imported
+    os.environ['STRIPE_API_BASE'] = url
+    os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}"
+
+    import stripe
+    from src.main import app
+    from src.models.user import db, User
+    from src.models.subscription import Subscription
+
+    app.config['TESTING'] = True
+    app.security.RATE_LIMITS = {group: {'free': '1000000/second'} for group in app.security.RATE_LIMITS}
+    app.security.IP_RATE_LIMITS = {group: '1000000/second' for group in app.security.IP_RATE_LIMITS}
+
+    client = app.test_client()
+    response = client.post('/api/auth/register', json={
+        'name': 'Bench', 'email': 'bench@example.com', 'password': 'password123'
+    })
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    with app.app_context():
+        user = User.query.filter_by(email='bench@example.com').first()
+        db.session.add(Subscription(user_id=user.id, plan_name='pro', stripe_subscription_id='sub_bench'))
+        db.session.commit()
+
+    results = {}
+    results['stripe_retrieve'] = summarize(measure(min(requests, 20), lambda: stripe.Subscription.retrieve('sub_bench')))
+
+    # The first request finds no local copy and schedules a background fetch
+    results['endpoint_first'] = summarize(measure(1, lambda: client.get('/api/billing/subscription', headers=headers)))
+    time.sleep(latency + 0.5)
+
+    calls = FakeStripeHandler.calls
+    response = client.get('/api/billing/subscription', headers=headers)
+    assert response.get_json()['stripe_subscription'], response.get_json()
+    results['endpoint_cached'] = summarize(measure(requests, lambda: client.get('/api/billing/subscription', headers=headers)))
+    results['endpoint_cached']['stripe_calls'] = FakeStripeHandler.calls - calls
+
+    server.shutdown()
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds the fake Stripe API adds to each call')
+    parser.add_argument('--requests', type=int, default=200)
+    args = parser.parse_args()
+
+    for label, result in run(args.latency, args.requests).items():
+        print(f"{label:>16}: " + ', '.join(f"{key}={value}" for key, value in result.items()))
@@ -0,0 +1,60 @@
+"""
+Rate Limiter Memory Benchmark
+Simulates a credential-stuffing run from a million distinct IPs against the
+in-memory limiter backend and reports memory use and throughput.
+
+Usage: python benchmarks/bench_limiter_memory.py [--ips 1000000] [--max-keys 100000]
+"""
+
+import os
+import sys
+import argparse
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.limiter_backends import MemoryLimiterBackend
+
+ATTEMPT_WINDOW = 300
+MAX_ATTEMPTS = 5
+BLOCK_DURATION = 900
+
+def ip_address(n):
+    return f"{(n >> 24) & 255}.{(n >> 16) & 255}.{(n >> 8) & 255}.{n & 255}"
+
+def run(ips, max_keys):
+    backend = MemoryLimiterBackend(max_keys=max_keys)
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    blocked = 0
+    for n in range(ips):
+        key = f"login:{ip_address(n)}"
+        if backend.hit(key, ATTEMPT_WINDOW) >= MAX_ATTEMPTS:
+            backend.block(key, BLOCK_DURATION)
+            blocked += 1
+    elapsed = time.perf_counter() - start
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        'ips': ips,
+        'max_keys': max_keys,
+        'tracked_keys': len(backend.counters),
+        'blocked': blocked,
+        'seconds': round(elapsed, 2),
+        'hits_per_second': round(ips / elapsed),
+        'current_mb': round(current / 1024 / 1024, 1),
+        'peak_mb': round(peak / 1024 / 1024, 1),
+        'bytes_per_key': round(current / max(1, len(backend.counters)))
+    }
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--ips', type=int, default=1000000)
+    parser.add_argument('--max-keys', type=int, default=100000)
+    args = parser.parse_args()
+
+    for key, value in run(args.ips, args.max_keys).items():
+        print(f"{key:>16}: {value}")
@@ -0,0 +1,83 @@
+"""
+Metrics Recording Benchmark
+Measures the cost of recording a histogram observation and a counter
+increment from several threads at once, next to the same work done on a
+single dict guarded by a lock.
+
+Usage: python benchmarks/bench_metrics.py [--threads 8] [--operations 200000]
+"""
+
+import os
+import sys
+import argparse
+import threading
+import time
+from bisect import bisect_left
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.services.metrics import Counter, Histogram, DEFAULT_BUCKETS
+
+class LockedHistogram:
+    """Baseline: one shared dict updated under a lock"""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}
+
+    def observe(self, value, *labels):
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [0] * (len(DEFAULT_BUCKETS) + 2)
+            entry[bisect_left(DEFAULT_BUCKETS, value)] += 1
+            entry[-1] += value
+
+def run_threads(threads, operations, func):
+    barrier = threading.Barrier(threads + 1)
+
+    def work():
+        barrier.wait()
+        for i in range(operations):
+            func(i)
+
+    workers = [threading.Thread(target=work) for _ in range(threads)]
+    for worker in workers:
+        worker.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for worker in workers:
+        worker.join()
+    return time.perf_counter() - start
+
+def run(threads, operations):
+    labels = ('tracking', '/api/tracking/domain/<domain_id>/code', 'GET', '200')
+    total = threads * operations
+    results = {}
+
+    histogram = Histogram('bench_seconds', 'Benchmark histogram', ('blueprint', 'route', 'method', 'status'))
+    elapsed = run_threads(threads, operations, lambda i: histogram.observe((i % 100) / 1000, *labels))
+    assert sum(histogram.collect()[labels][:-1]) == total
+    results['histogram_sharded'] = elapsed
+
+    locked = LockedHistogram()
+    elapsed = run_threads(threads, operations, lambda i: locked.observe((i % 100) / 1000, *labels))
+    assert sum(locked.values[labels][:-1]) == total
+    results['histogram_locked'] = elapsed
+
+    counter = Counter('bench_total', 'Benchmark counter', ('group', 'scope'))
+    elapsed = run_threads(threads, operations, lambda i: counter.inc('api', 'user'))
+    assert counter.collect()[('api', 'user')] == total
+    results['counter_sharded'] = elapsed
+
+    return {label: {'seconds': round(elapsed, 4), 'ns_per_op': round(elapsed / total * 1e9, 1)}
+            for label, elapsed in results.items()}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--operations', type=int, default=200000, help='Operations per thread')
+    args = parser.parse_args()
+
+    for label, result in run(args.threads, args.operations).items():
+        print(f"{label:>18}: " + ', '.join(f"{key}={value}" for key, value in result.items()))
@@ -0,0 +1,104 @@
+"""
+Response Serialization and Compression Benchmark
+Seeds a domain with a long report history and a report with large
+analysis payloads, then measures JSON serialization time for the
+get_domain and get_report payloads with the stdlib encoder and
+FastJSONProvider, and bytes on the wire for each content coding.
+
+Usage: python benchmarks/bench_responses.py [--reports 500] [--detail-bytes 20000] [--iterations 200]
+
+The data goes to a temporary database unless DATABASE_URL is set.
+"""
+
+import os
+import sys
+import argparse
+import json
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def seed(app, email, reports, detail_bytes):
+    from src.models.user import db, User
+    from src.models.domain import Domain
+    from src.models.analysis_report import AnalysisReport
+
+    recommendations = json.dumps([
+        {'category': 'Schema Markup', 'priority': 'high', 'description': 'Add FAQ and Organization schema markup', 'impact': 'high'},
+        {'category': 'Internal Linking', 'priority': 'medium', 'description': 'Improve internal link structure', 'impact': 'medium'}
+    ] * 5)
+    seo_analysis = json.dumps({
+        'score': 75.5,
+        'factors': {'title_tags': {'score': 85, 'status': 'good'}, 'headings': {'score': 80, 'status': 'good'}},
+        'details': ('Crawled page content. ' * (detail_bytes // 22 + 1))[:detail_bytes]
+    })
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        domain = Domain(user_id=user.id, url='https://bench.example.com', name='Bench')
+        db.session.add(domain)
+        db.session.flush()
+        db.session.add_all([
+            AnalysisReport(
+                domain_id=domain.id, user_id=user.id, status='completed',
+                seo_score=75.0, aeo_score=70.0, overall_score=72.5,
+                summary='SEO score 75.0, AEO score 70.0', processing_time=12.5,
+                seo_analysis=seo_analysis, aeo_analysis=seo_analysis, recommendations=recommendations
+            )
+            for _ in range(reports)
+        ])
+        db.session.commit()
+        return domain.domain_id, AnalysisReport.query.filter_by(domain_id=domain.id).first().report_id
+
+def time_serialize(serialize, payload, iterations):
+    start = time.perf_counter()
+    for _ in range(iterations):
+        serialize(payload)
+    return (time.perf_counter() - start) / iterations
+
+def run(reports, detail_bytes, iterations):
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'responses.db')}")
+
+    from flask.json.provider import DefaultJSONProvider
+    from src.main import app
+    from src.services.json_provider import FastJSONProvider, orjson
+    from src.services.compression import CODINGS
+
+    app.config['TESTING'] = True
+    app.security.RATE_LIMITS = {group: {'free': '1000000/second'} for group in app.security.RATE_LIMITS}
+    app.security.IP_RATE_LIMITS = {group: '1000000/second' for group in app.security.IP_RATE_LIMITS}
+
+    client = app.test_client()
+    email = 'responses@example.com'
+    response = client.post('/api/auth/register', json={'name': 'Bench', 'email': email, 'password': 'password123'})
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    domain_id, report_id = seed(app, email, reports, detail_bytes)
+
+    stdlib = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+    encoders = {
+        'stdlib': lambda payload: stdlib.dumps(payload, separators=(',', ':')).encode(),
+        'orjson' if orjson else 'fast (no orjson)': fast.serialize
+    }
+
+    for name, path in [('get_domain', f'/api/domains/{domain_id}'), ('get_report', f'/api/analysis/reports/{report_id}')]:
+        payload = client.get(path, headers=headers).get_json()
+        print(f"{name}:")
+        for encoder, serialize in encoders.items():
+            print(f"  serialize {encoder:<16} {time_serialize(serialize, payload, iterations) * 1000:8.3f} ms")
+        for coding in ['identity'] + CODINGS:
+            start = time.perf_counter()
+            response = client.get(path, headers={**headers, 'Accept-Encoding': coding})
+            size = len(response.data)
+            elapsed = time.perf_counter() - start
+            print(f"  {coding:<8} {size:>10} bytes  request {elapsed * 1000:8.2f} ms")
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--reports', type=int, default=500, help='Reports in the domain history')
+    parser.add_argument('--detail-bytes', type=int, default=20000, help='Size of each report analysis payload')
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    run(args.reports, args.detail_bytes, args.iterations)
@@ -0,0 +1,95 @@
+"""
+Tracking Code Benchmark
+Measures snippet rendering and the domain tracking code endpoint
+(GET /api/tracking/domain/<id>/code) on a throwaway database: cold bundle
+builds, cached bundles and conditional requests answered with 304.
+
+Usage: python benchmarks/bench_tracking_code.py [--configs 20] [--requests 2000]
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Never touch the development database
+DATABASE_DIR = tempfile.mkdtemp()
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(DATABASE_DIR, 'bench.db')}"
+
+from src.main import app
+from src.services.tracking_snippets import render_snippet, bundle_cache
+
+PLATFORMS = ['meta_pixel', 'ga4', 'gtm', 'clarity']
+
+def timed(label, count, func):
+    start = time.perf_counter()
+    for _ in range(count):
+        func()
+    elapsed = time.perf_counter() - start
+    return label, {
+        'requests': count,
+        'seconds': round(elapsed, 3),
+        'per_second': round(count / elapsed),
+        'mean_us': round(elapsed / count * 1000000, 1)
+    }
+
+def setup(client, configs):
+    response = client.post('/api/auth/register', json={
+        'name': 'Bench', 'email': 'bench@example.com', 'password': 'password123'
+    })
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    response = client.post('/api/domains', json={'url': 'https://bench.example.com'}, headers=headers)
+    domain_id = response.get_json()['domain']['domain_id']
+
+    for n in range(configs):
+        client.post('/api/tracking', json={
+            'platform': PLATFORMS[n % len(PLATFORMS)],
+            'tracking_id': f"BENCH-{n:06d}",
+            'name': f"Bench {n}",
+            'domain_id': domain_id,
+            'settings': {'n': n}
+        }, headers=headers)
+
+    return headers, domain_id
+
+def run(configs, requests):
+    app.config['TESTING'] = True
+    # Benchmark traffic is not what the API limits are for
+    app.security.RATE_LIMITS = {group: {'free': '1000000/second'} for group in app.security.RATE_LIMITS}
+    app.security.IP_RATE_LIMITS = {group: '1000000/second' for group in app.security.IP_RATE_LIMITS}
+
+    client = app.test_client()
+    headers, domain_id = setup(client, configs)
+    url = f"/api/tracking/domain/{domain_id}/code"
+
+    response = client.get(url, headers=headers)
+    assert response.status_code == 200 and response.get_json()['count'] == configs, response.get_json()
+    etag = response.headers['ETag']
+
+    def cold():
+        bundle_cache.bundles.clear()
+        client.get(url, headers=headers)
+
+    def conditional():
+        response = client.get(url, headers={**headers, 'If-None-Match': etag})
+        assert response.status_code == 304
+
+    return dict([
+        timed('render_snippet', requests * 10, lambda: render_snippet('gtm', 'GTM-BENCH')),
+        timed('endpoint_cold', requests, cold),
+        timed('endpoint_cached', requests, lambda: client.get(url, headers=headers)),
+        timed('endpoint_304', requests, conditional)
+    ])
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--configs', type=int, default=20)
+    parser.add_argument('--requests', type=int, default=2000)
+    args = parser.parse_args()
+
+    for label, result in run(args.configs, args.requests).items():
+        print(f"{label:>16}: " + ', '.join(f"{key}={value}" for key, value in result.items()))
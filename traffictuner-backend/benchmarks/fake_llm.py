@@ -0,0 +1,86 @@
+"""
+Fake LLM Server
+A minimal stand-in for the OpenAI chat completions and Anthropic messages
+APIs with configurable latency, for benchmarks and local testing of the
+analysis worker. Point an LLM config's api_endpoint at it.
+
+Usage: python benchmarks/fake_llm.py [--port 12112] [--latency 0.5]
+"""
+
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# A valid AEO analysis, as the worker's prompt asks for
+AEO_ANALYSIS = json.dumps({
+    'score': 72.0,
+    'factors': {
+        'content_structure': {'score': 78, 'status': 'good'},
+        'schema_markup': {'score': 61, 'status': 'needs_improvement'},
+        'faq_optimization': {'score': 66, 'status': 'needs_improvement'},
+        'featured_snippets': {'score': 74, 'status': 'good'},
+        'voice_search': {'score': 70, 'status': 'good'},
+        'ai_formatting': {'score': 83, 'status': 'good'}
+    },
+    'recommendations': [
+        {'category': 'Schema Markup', 'priority': 'high', 'description': 'Add FAQ and Organization schema', 'impact': 'high'},
+        {'category': 'FAQ Optimization', 'priority': 'medium', 'description': 'Answer common questions directly', 'impact': 'medium'}
+    ]
+})
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, body, status=200):
+        FakeLLMHandler.calls += 1
+        time.sleep(self.latency)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        self.rfile.read(length)
+
+        if self.path.endswith('/chat/completions'):
+            return self._respond({
+                'object': 'chat.completion',
+                'choices': [{'index': 0, 'message': {'role': 'assistant', 'content': AEO_ANALYSIS}}],
+                'usage': {'prompt_tokens': 350, 'completion_tokens': 250, 'total_tokens': 600}
+            })
+        if self.path.endswith('/messages'):
+            return self._respond({
+                'type': 'message',
+                'content': [{'type': 'text', 'text': AEO_ANALYSIS}],
+                'usage': {'input_tokens': 350, 'output_tokens': 250}
+            })
+        self._respond({'error': {'message': f'Unknown path {self.path}'}}, 404)
+
+def start_fake_llm(port=0, latency=0.0):
+    """Serve the fake API in a background thread, returning (server, base url)"""
+    FakeLLMHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=12112)
+    parser.add_argument('--latency', type=float, default=0.5, help='Seconds added to every response')
+    args = parser.parse_args()
+
+    server, url = start_fake_llm(args.port, args.latency)
+    print(f"Fake LLM API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
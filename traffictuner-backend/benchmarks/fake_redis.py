@@ -0,0 +1,88 @@
+"""
+Fake Redis Client
+A minimal in-memory stand-in for a redis-py client, covering the commands
+the rate limiter and view cache backends use, for benchmarks and local
+testing without a Redis server. Keys expire like they do in Redis.
+
+Usage: python benchmarks/fake_redis.py
+    Runs the Redis limiter backend against the fake and prints the results.
+"""
+
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+class FakeRedis:
+    """Thread-safe dict of keys to (bytes value, expiry epoch or None)"""
+
+    def __init__(self):
+        self.data = {}
+        self.lock = threading.Lock()
+
+    def _live(self, key):
+        entry = self.data.get(key)
+        if entry and entry[1] is not None and entry[1] <= time.time():
+            del self.data[key]
+            return None
+        return entry
+
+    @staticmethod
+    def _encode(value):
+        return value if isinstance(value, bytes) else str(value).encode()
+
+    def get(self, key):
+        with self.lock:
+            entry = self._live(key)
+            return entry[0] if entry else None
+
+    def mget(self, *keys):
+        with self.lock:
+            return [entry[0] if entry else None for entry in map(self._live, keys)]
+
+    def set(self, key, value, ex=None):
+        with self.lock:
+            self.data[key] = (self._encode(value), time.time() + ex if ex else None)
+            return True
+
+    def incr(self, key, amount=1):
+        with self.lock:
+            entry = self._live(key)
+            value = int(entry[0]) + amount if entry else amount
+            self.data[key] = (self._encode(value), entry[1] if entry else None)
+            return value
+
+    def expire(self, key, seconds):
+        with self.lock:
+            entry = self._live(key)
+            if not entry:
+                return False
+            self.data[key] = (entry[0], time.time() + seconds)
+            return True
+
+    def ttl(self, key):
+        """Seconds left, -1 without an expiry and -2 for a missing key, as in Redis"""
+        with self.lock:
+            entry = self._live(key)
+            if not entry:
+                return -2
+            if entry[1] is None:
+                return -1
+            return max(0, int(round(entry[1] - time.time())))
+
+    def delete(self, *keys):
+        with self.lock:
+            return sum(1 for key in keys if self._live(key) and self.data.pop(key, None))
+
+if __name__ == '__main__':
+    from src.services.limiter_backends import RedisLimiterBackend
+
+    backend = RedisLimiterBackend(FakeRedis())
+    print('hits:', [round(backend.hit('login:10.0.0.1', 60), 2) for _ in range(5)])
+    backend.reset('login:10.0.0.1', 60)
+    print('after reset:', backend.hit('login:10.0.0.1', 60))
+    print('bucket:', [backend.take('api:user', 3, 3 / 60)[0] for _ in range(4)])
+    backend.block('login:10.0.0.2', 900)
+    print('blocked for:', backend.blocked_for('login:10.0.0.2'), 'unblocked:', backend.blocked_for('login:10.0.0.3'))
@@ -0,0 +1,96 @@
+"""
+Fake Stripe Server
+A minimal stand-in for the Stripe API with configurable latency, for
+benchmarks and local testing of billing endpoints. Point the backend at it
+with STRIPE_API_BASE=http://127.0.0.1:<port>.
+
+Usage: python benchmarks/fake_stripe.py [--port 12111] [--latency 0.3]
+"""
+
+import argparse
+import json
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs
+
+def fake_subscription(subscription_id, **values):
+    now = int(time.time())
+    return dict({
+        'id': subscription_id,
+        'object': 'subscription',
+        'customer': 'cus_fake',
+        'status': 'active',
+        'cancel_at_period_end': False,
+        'current_period_start': now,
+        'current_period_end': now + 30 * 86400,
+        'items': {'object': 'list', 'data': [{
+            'id': 'si_fake',
+            'object': 'subscription_item',
+            'price': {'id': 'price_pro_monthly', 'object': 'price', 'unit_amount': 7900, 'currency': 'usd'}
+        }]}
+    }, **values)
+
+class FakeStripeHandler(BaseHTTPRequestHandler):
+    latency = 0.0
+    calls = 0
+
+    def log_message(self, format, *args):
+        pass
+
+    def _respond(self, body, status=200):
+        FakeStripeHandler.calls += 1
+        time.sleep(self.latency)
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _form(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return {key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()}
+
+    def do_GET(self):
+        parts = self.path.split('?')[0].strip('/').split('/')
+        if len(parts) == 3 and parts[1] == 'subscriptions':
+            return self._respond(fake_subscription(parts[2]))
+        if len(parts) == 3 and parts[1] == 'prices':
+            return self._respond({'id': parts[2], 'object': 'price', 'unit_amount': 7900, 'currency': 'usd'})
+        if len(parts) == 3 and parts[1] == 'customers':
+            return self._respond({'id': parts[2], 'object': 'customer'})
+        self._respond({'error': {'type': 'invalid_request_error', 'message': f'Unknown path {self.path}'}}, 404)
+
+    def do_POST(self):
+        form = self._form()
+        parts = self.path.strip('/').split('/')
+        if parts[1:] == ['customers']:
+            return self._respond({'id': f'cus_{uuid.uuid4().hex[:14]}', 'object': 'customer', 'email': form.get('email')})
+        if len(parts) == 3 and parts[1] == 'subscriptions':
+            return self._respond(fake_subscription(parts[2], cancel_at_period_end=form.get('cancel_at_period_end') == 'true'))
+        if parts[1:] in [['checkout', 'sessions'], ['billing_portal', 'sessions']]:
+            session_id = f'cs_{uuid.uuid4().hex[:14]}'
+            return self._respond({'id': session_id, 'object': 'checkout.session', 'url': f'https://stripe.test/{session_id}'})
+        self._respond({'error': {'type': 'invalid_request_error', 'message': f'Unknown path {self.path}'}}, 404)
+
+def start_fake_stripe(port=0, latency=0.0):
+    """Serve the fake API in a background thread, returning (server, base url)"""
+    FakeStripeHandler.latency = latency
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeStripeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=12111)
+    parser.add_argument('--latency', type=float, default=0.3, help='Seconds added to every response')
+    args = parser.parse_args()
+
+    server, url = start_fake_stripe(args.port, args.latency)
+    print(f"Fake Stripe API listening on {url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
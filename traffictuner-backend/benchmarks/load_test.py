@@ -0,0 +1,101 @@
+"""
+HTTP Load Test
+Drives a running backend with concurrent clients for a fixed duration
+(wrk style) and reports throughput and latency percentiles per path.
+Seed the server's database with scripts/generate_data.py first.
+
+Usage:
+    python benchmarks/load_test.py --url http://127.0.0.1:5002 --email user1@synthetic.example.com \\
+        [--concurrency 16] [--duration 30] [--output load.json] [path ...]
+
+Paths default to the main authenticated read endpoints. The server's rate
+limits still apply, so a free-plan user sees 429s (counted as errors)
+beyond 60 requests a minute; use a user on a larger plan for long runs.
+"""
+
+import os
+import sys
+import argparse
+import json
+import threading
+import time
+from datetime import datetime
+
+import requests
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.run_suite import summarize
+
+DEFAULT_PATHS = ['/api/domains', '/api/analysis/recommendations', '/api/billing/usage', '/api/auth/me']
+
+def run(url, token, paths, concurrency, duration):
+    headers = {'Authorization': f'Bearer {token}'}
+    samples = {path: [] for path in paths}
+    errors = {path: 0 for path in paths}
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def work(offset):
+        session = requests.Session()
+        session.headers.update(headers)
+        local = {path: [] for path in paths}
+        failed = {path: 0 for path in paths}
+        i = offset
+        while time.perf_counter() < deadline:
+            path = paths[i % len(paths)]
+            start = time.perf_counter()
+            try:
+                response = session.get(url + path, timeout=30)
+                ok = response.status_code < 400
+            except requests.RequestException:
+                ok = False
+            local[path].append(time.perf_counter() - start)
+            if not ok:
+                failed[path] += 1
+            i += 1
+        with lock:
+            for path in paths:
+                samples[path].extend(local[path])
+                errors[path] += failed[path]
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    return {path: summarize(samples[path], elapsed, errors[path]) for path in paths if samples[path]}
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+    parser.add_argument('--url', default='http://127.0.0.1:5002')
+    parser.add_argument('--email', required=True)
+    parser.add_argument('--password', default='password123')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=30, help='Seconds to run')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    args = parser.parse_args()
+
+    response = requests.post(f'{args.url}/api/auth/login', json={'email': args.email, 'password': args.password}, timeout=30)
+    response.raise_for_status()
+
+    results = run(args.url, response.json()['access_token'], args.paths, args.concurrency, args.duration)
+    for path, result in results.items():
+        print(f"{path:>32}: " + ', '.join(f"{key}={value}" for key, value in result.items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({
+                'meta': {
+                    'timestamp': datetime.utcnow().isoformat(),
+                    'url': args.url,
+                    'concurrency': args.concurrency,
+                    'duration': args.duration
+                },
+                'results': results
+            }, f, indent=2)
+        print(f"Results written to {args.output}")
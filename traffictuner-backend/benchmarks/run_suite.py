@@ -0,0 +1,273 @@
+"""
+API and Analysis Pipeline Benchmark Suite
+Seeds a synthetic dataset at a chosen scale, stubs the LLM API with a
+local fake server and the crawl with a zero delay, then measures
+throughput and latency percentiles for the main read endpoints and the
+analysis worker. Results are written as JSON and can be compared against
+an earlier run to catch regressions.
+
+Usage:
+    python benchmarks/run_suite.py [--scale 1k|100k|1m] [--requests 200] [--concurrency 1] [--view-cache 0]
+                                   [--output results.json] [--compare baseline.json]
+
+The dataset goes to a temporary SQLite database unless DATABASE_URL is
+set; pass --skip-seed to reuse a database seeded by an earlier run.
+"""
+
+import os
+import sys
+import argparse
+import json
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(BENCH_DIR))
+
+from benchmarks.fake_llm import start_fake_llm
+from scripts.generate_data import SCALES, PASSWORD, generate, synthetic_email
+
+SCENARIOS = ['login', 'domain_list', 'report_fetch', 'recommendations', 'admin_dashboard', 'analysis_worker']
+
+ADMIN_EMAIL = 'admin@traffictuner.com'
+ADMIN_PASSWORD = 'admin123'
+
+def percentile(samples, fraction):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+def summarize(samples, elapsed, errors=0):
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'throughput_rps': round(len(samples) / elapsed, 1) if elapsed else None,
+        'p50_ms': round(percentile(samples, 0.5) * 1000, 2),
+        'p90_ms': round(percentile(samples, 0.9) * 1000, 2),
+        'p99_ms': round(percentile(samples, 0.99) * 1000, 2),
+        'max_ms': round(max(samples) * 1000, 2)
+    }
+
+def measure(app, count, concurrency, call):
+    """Run ``call(client, i)`` ``count`` times over ``concurrency`` threads, each with its own client"""
+    samples = []
+    errors = [0]
+    lock = threading.Lock()
+
+    def work(offset):
+        client = app.test_client()
+        local = []
+        failed = 0
+        for i in range(offset, count, concurrency):
+            start = time.perf_counter()
+            response = call(client, i)
+            local.append(time.perf_counter() - start)
+            if response.status_code >= 400:
+                failed += 1
+        with lock:
+            samples.extend(local)
+            errors[0] += failed
+
+    threads = [threading.Thread(target=work, args=(offset,)) for offset in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return summarize(samples, time.perf_counter() - start, errors[0])
+
+def login(client, email, password):
+    response = client.post('/api/auth/login', json={'email': email, 'password': password})
+    assert response.status_code == 200, response.get_json()
+    return {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+def run_worker(app, user_pk, jobs, timeout):
+    """Queue reports for the analysis worker and time them to completion"""
+    from src.models.user import db
+    from src.models.domain import Domain
+    from src.models.analysis_report import AnalysisReport
+    from src.services.analysis_worker import get_worker
+
+    with app.app_context():
+        domains = Domain.query.filter_by(user_id=user_pk).all()
+        reports = [AnalysisReport(domain_id=domains[i % len(domains)].id, user_id=user_pk) for i in range(jobs)]
+        db.session.add_all(reports)
+        db.session.commit()
+        report_ids = [report.report_id for report in reports]
+
+    start = time.perf_counter()
+    for report_id in report_ids:
+        get_worker().queue_analysis(report_id)
+
+    deadline = start + timeout
+    while time.perf_counter() < deadline:
+        with app.app_context():
+            unfinished = AnalysisReport.query.filter(
+                AnalysisReport.report_id.in_(report_ids),
+                AnalysisReport.status.in_(['pending', 'processing'])
+            ).count()
+        if not unfinished:
+            break
+        time.sleep(0.05)
+    elapsed = time.perf_counter() - start
+
+    with app.app_context():
+        finished = AnalysisReport.query.filter(AnalysisReport.report_id.in_(report_ids)).all()
+        durations = [report.processing_time for report in finished if report.status == 'completed']
+        failed = sum(1 for report in finished if report.status != 'completed')
+
+    if not durations:
+        return {'requests': jobs, 'errors': failed, 'throughput_rps': 0}
+    result = summarize(durations, elapsed, failed)
+    result['jobs_per_second'] = result.pop('throughput_rps')
+    return result
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR, text=True).strip()
+    except Exception:
+        return None
+
+def run(scale, requests, concurrency, jobs, llm_latency, skip_seed, scenarios, view_cache=0):
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'suite.db')}")
+    os.environ['ANALYSIS_CRAWL_DELAY'] = '0'
+    # Off by default, so the endpoint scenarios measure the endpoints rather than cache hits
+    os.environ['VIEW_CACHE_TTL'] = str(view_cache)
+
+    llm_server, llm_url = start_fake_llm(latency=llm_latency)
+
+    from sqlalchemy import func
+    from src.main import app
+    from src.models.user import db
+    from src.models.domain import Domain
+    from src.models.llm_config import LLMConfig
+
+    app.config['TESTING'] = True
+    app.security.RATE_LIMITS = {group: {'free': '1000000/second'} for group in app.security.RATE_LIMITS}
+    app.security.IP_RATE_LIMITS = {group: '1000000/second' for group in app.security.IP_RATE_LIMITS}
+
+    # The first request creates the tables and the seeded admin user
+    client = app.test_client()
+    client.get('/api/health')
+
+    seed_seconds = None
+    with app.app_context():
+        if not skip_seed:
+            start = time.perf_counter()
+            generate(db.engine, SCALES[scale])
+            seed_seconds = round(time.perf_counter() - start, 2)
+
+        # Benchmark as the user with the most domains, the worst case for per-domain queries
+        user_pk = db.session.query(Domain.user_id).group_by(Domain.user_id)\
+            .order_by(func.count(Domain.id).desc()).limit(1).scalar()
+
+        LLMConfig.query.update({'is_active': False})
+        llm_config = LLMConfig(
+            provider='openai', name='Benchmark stub', model_name='stub',
+            api_endpoint=llm_url, priority=1000, is_active=True
+        )
+        llm_config.set_api_key('benchmark')
+        db.session.add(llm_config)
+        db.session.commit()
+
+    email = synthetic_email(user_pk)
+    headers = login(client, email, PASSWORD)
+    admin_headers = login(client, ADMIN_EMAIL, ADMIN_PASSWORD)
+
+    domains = client.get('/api/domains', headers=headers).get_json()['domains']
+    report_ids = [domain['latest_report']['report_id'] for domain in domains if domain.get('latest_report')]
+
+    calls = {
+        'login': lambda c, i: c.post('/api/auth/login', json={'email': email, 'password': PASSWORD}),
+        'domain_list': lambda c, i: c.get('/api/domains', headers=headers),
+        'report_fetch': lambda c, i: c.get(f'/api/analysis/reports/{report_ids[i % len(report_ids)]}', headers=headers),
+        'recommendations': lambda c, i: c.get('/api/analysis/recommendations', headers=headers),
+        'admin_dashboard': lambda c, i: c.get('/api/admin/dashboard', headers=admin_headers)
+    }
+
+    results = {}
+    for scenario in scenarios:
+        if scenario == 'analysis_worker':
+            results[scenario] = run_worker(app, user_pk, jobs, timeout=max(60, jobs * (llm_latency + 1)))
+        else:
+            # Login hashes a password per request; keep its sample small
+            count = max(10, requests // 10) if scenario == 'login' else requests
+            results[scenario] = measure(app, count, concurrency, calls[scenario])
+
+    llm_server.shutdown()
+    return {
+        'meta': {
+            'timestamp': datetime.utcnow().isoformat(),
+            'commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0],
+            'scale': scale,
+            'reports': SCALES[scale],
+            'seed_seconds': seed_seconds,
+            'requests': requests,
+            'concurrency': concurrency,
+            'jobs': jobs,
+            'llm_latency': llm_latency,
+            'view_cache_ttl': view_cache
+        },
+        'results': results
+    }
+
+def compare(baseline, current, threshold):
+    """Print changes against a baseline run, returning the scenarios that regressed"""
+    for key in ['scale', 'requests', 'concurrency', 'jobs', 'llm_latency', 'view_cache_ttl']:
+        if baseline['meta'].get(key) != current['meta'].get(key):
+            print(f"Warning: {key} differs from the baseline ({baseline['meta'].get(key)} vs {current['meta'].get(key)})")
+
+    regressions = []
+    for scenario, result in current['results'].items():
+        before = baseline['results'].get(scenario)
+        if not before:
+            continue
+        for key, higher_is_worse in [('p99_ms', True), ('throughput_rps', False), ('jobs_per_second', False)]:
+            if not before.get(key) or result.get(key) is None:
+                continue
+            change = (result[key] - before[key]) / before[key] * 100
+            worse = change > threshold if higher_is_worse else change < -threshold
+            print(f"{scenario:>16} {key:<16} {before[key]:>10} -> {result[key]:>10} ({change:+.1f}%){'  REGRESSION' if worse else ''}")
+            if worse:
+                regressions.append(f"{scenario} {key}")
+    return regressions
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--scale', choices=list(SCALES), default='1k')
+    parser.add_argument('--requests', type=int, default=200, help='Requests per endpoint scenario')
+    parser.add_argument('--concurrency', type=int, default=1, help='Client threads per endpoint scenario')
+    parser.add_argument('--jobs', type=int, default=20, help='Reports queued in the analysis worker scenario')
+    parser.add_argument('--llm-latency', type=float, default=0.05, help='Seconds the fake LLM API adds to each call')
+    parser.add_argument('--scenario', action='append', choices=SCENARIOS, help='Run only these scenarios')
+    parser.add_argument('--view-cache', type=int, default=0, metavar='TTL',
+                        help='Per-user view cache TTL in seconds (default 0, off)')
+    parser.add_argument('--skip-seed', action='store_true', help='Reuse the synthetic data already in DATABASE_URL')
+    parser.add_argument('--output', help='Write the results to this JSON file')
+    parser.add_argument('--compare', help='Baseline results JSON to compare against')
+    parser.add_argument('--threshold', type=float, default=20.0, help='Percent change counted as a regression')
+    args = parser.parse_args()
+
+    report = run(args.scale, args.requests, args.concurrency, args.jobs, args.llm_latency,
+                 args.skip_seed, args.scenario or SCENARIOS, args.view_cache)
+
+    for scenario, result in report['results'].items():
+        print(f"{scenario:>16}: " + ', '.join(f"{key}={value}" for key, value in result.items()))
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(json.load(f), report, args.threshold)
+        if regressions:
+            print(f"{len(regressions)} regressions: {', '.join(regressions)}")
+            sys.exit(1)
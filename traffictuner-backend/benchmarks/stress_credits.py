@@ -0,0 +1,160 @@
+"""
+Credit Reservation Stress Test
+Hammers POST /api/domains/<id>/analyze for one account from many threads
+against a small credit balance, then settles the reservations with
+concurrent, duplicated capture and refund calls, and checks that no
+credit was overspent, lost or refunded twice.
+
+Usage:
+    python benchmarks/stress_credits.py [--threads 16] [--requests 200] [--credits 25] [--rounds 3]
+
+Runs against a temporary SQLite database unless DATABASE_URL is set,
+e.g. DATABASE_URL=postgresql://localhost/traffictuner_stress for a second
+backend. Exits non-zero when an invariant fails.
+"""
+
+import os
+import sys
+import argparse
+import tempfile
+import threading
+from collections import Counter
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def hammer(app, headers, domain_ids, threads):
+    """Analyze every domain once, spread over ``threads`` clients started together"""
+    barrier = threading.Barrier(threads)
+    statuses = Counter()
+    lock = threading.Lock()
+
+    def work(offset):
+        client = app.test_client()
+        local = Counter()
+        barrier.wait()
+        for domain_id in domain_ids[offset::threads]:
+            response = client.post(f'/api/domains/{domain_id}/analyze', headers=headers, json={})
+            local[response.status_code] += 1
+        with lock:
+            statuses.update(local)
+
+    workers = [threading.Thread(target=work, args=(offset,)) for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return statuses
+
+def settle(app, report_ids, threads):
+    """Capture even reports and refund odd ones, every call made twice from different threads"""
+    from src.models.user import db
+    from src.models.credit_reservation import CreditReservation
+
+    calls = [(report_id, n % 2) for n, report_id in enumerate(report_ids)] * 2
+    barrier = threading.Barrier(threads)
+
+    def work(offset):
+        barrier.wait()
+        for report_id, refund in calls[offset::threads]:
+            with app.app_context():
+                try:
+                    if refund:
+                        CreditReservation.refund(report_id)
+                    else:
+                        CreditReservation.capture(report_id)
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+
+    workers = [threading.Thread(target=work, args=(offset,)) for offset in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+
+def run_round(app, client, credits, requests, threads):
+    from src.models.user import db, User
+    from src.models.domain import Domain
+    from src.models.credit_reservation import CreditReservation
+
+    email = f'stress{os.urandom(4).hex()}@example.com'
+    response = client.post('/api/auth/register', json={'name': 'Stress', 'email': email, 'password': 'password123'})
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        user.credits = credits
+        domains = [Domain(user_id=user.id, url=f'https://stress{i}.example.com', name=f'Stress {i}') for i in range(requests)]
+        db.session.add_all(domains)
+        db.session.commit()
+        user_pk = user.id
+        domain_ids = [domain.domain_id for domain in domains]
+
+    statuses = hammer(app, headers, domain_ids, threads)
+
+    with app.app_context():
+        balance = db.session.get(User, user_pk).credits
+        reservations = CreditReservation.query.filter_by(user_id=user_pk).all()
+        report_ids = [reservation.report_id for reservation in reservations]
+
+    failures = []
+    held = sum(reservation.amount for reservation in reservations)
+    if balance < 0:
+        failures.append(f"balance went negative: {balance}")
+    if balance + held != credits:
+        failures.append(f"lost update: balance {balance} + held {held} != {credits}")
+    if statuses[202] != len(reservations):
+        failures.append(f"{statuses[202]} analyses started but {len(reservations)} reservations")
+    if statuses[202] > credits:
+        failures.append(f"overspent: {statuses[202]} analyses on {credits} credits")
+
+    settle(app, report_ids, threads)
+
+    with app.app_context():
+        final = db.session.get(User, user_pk).credits
+        settled = Counter(r.status for r in CreditReservation.query.filter_by(user_id=user_pk).all())
+    refunded = len(report_ids) // 2
+    if settled['refunded'] != refunded or settled['captured'] != len(report_ids) - refunded:
+        failures.append(f"settlement mismatch: {dict(settled)}")
+    if final != balance + refunded:
+        failures.append(f"refunds: balance {final} != {balance} + {refunded} refunded")
+
+    print(f"statuses={dict(statuses)} balance={balance} reserved={len(reservations)} "
+          f"settled={dict(settled)} final={final} {'FAIL' if failures else 'ok'}")
+    for failure in failures:
+        print(f"  {failure}")
+    return failures
+
+def run(threads, requests, credits, rounds):
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'stress.db')}")
+
+    from src.main import app
+    from src.services.analysis_worker import get_worker
+
+    app.config['TESTING'] = True
+    app.security.RATE_LIMITS = {group: {'free': '1000000/second'} for group in app.security.RATE_LIMITS}
+    app.security.IP_RATE_LIMITS = {group: '1000000/second' for group in app.security.IP_RATE_LIMITS}
+
+    # Reports stay pending so only this script settles reservations
+    get_worker().stop()
+
+    client = app.test_client()
+    client.get('/api/health')
+    print(f"database={app.config['SQLALCHEMY_DATABASE_URI'].split(':', 1)[0]} threads={threads} "
+          f"requests={requests} credits={credits}")
+
+    failures = []
+    for _ in range(rounds):
+        failures += run_round(app, client, credits, requests, threads)
+    return failures
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=200, help='Analyze calls per round, one per domain')
+    parser.add_argument('--credits', type=int, default=25, help='Starting balance per round')
+    parser.add_argument('--rounds', type=int, default=3)
+    args = parser.parse_args()
+
+    if run(args.threads, args.requests, args.credits, args.rounds):
+        sys.exit(1)
@@ -0,0 +1,422 @@
+"""
+Synthetic Data Generator
+Bulk-generates users, subscriptions, domains, analysis reports, tracking
+configs and LLM configs for scale testing, using batched executemany
+inserts rather than ORM objects.
+
+Usage:
+    python scripts/generate_data.py --database-url sqlite:////tmp/scale.db --reports 1m \\
+        [--domains-per-user poisson:5] [--reports-per-domain poisson:10] \\
+        [--recommendations 2-6] [--detail-bytes 0] [--subscribed 0.2] \\
+        [--tracking-per-domain 0-2] [--llm-configs 2] [--failed 0.02] [--seed 0]
+
+Counts per parent take a distribution: "N" (fixed), "A-B" (uniform),
+"poisson:MEAN" or "pareto:ALPHA" (long tail, at least 1, capped at 1000).
+Users are generated until the report count is reached.
+
+Every generated user can log in as user<id>@synthetic.example.com with
+the password "password123". LLM config API keys are encrypted with
+ENCRYPTION_KEY; set it to the server's key to keep them readable.
+"""
+
+import os
+import sys
+import argparse
+import json
+import math
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+from sqlalchemy import create_engine, func, insert, select
+from werkzeug.security import generate_password_hash
+
+from src.models.user import db, User
+from src.models.domain import Domain
+from src.models.analysis_report import AnalysisReport
+from src.models.subscription import Subscription
+from src.models.llm_config import LLMConfig
+from src.models.tracking_config import TrackingConfig
+from src.routes.billing import PRICING_PLANS
+
+# Reports generated at each named scale
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+PASSWORD = 'password123'
+EMAIL_DOMAIN = 'synthetic.example.com'
+BATCH_SIZE = 10000
+HISTORY_DAYS = 180
+PARETO_CAP = 1000
+
+# Share of subscribed users on each plan
+PLAN_WEIGHTS = {'starter': 0.5, 'pro': 0.35, 'agency': 0.15}
+
+TRACKING_IDS = {
+    'meta_pixel': lambda rng: str(rng.randrange(10 ** 14, 10 ** 15)),
+    'ga4': lambda rng: f"G-{rng.randrange(16 ** 10):010X}",
+    'gtm': lambda rng: f"GTM-{rng.randrange(36 ** 6):06X}",
+    'clarity': lambda rng: f"{rng.randrange(36 ** 10):x}"[:10]
+}
+
+RECOMMENDATION_TEMPLATES = [
+    {'category': 'Meta Descriptions', 'priority': 'high', 'description': 'Add compelling meta descriptions to improve click-through rates', 'impact': 'medium'},
+    {'category': 'Internal Linking', 'priority': 'medium', 'description': 'Improve internal link structure for better crawlability', 'impact': 'medium'},
+    {'category': 'Schema Markup', 'priority': 'high', 'description': 'Add FAQ and Organization schema markup', 'impact': 'high'},
+    {'category': 'FAQ Optimization', 'priority': 'medium', 'description': 'Answer common questions directly on key pages', 'impact': 'medium'},
+    {'category': 'Page Speed', 'priority': 'low', 'description': 'Compress images and defer non-critical scripts', 'impact': 'low'},
+    {'category': 'Voice Search', 'priority': 'low', 'description': 'Use conversational headings that match spoken queries', 'impact': 'low'}
+]
+
+# Columns a failed report leaves empty
+FAILED_REPORT_NULLS = [
+    'seo_score', 'aeo_score', 'overall_score', 'seo_analysis', 'aeo_analysis',
+    'recommendations', 'summary', 'processing_time', 'completed_at'
+]
+
+AEO_ANALYSIS = json.dumps({
+    'score': 70.0,
+    'factors': {
+        'content_structure': {'score': 75, 'status': 'good'},
+        'schema_markup': {'score': 60, 'status': 'needs_improvement'},
+        'faq_optimization': {'score': 65, 'status': 'needs_improvement'},
+        'featured_snippets': {'score': 70, 'status': 'good'},
+        'voice_search': {'score': 68, 'status': 'needs_improvement'},
+        'ai_formatting': {'score': 80, 'status': 'good'}
+    }
+})
+
+def synthetic_email(user_pk):
+    return f"user{user_pk}@{EMAIL_DOMAIN}"
+
+def parse_distribution(spec):
+    """Turn a distribution spec into a function drawing a count from a random.Random"""
+    spec = str(spec).strip()
+    if spec.startswith('poisson:'):
+        limit = math.exp(-float(spec.split(':', 1)[1]))
+
+        def poisson(rng):
+            # Knuth's method; fine for the small means used here
+            count, product = 0, rng.random()
+            while product > limit:
+                count += 1
+                product *= rng.random()
+            return count
+        return poisson
+    if spec.startswith('pareto:'):
+        alpha = float(spec.split(':', 1)[1])
+        return lambda rng: min(PARETO_CAP, int(rng.paretovariate(alpha)))
+    if '-' in spec:
+        low, high = (int(value) for value in spec.split('-', 1))
+        return lambda rng: rng.randint(low, high)
+    count = int(spec)
+    return lambda rng: count
+
+class BatchWriter:
+    """Buffers rows per table and inserts them with executemany, parents first"""
+
+    def __init__(self, connection, tables):
+        self.connection = connection
+        self.tables = tables
+        self.buffers = {table.name: [] for table in tables}
+        self.counts = {table.name: 0 for table in tables}
+
+    def add(self, table, row):
+        buffer = self.buffers[table.name]
+        buffer.append(row)
+        if len(buffer) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        for table in self.tables:
+            buffer = self.buffers[table.name]
+            if buffer:
+                self.connection.execute(insert(table), buffer)
+                self.counts[table.name] += len(buffer)
+                self.buffers[table.name] = []
+
+def next_id(connection, table):
+    column = list(table.primary_key.columns)[0]
+    return (connection.execute(select(func.max(column))).scalar() or 0) + 1
+
+class Generator:
+    """Rows for the synthetic dataset, with ids continuing after existing rows"""
+
+    def __init__(self, rng, recommendations='2-6', detail_bytes=0, failed=0.02, now=None):
+        self.rng = rng
+        self.now = now or datetime.utcnow()
+        self.recommendations = parse_distribution(recommendations)
+        self.failed = failed
+        # One hash for every user; hashing per row would dominate the run
+        self.password_hash = generate_password_hash(PASSWORD)
+        self.seo_analysis = json.dumps({
+            'score': 75.5,
+            'factors': {
+                'title_tags': {'score': 85, 'status': 'good'},
+                'meta_descriptions': {'score': 70, 'status': 'needs_improvement'},
+                'headings': {'score': 80, 'status': 'good'},
+                'internal_links': {'score': 65, 'status': 'needs_improvement'},
+                'page_speed': {'score': 75, 'status': 'good'},
+                'mobile_friendly': {'score': 90, 'status': 'excellent'}
+            },
+            'details': ('Crawled page content. ' * (detail_bytes // 22 + 1))[:detail_bytes]
+        })
+        self.recommendation_payloads = {}
+
+    def uuid(self):
+        return str(uuid.UUID(int=self.rng.getrandbits(128), version=4))
+
+    def timestamp(self, after=None):
+        start = after or self.now - timedelta(days=HISTORY_DAYS)
+        span = max(1, int((self.now - start).total_seconds()))
+        return start + timedelta(seconds=self.rng.randrange(span))
+
+    def recommendations_json(self):
+        count = self.recommendations(self.rng)
+        payload = self.recommendation_payloads.get(count)
+        if payload is None:
+            payload = self.recommendation_payloads[count] = json.dumps([
+                RECOMMENDATION_TEMPLATES[i % len(RECOMMENDATION_TEMPLATES)] for i in range(count)
+            ])
+        return payload
+
+    def user(self, pk):
+        created_at = self.timestamp()
+        return {
+            'id': pk,
+            'user_id': self.uuid(),
+            'name': f'Synthetic User {pk}',
+            'email': synthetic_email(pk),
+            'password_hash': self.password_hash,
+            'role': 'USER',
+            'is_new_user': False,
+            'credits': self.rng.randint(0, 50),
+            'created_at': created_at,
+            'updated_at': created_at
+        }
+
+    def subscription(self, pk, user):
+        plan_name = self.rng.choices(list(PLAN_WEIGHTS), weights=list(PLAN_WEIGHTS.values()))[0]
+        plan = PRICING_PLANS[plan_name]
+        period_start = self.timestamp(after=self.now - timedelta(days=30))
+        credits_used = self.rng.randint(0, plan['credits'])
+        return {
+            'id': pk,
+            'subscription_id': self.uuid(),
+            'user_id': user['id'],
+            'stripe_subscription_id': f'sub_synthetic_{pk}',
+            'stripe_customer_id': f'cus_synthetic_{user["id"]}',
+            'stripe_price_id': plan['price_id'],
+            'plan_name': plan_name,
+            'status': 'active' if self.rng.random() < 0.9 else 'canceled',
+            'current_period_start': period_start,
+            'current_period_end': period_start + timedelta(days=30),
+            'monthly_credits': plan['credits'],
+            'credits_used': credits_used,
+            'credits_remaining': plan['credits'] - credits_used,
+            'amount': plan['amount'],
+            'currency': 'USD',
+            'created_at': user['created_at'],
+            'updated_at': period_start
+        }
+
+    def domain(self, pk, user):
+        created_at = self.timestamp(after=user['created_at'])
+        return {
+            'id': pk,
+            'domain_id': self.uuid(),
+            'user_id': user['id'],
+            'url': f'https://site{pk}.example.com',
+            'name': f'Site {pk}',
+            'status': 'active',
+            'analysis_count': 0,
+            'last_analyzed': None,
+            'current_seo_score': None,
+            'current_aeo_score': None,
+            'created_at': created_at,
+            'updated_at': created_at
+        }
+
+    def record_analyses(self, domain, reports):
+        """Set a domain's analysis stats from its reports, as Domain.update_scores would have"""
+        completed = [report for report in reports if report['status'] == 'completed']
+        if not completed:
+            return
+        last = max(completed, key=lambda report: report['completed_at'])
+        domain.update({
+            'analysis_count': len(completed),
+            'last_analyzed': last['completed_at'],
+            'current_seo_score': last['seo_score'],
+            'current_aeo_score': last['aeo_score'],
+            'updated_at': last['completed_at']
+        })
+
+    def report(self, pk, domain):
+        created_at = self.timestamp(after=domain['created_at'])
+        row = {
+            'id': pk,
+            'report_id': self.uuid(),
+            'domain_id': domain['id'],
+            'user_id': domain['user_id'],
+            'analysis_type': 'full',
+            'created_at': created_at,
+            'error_message': None
+        }
+        if self.rng.random() < self.failed:
+            # executemany needs the same keys in every row
+            row.update(dict.fromkeys(FAILED_REPORT_NULLS), status='failed', error_message='LLM API call failed: timeout')
+            return row
+
+        seo_score = round(self.rng.uniform(40, 95), 1)
+        aeo_score = round(self.rng.uniform(40, 95), 1)
+        processing_time = round(self.rng.uniform(5, 60), 2)
+        row.update({
+            'status': 'completed',
+            'seo_score': seo_score,
+            'aeo_score': aeo_score,
+            'overall_score': round((seo_score + aeo_score) / 2, 1),
+            'seo_analysis': self.seo_analysis,
+            'aeo_analysis': AEO_ANALYSIS,
+            'recommendations': self.recommendations_json(),
+            'summary': f"Analysis completed for {domain['url']}",
+            'processing_time': processing_time,
+            'completed_at': created_at + timedelta(seconds=processing_time)
+        })
+        return row
+
+    def tracking_config(self, pk, domain, user):
+        platform = self.rng.choice(list(TRACKING_IDS))
+        return {
+            'config_id': pk,
+            'user_id': user['user_id'],
+            'domain_id': domain['domain_id'],
+            'platform': platform,
+            'tracking_id': TRACKING_IDS[platform](self.rng),
+            'name': f"{platform} for site {domain['id']}",
+            'is_active': self.rng.random() < 0.9,
+            'created_at': domain['created_at'],
+            'updated_at': domain['created_at']
+        }
+
+    def llm_config(self, pk, index):
+        provider = ['openai', 'anthropic'][index % 2]
+        config = LLMConfig()
+        config.set_api_key(f'synthetic-key-{pk}')
+        return {
+            'id': pk,
+            'config_id': self.uuid(),
+            'provider': provider,
+            'name': f'Synthetic {provider} {pk}',
+            'api_key_encrypted': config.api_key_encrypted,
+            'api_endpoint': 'https://api.openai.com/v1' if provider == 'openai' else 'https://api.anthropic.com/v1',
+            'model_name': 'gpt-4o-mini' if provider == 'openai' else 'claude-3-5-haiku-latest',
+            'is_active': True,
+            'priority': index,
+            'rate_limit_per_minute': 60,
+            'cost_per_1k_tokens': 0.002,
+            'total_requests': 0,
+            'total_tokens': 0,
+            'total_cost': 0.0,
+            'created_at': self.now,
+            'updated_at': self.now
+        }
+
+def generate(engine, reports, domains_per_user='poisson:5', reports_per_domain='poisson:10',
+             recommendations='2-6', detail_bytes=0, subscribed=0.2, tracking_per_domain='0-2',
+             llm_configs=0, failed=0.02, seed=0):
+    """Generate the dataset in one transaction, returning row counts per table"""
+    db.metadata.create_all(engine)
+    rng = random.Random(seed)
+    generator = Generator(rng, recommendations, detail_bytes, failed)
+    domain_count = parse_distribution(domains_per_user)
+    report_count = parse_distribution(reports_per_domain)
+    tracking_count = parse_distribution(tracking_per_domain)
+
+    users_table = User.__table__
+    subscriptions_table = Subscription.__table__
+    domains_table = Domain.__table__
+    reports_table = AnalysisReport.__table__
+    tracking_table = TrackingConfig.__table__
+    llm_table = LLMConfig.__table__
+
+    with engine.begin() as connection:
+        if engine.dialect.name == 'sqlite':
+            connection.exec_driver_sql('PRAGMA synchronous=OFF')
+
+        ids = {table.name: next_id(connection, table) for table in
+               [users_table, subscriptions_table, domains_table, reports_table, tracking_table, llm_table]}
+        first_user = ids['users']
+        writer = BatchWriter(connection, [users_table, subscriptions_table, domains_table, reports_table, tracking_table, llm_table])
+
+        def take(table):
+            pk = ids[table.name]
+            ids[table.name] += 1
+            return pk
+
+        for index in range(llm_configs):
+            writer.add(llm_table, generator.llm_config(take(llm_table), index))
+
+        remaining = reports
+        while remaining > 0:
+            user = generator.user(take(users_table))
+            writer.add(users_table, user)
+            if rng.random() < subscribed:
+                writer.add(subscriptions_table, generator.subscription(take(subscriptions_table), user))
+
+            for _ in range(domain_count(rng)):
+                # Reports come first so the domain row carries their stats
+                domain = generator.domain(take(domains_table), user)
+                domain_reports = [generator.report(take(reports_table), domain)
+                                  for _ in range(min(remaining, report_count(rng)))]
+                remaining -= len(domain_reports)
+                generator.record_analyses(domain, domain_reports)
+
+                writer.add(domains_table, domain)
+                for _ in range(tracking_count(rng)):
+                    writer.add(tracking_table, generator.tracking_config(take(tracking_table), domain, user))
+                for report in domain_reports:
+                    writer.add(reports_table, report)
+                if remaining <= 0:
+                    break
+
+        writer.flush()
+
+    counts = dict(writer.counts)
+    counts['first_user'] = first_user
+    return counts
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=os.environ.get('DATABASE_URL'), required=not os.environ.get('DATABASE_URL'))
+    parser.add_argument('--reports', default='1k', help=f"Report count or one of {', '.join(SCALES)}")
+    parser.add_argument('--domains-per-user', default='poisson:5')
+    parser.add_argument('--reports-per-domain', default='poisson:10')
+    parser.add_argument('--recommendations', default='2-6', help='Recommendations per completed report')
+    parser.add_argument('--detail-bytes', type=int, default=0, help='Extra text in each report\'s SEO analysis JSON')
+    parser.add_argument('--subscribed', type=float, default=0.2, help='Share of users with a subscription')
+    parser.add_argument('--tracking-per-domain', default='0-2')
+    parser.add_argument('--llm-configs', type=int, default=2)
+    parser.add_argument('--failed', type=float, default=0.02, help='Share of failed reports')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    counts = generate(
+        create_engine(args.database_url),
+        SCALES.get(args.reports) or int(args.reports),
+        domains_per_user=args.domains_per_user,
+        reports_per_domain=args.reports_per_domain,
+        recommendations=args.recommendations,
+        detail_bytes=args.detail_bytes,
+        subscribed=args.subscribed,
+        tracking_per_domain=args.tracking_per_domain,
+        llm_configs=args.llm_configs,
+        failed=args.failed,
+        seed=args.seed
+    )
+    elapsed = time.perf_counter() - start
+    counts.pop('first_user')
+    print(f"Generated in {elapsed:.1f}s: " + ', '.join(f"{table}={count}" for table, count in counts.items()))
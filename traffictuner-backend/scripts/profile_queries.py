@@ -0,0 +1,114 @@
+"""
+Endpoint Query Profile
+Seeds a user with domains and completed reports, calls the read endpoints
+through an in-process app and prints each one's SQL statement count, SQL
+time and repeated statement shapes. Statement counts that grow with the
+number of domains point at N+1 queries.
+
+Usage:
+    python scripts/profile_queries.py [--domains 10] [--reports 3] [--check]
+
+--check exits non-zero when an endpoint runs more statements than its
+budget in QUERY_BUDGETS. The data goes to a temporary database unless
+DATABASE_URL is set.
+"""
+
+import os
+import sys
+import argparse
+import json
+import tempfile
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Statements each endpoint may run, whatever the number of domains and reports
+QUERY_BUDGETS = {
+    '/api/auth/me': 5,
+    '/api/domains': 5,
+    '/api/domains/{domain_id}': 5,
+    '/api/domains/{domain_id}/reports': 5,
+    '/api/analysis/recommendations': 5,
+    '/api/billing/subscription': 5,
+    '/api/billing/usage': 5,
+    '/api/tracking': 5
+}
+
+def seed(app, email, domains, reports):
+    from src.models.user import db, User
+    from src.models.domain import Domain
+    from src.models.analysis_report import AnalysisReport
+
+    recommendations = json.dumps([
+        {'category': 'Meta Descriptions', 'priority': 'high', 'description': 'Add meta descriptions', 'impact': 'medium'},
+        {'category': 'Internal Linking', 'priority': 'medium', 'description': 'Improve internal links', 'impact': 'medium'}
+    ])
+
+    with app.app_context():
+        user = User.query.filter_by(email=email).first()
+        for i in range(domains):
+            domain = Domain(user_id=user.id, url=f'https://site{i}.example.com', name=f'Site {i}')
+            db.session.add(domain)
+            db.session.flush()
+            for _ in range(reports):
+                db.session.add(AnalysisReport(
+                    domain_id=domain.id, user_id=user.id, status='completed',
+                    seo_score=75.0, aeo_score=70.0, overall_score=72.5,
+                    recommendations=recommendations
+                ))
+        db.session.commit()
+        return Domain.query.filter_by(user_id=user.id).first().domain_id
+
+def run(domains, reports):
+    os.environ.setdefault('DATABASE_URL', f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'profile.db')}")
+    # Profile the endpoints themselves rather than the per-user view cache
+    os.environ['VIEW_CACHE_TTL'] = '0'
+
+    from src.main import app
+    from src.services.sql_profiler import start_profile, stop_profile
+
+    app.config['TESTING'] = True
+    app.security.RATE_LIMITS = {group: {'free': '1000000/second'} for group in app.security.RATE_LIMITS}
+    app.security.IP_RATE_LIMITS = {group: '1000000/second' for group in app.security.IP_RATE_LIMITS}
+
+    client = app.test_client()
+    email = 'profile@example.com'
+    response = client.post('/api/auth/register', json={'name': 'Profile', 'email': email, 'password': 'password123'})
+    headers = {'Authorization': f"Bearer {response.get_json()['access_token']}"}
+    domain_id = seed(app, email, domains, reports)
+
+    results = {}
+    for endpoint in QUERY_BUDGETS:
+        # Warm up per-user caches so only the endpoint's own queries are counted
+        path = endpoint.format(domain_id=domain_id)
+        client.get(path, headers=headers)
+
+        profile = start_profile()
+        try:
+            response = client.get(path, headers=headers)
+        finally:
+            stop_profile(profile)
+        results[endpoint] = (response.status_code, profile)
+    return results
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--domains', type=int, default=10)
+    parser.add_argument('--reports', type=int, default=3, help='Completed reports per domain')
+    parser.add_argument('--check', action='store_true', help='Fail when an endpoint exceeds its query budget')
+    parser.add_argument('--repeat-threshold', type=int, default=3, help='Show statement shapes run at least this many times')
+    args = parser.parse_args()
+
+    over_budget = []
+    for endpoint, (status, profile) in run(args.domains, args.reports).items():
+        budget = QUERY_BUDGETS[endpoint]
+        flag = 'OVER' if profile.count > budget else 'ok'
+        print(f"{flag:>4} {endpoint:<36} status={status} queries={profile.count}/{budget} sql_ms={profile.duration * 1000:.1f}")
+        for shape, count in profile.repeated(args.repeat_threshold):
+            print(f"       {count}x {shape[:150]}")
+        if profile.count > budget:
+            over_budget.append(endpoint)
+
+    if args.check and over_budget:
+        print(f"{len(over_budget)} endpoints over their query budget: {', '.join(over_budget)}")
+        sys.exit(1)
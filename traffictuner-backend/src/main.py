@@ -6,6 +6,7 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
 
 from flask import Flask, send_from_directory, request, jsonify
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
@@ -17,6 +18,13 @@ from src.models.analysis_report import AnalysisReport
 from src.models.subscription import Subscription
 from src.models.llm_config import LLMConfig
 from src.models.tracking_config import TrackingConfig
+from src.models.analysis_progress import AnalysisProgress
+from src.models.report_state import ReportTransition
+from src.models.credit_reservation import CreditReservation
+from src.models.tracking_bundle import TrackingScript
+from src.models.stripe_event import StripeWebhookEvent
+from src.models.stripe_object import StripeObject
+from src.models.usage import UsageEntry, UsageDaily
 
 # Import routes
 from src.routes.user import user_bp
@@ -24,11 +32,25 @@ from src.routes.auth import auth_bp
 from src.routes.domains import domains_bp
 from src.routes.analysis import analysis_bp
 from src.routes.admin import admin_bp
-from src.routes.billing import billing_bp
+from src.routes.billing import billing_bp, WEBHOOK_HANDLERS
 from src.routes.tracking import tracking_bp
+from src.routes.metrics import metrics_bp
+from src.routes.health import health_bp
 
 # Import services
 from src.services.analysis_worker import init_worker
+from src.services.webhook_consumer import init_webhook_consumer
+from src.services.stripe_cache import init_stripe_cache
+from src.services.usage_ledger import init_usage_ledger
+from src.services.llm_usage import init_llm_usage
+from src.services.identity import init_identity
+from src.services.metrics import init_metrics
+from src.services.sql_profiler import init_sql_profiler
+from src.services.circuit_breaker import init_llm_breakers
+from src.services.health import init_health
+from src.services.json_provider import init_json_provider
+from src.services.compression import init_compression
+from src.services.view_cache import init_view_cache
 from src.security_enhancements import init_security
 app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'static'))
 
@@ -36,16 +58,87 @@ app = Flask(__name__, static_folder=os.path.join(os.path.dirname(__file__), 'sta
 app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'traffictuner-super-secret-key-2025')
 app.config['JWT_SECRET_KEY'] = os.environ.get('JWT_SECRET_KEY', 'jwt-secret-key-traffictuner')
 app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+app.config['JWT_USER_CACHE_TTL'] = int(os.environ.get('JWT_USER_CACHE_TTL', 0))
 
 # Database configuration
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get(
+    'DATABASE_URL',
+    f"sqlite:///{os.path.join(os.path.dirname(__file__), 'database', 'app.db')}"
+)
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 
+# Login rate limiter storage: memory (single process), sqlite (shared database table) or redis
+app.config['RATE_LIMIT_BACKEND'] = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+app.config['RATE_LIMIT_STORAGE_URI'] = os.environ.get('RATE_LIMIT_STORAGE_URI')
+app.config['RATE_LIMIT_MAX_KEYS'] = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+# Reverse proxies in front of the app; X-Forwarded-For is only trusted for
+# that many hops, so clients cannot pick the IP their rate limits key on
+app.config['PROXY_COUNT'] = int(os.environ.get('PROXY_COUNT', 0))
+if app.config['PROXY_COUNT']:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_COUNT'], x_proto=app.config['PROXY_COUNT'])
+
+# Stripe object cache: copies older than the TTL are served while refreshed in the background
+app.config['STRIPE_CACHE_TTL'] = int(os.environ.get('STRIPE_CACHE_TTL', 3600))
+app.config['STRIPE_CACHE_MAX_STALE'] = int(os.environ.get('STRIPE_CACHE_MAX_STALE', 86400))
+
+# Usage ledger entries are written in batches of up to this size, at least this often (seconds)
+app.config['USAGE_LEDGER_BATCH_SIZE'] = int(os.environ.get('USAGE_LEDGER_BATCH_SIZE', 500))
+app.config['USAGE_LEDGER_FLUSH_INTERVAL'] = float(os.environ.get('USAGE_LEDGER_FLUSH_INTERVAL', 5))
+
+# LLM usage totals are written once this many calls are pending, at least this often (seconds)
+app.config['LLM_USAGE_FLUSH_THRESHOLD'] = int(os.environ.get('LLM_USAGE_FLUSH_THRESHOLD', 100))
+app.config['LLM_USAGE_FLUSH_INTERVAL'] = float(os.environ.get('LLM_USAGE_FLUSH_INTERVAL', 5))
+
+# Bearer token required to scrape /metrics; unset leaves it open (restrict it at the proxy)
+app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+# Seconds the simulated crawl in the analysis worker takes (benchmarks set 0)
+app.config['ANALYSIS_CRAWL_DELAY'] = float(os.environ.get('ANALYSIS_CRAWL_DELAY', 2))
+
+# An LLM config's circuit opens after this many consecutive failures, for this long (seconds)
+app.config['LLM_BREAKER_FAILURES'] = int(os.environ.get('LLM_BREAKER_FAILURES', 5))
+app.config['LLM_BREAKER_RESET_TIMEOUT'] = float(os.environ.get('LLM_BREAKER_RESET_TIMEOUT', 30))
+
+# Health checks run in the background this often (seconds); probes serve the cached result
+app.config['HEALTH_CHECK_INTERVAL'] = float(os.environ.get('HEALTH_CHECK_INTERVAL', 2))
+app.config['HEALTH_DB_SLOW'] = float(os.environ.get('HEALTH_DB_SLOW', 0.25))
+app.config['HEALTH_WORKER_STALE'] = int(os.environ.get('HEALTH_WORKER_STALE', 180))
+app.config['HEALTH_MAX_BACKLOG_AGE'] = int(os.environ.get('HEALTH_MAX_BACKLOG_AGE', 300))
+
+# Per-request SQL profiling for development and staging: Server-Timing headers and warnings
+# for requests over these limits or repeating a statement (N+1 queries)
+app.config['SQL_PROFILER'] = os.environ.get('SQL_PROFILER', '').lower() in ('1', 'true', 'yes')
+app.config['SQL_PROFILER_MAX_QUERIES'] = int(os.environ.get('SQL_PROFILER_MAX_QUERIES', 20))
+app.config['SQL_PROFILER_SLOW_MS'] = float(os.environ.get('SQL_PROFILER_SLOW_MS', 200))
+app.config['SQL_PROFILER_REPEAT_THRESHOLD'] = int(os.environ.get('SQL_PROFILER_REPEAT_THRESHOLD', 5))
+
+# Responses of at least this many bytes are gzip or brotli compressed when the client accepts it
+app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+app.config['COMPRESS_BROTLI_QUALITY'] = int(os.environ.get('COMPRESS_BROTLI_QUALITY', 4))
+
+# Per-user dashboard views (domains, usage, recommendations, profile) are cached for this
+# long (seconds, 0 disables) in memory or, to share invalidations between processes, redis
+app.config['VIEW_CACHE_TTL'] = int(os.environ.get('VIEW_CACHE_TTL', 30))
+app.config['VIEW_CACHE_MAX_ENTRIES'] = int(os.environ.get('VIEW_CACHE_MAX_ENTRIES', 10000))
+app.config['VIEW_CACHE_BACKEND'] = os.environ.get('VIEW_CACHE_BACKEND', 'memory')
+app.config['VIEW_CACHE_STORAGE_URI'] = os.environ.get('VIEW_CACHE_STORAGE_URI')
+
 # CORS configuration for frontend integration
 CORS(app, origins=["http://localhost:5173", "http://localhost:3000", "*"])
 
+# Request, SQL and worker metrics; registered first so timings cover the other hooks
+init_metrics(app)
+init_sql_profiler(app)
+init_compression(app)
+
+# orjson-backed JSON responses, falling back to the stdlib encoder
+init_json_provider(app)
+
 # Initialize JWT
 jwt = JWTManager(app)
+init_identity(app, jwt)
 
 # # Register blueprints
 app.register_blueprint(user_bp, url_prefix='/api/users')
@@ -55,6 +148,8 @@ app.register_blueprint(analysis_bp, url_prefix='/api/analysis')
 app.register_blueprint(admin_bp, url_prefix='/api/admin')
 app.register_blueprint(billing_bp, url_prefix='/api/billing')
 app.register_blueprint(tracking_bp, url_prefix='/api/tracking')
+app.register_blueprint(metrics_bp)
+app.register_blueprint(health_bp, url_prefix='/api/health')
 # Initialize database
 db.init_app(app)
 
@@ -85,10 +180,35 @@ def create_tables():
         
         create_tables.initialized = True
 
+# Create the tables before the background services below start polling them
+with app.app_context():
+    create_tables()
+
+# Buffered writer for the usage ledger
+usage_ledger = init_usage_ledger(app)
+
+# Buffered LLM usage totals per config
+llm_usage = init_llm_usage(app)
+
+# Read-through cache of per-user views, dropped when their data changes
+view_cache = init_view_cache(app)
+
+# Circuit breakers for LLM providers
+llm_breakers = init_llm_breakers(app)
+
 # Initialize background worker
 worker = init_worker(app)
 
-# Health check endpoint
+# Local copies of Stripe objects, and the consumer that keeps them current
+stripe_cache = init_stripe_cache(app)
+
+# Process stored Stripe webhook events in the background
+webhook_consumer = init_webhook_consumer(app, WEBHOOK_HANDLERS)
+
+# Background dependency checks behind the liveness and readiness probes
+health_monitor = init_health(app)
+
+# Health check endpoint; see /api/health/live and /api/health/ready for real checks
 @app.route('/api/health')
 def health_check():
     return jsonify({
@@ -0,0 +1,36 @@
+from src.models.user import db
+from datetime import datetime
+
+class AnalysisProgress(db.Model):
+    """Latest pipeline stage for a report, shared across processes for progress streams"""
+    __tablename__ = 'analysis_progress'
+
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+
+    # Progress details
+    status = db.Column(db.String(20), nullable=False)  # pending, processing, completed, failed
+    stage = db.Column(db.String(50), nullable=False)  # queued, started, seo_analysis, aeo_analysis, ...
+    progress = db.Column(db.Integer, default=0)  # 0-100
+    message = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<AnalysisProgress {self.report_id}:{self.stage}>'
+
+    def to_dict(self):
+        return {
+            'report_id': self.report_id,
+            'status': self.status,
+            'stage': self.stage,
+            'progress': self.progress,
+            'message': self.message,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+    def is_terminal(self):
+        """Check if the report has reached a final state"""
+        return self.status in ['completed', 'failed']
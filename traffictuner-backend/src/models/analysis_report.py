@@ -1,4 +1,7 @@
 from src.models.user import db
+from src.models.report_state import (
+    ReportTransition, validate_transition, PENDING, PROCESSING, COMPLETED, FAILED, TERMINAL_STATUSES
+)
 from datetime import datetime
 import uuid
 import json
@@ -122,18 +125,67 @@ class AnalysisReport(db.Model):
         """Set competitor analysis data"""
         self.competitor_analysis = json.dumps(data) if data else None
 
+    @staticmethod
+    def transition(report_id, from_status, to_status, **values):
+        """Atomically move a report from one status to another.
+
+        Performs a single conditional UPDATE that only matches while the
+        report is still in from_status, so concurrent processors cannot both
+        win the same transition. Extra column values are written in the same
+        statement. Returns True if this caller made the transition; the
+        caller is responsible for committing.
+        """
+        validate_transition(from_status, to_status)
+        
+        now = datetime.utcnow()
+        values['status'] = to_status
+        if to_status in TERMINAL_STATUSES:
+            values.setdefault('completed_at', now)
+        
+        updated = AnalysisReport.query.filter_by(report_id=report_id, status=from_status)\
+                    .update(
+                        {getattr(AnalysisReport, key): value for key, value in values.items()},
+                        synchronize_session=False
+                    )
+        
+        if updated != 1:
+            return False
+        
+        db.session.add(ReportTransition(
+            report_id=report_id,
+            from_status=from_status,
+            to_status=to_status,
+            created_at=now
+        ))
+        return True
+
+    def transition_to(self, to_status, **values):
+        """Move this report from its current status to to_status"""
+        changed = AnalysisReport.transition(self.report_id, self.status, to_status, **values)
+        # The UPDATE bypassed the identity map; reload the affected columns
+        db.session.expire(self, ['status', 'completed_at'] + list(values.keys()))
+        return changed
+
+    @staticmethod
+    def claim_for_processing(report_id):
+        """Atomically move a pending report to processing.
+
+        Only one caller can win the claim; returns True if this caller did.
+        """
+        claimed = AnalysisReport.transition(report_id, PENDING, PROCESSING)
+        db.session.commit()
+        return claimed
+
     def mark_completed(self, processing_time=None):
         """Mark the analysis as completed"""
-        self.status = 'completed'
-        self.completed_at = datetime.utcnow()
+        values = {}
         if processing_time:
-            self.processing_time = processing_time
+            values['processing_time'] = processing_time
+        return self.transition_to(COMPLETED, **values)
 
     def mark_failed(self, error_message):
         """Mark the analysis as failed"""
-        self.status = 'failed'
-        self.error_message = error_message
-        self.completed_at = datetime.utcnow()
+        return self.transition_to(FAILED, error_message=error_message)
 
     def calculate_overall_score(self):
         """Calculate overall score from SEO and AEO scores"""
@@ -0,0 +1,70 @@
+from src.models.user import db, User
+from datetime import datetime
+
+class CreditReservation(db.Model):
+    """Credits held for an analysis until the report completes or fails"""
+    __tablename__ = 'credit_reservations'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    report_id = db.Column(db.String(36), unique=True, nullable=False)
+    amount = db.Column(db.Integer, nullable=False, default=1)
+    status = db.Column(db.String(20), default='reserved')  # reserved, captured, refunded
+    
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    settled_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<CreditReservation {self.report_id}: {self.amount} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'report_id': self.report_id,
+            'amount': self.amount,
+            'status': self.status,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'settled_at': self.settled_at.isoformat() if self.settled_at else None
+        }
+
+    @staticmethod
+    def reserve(user_pk, report_id, amount=1):
+        """Deduct credits for a report and hold them until it settles.
+
+        Returns False without changing anything if the balance does not cover
+        the amount. The caller is responsible for committing.
+        """
+        if not User.deduct_credits(user_pk, amount, 'analysis', report_id):
+            return False
+        
+        db.session.add(CreditReservation(user_id=user_pk, report_id=report_id, amount=amount))
+        return True
+
+    @staticmethod
+    def _settle(report_id, status):
+        """Move a held reservation to its final status, returning it if this caller did"""
+        updated = CreditReservation.query.filter_by(report_id=report_id, status='reserved')\
+                    .update({
+                        CreditReservation.status: status,
+                        CreditReservation.settled_at: datetime.utcnow()
+                    }, synchronize_session=False)
+        if updated != 1:
+            return None
+        return CreditReservation.query.populate_existing().filter_by(report_id=report_id).first()
+
+    @staticmethod
+    def capture(report_id):
+        """Keep the held credits once the report has completed"""
+        return CreditReservation._settle(report_id, 'captured') is not None
+
+    @staticmethod
+    def refund(report_id):
+        """Return the held credits to the user after the report failed"""
+        reservation = CreditReservation._settle(report_id, 'refunded')
+        if not reservation:
+            return False
+        
+        User.increase_credits(reservation.user_id, reservation.amount, 'refund', report_id)
+        return True
@@ -1,4 +1,6 @@
 from src.models.user import db
+from sqlalchemy import func
+from src.models.analysis_report import AnalysisReport
 from datetime import datetime
 import uuid
 
@@ -66,6 +68,21 @@ class Domain(db.Model):
         """Get the most recent analysis report"""
         return AnalysisReport.query.filter_by(domain_id=self.id).order_by(AnalysisReport.created_at.desc()).first()
 
+    def get_reports_version(self):
+        """Summary of this domain's reports that changes whenever one is added or changes status.
+
+        Report status changes do not always touch the domain row, so ETags
+        covering a domain's reports combine this with updated_at.
+        """
+        return db.session.query(
+            AnalysisReport.status,
+            func.count(AnalysisReport.id),
+            func.max(AnalysisReport.created_at),
+            func.max(AnalysisReport.completed_at)
+        ).filter_by(domain_id=self.id)\
+         .group_by(AnalysisReport.status)\
+         .order_by(AnalysisReport.status).all()
+
     def get_score_trend(self, limit=10):
         """Get score trend over time"""
         reports = AnalysisReport.query.filter_by(domain_id=self.id)\
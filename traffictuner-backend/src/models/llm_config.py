@@ -115,16 +115,9 @@ class LLMConfig(db.Model):
         
         return data
 
-    def record_usage(self, tokens_used, cost=None):
-        """Record API usage"""
-        self.total_requests += 1
-        self.total_tokens += tokens_used
-        if cost:
-            self.total_cost += cost
-        else:
-            # Calculate cost based on rate
-            self.total_cost += (tokens_used / 1000) * self.cost_per_1k_tokens
-        self.last_used = datetime.utcnow()
+    def usage_cost(self, tokens_used):
+        """Cost of a number of tokens at this config's rate"""
+        return (tokens_used / 1000) * (self.cost_per_1k_tokens or 0.0)
 
     def is_available(self):
         """Check if LLM config is available for use"""
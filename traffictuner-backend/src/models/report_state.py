@@ -0,0 +1,57 @@
+"""
+Analysis Report State Machine
+Legal status transitions for analysis reports and their audit trail
+"""
+
+from src.models.user import db
+from datetime import datetime
+
+# Report statuses
+PENDING = 'pending'
+PROCESSING = 'processing'
+COMPLETED = 'completed'
+FAILED = 'failed'
+
+# Allowed transitions: from status -> statuses it may move to
+TRANSITIONS = {
+    PENDING: [PROCESSING, FAILED],
+    PROCESSING: [COMPLETED, FAILED],
+    COMPLETED: [],
+    FAILED: []
+}
+
+TERMINAL_STATUSES = [COMPLETED, FAILED]
+
+class InvalidTransition(Exception):
+    """Raised when a report status change is not allowed by the state machine"""
+
+    def __init__(self, from_status, to_status):
+        self.from_status = from_status
+        self.to_status = to_status
+        super().__init__(f"Invalid report transition: {from_status} -> {to_status}")
+
+def validate_transition(from_status, to_status):
+    """Raise InvalidTransition unless from_status may move to to_status"""
+    if to_status not in TRANSITIONS.get(from_status, []):
+        raise InvalidTransition(from_status, to_status)
+
+class ReportTransition(db.Model):
+    """Timestamped record of every successful report status transition"""
+    __tablename__ = 'report_transitions'
+
+    id = db.Column(db.Integer, primary_key=True)
+    report_id = db.Column(db.String(36), nullable=False, index=True)
+    from_status = db.Column(db.String(20), nullable=False)
+    to_status = db.Column(db.String(20), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<ReportTransition {self.report_id}: {self.from_status} -> {self.to_status}>'
+
+    def to_dict(self):
+        return {
+            'report_id': self.report_id,
+            'from_status': self.from_status,
+            'to_status': self.to_status,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
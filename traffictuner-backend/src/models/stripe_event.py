@@ -0,0 +1,140 @@
+from src.models.user import db
+from datetime import datetime, timedelta
+from sqlalchemy import or_, and_
+from sqlalchemy.exc import IntegrityError
+import json
+
+class StripeWebhookEvent(db.Model):
+    """Verified Stripe webhook event, stored by event id and processed exactly once"""
+    __tablename__ = 'stripe_webhook_events'
+
+    # Processing is retried this many times before the event is left as failed
+    MAX_ATTEMPTS = 5
+    # Failed events are retried, and abandoned claims taken over, after these delays
+    RETRY_DELAY = timedelta(minutes=1)
+    STALE_CLAIM = timedelta(minutes=5)
+
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    type = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False)  # Event JSON as sent by Stripe
+
+    # Processing state
+    status = db.Column(db.String(20), default='received', index=True)  # received, processing, processed, failed
+    attempts = db.Column(db.Integer, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+
+    # Timestamps
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    def __repr__(self):
+        return f'<StripeWebhookEvent {self.event_id} {self.type}: {self.status}>'
+
+    def to_dict(self):
+        return {
+            'event_id': self.event_id,
+            'type': self.type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'last_error': self.last_error,
+            'received_at': self.received_at.isoformat() if self.received_at else None,
+            'processed_at': self.processed_at.isoformat() if self.processed_at else None
+        }
+
+    def get_payload(self):
+        return json.loads(self.payload)
+
+    @staticmethod
+    def record(event_id, event_type, payload):
+        """Store a newly received event and commit.
+
+        Returns False if the event was already stored, so that Stripe's
+        retries are acknowledged without being processed again.
+        """
+        if StripeWebhookEvent.query.filter_by(event_id=event_id).first():
+            return False
+
+        db.session.add(StripeWebhookEvent(event_id=event_id, type=event_type, payload=payload))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # A concurrent delivery of the same event got there first
+            db.session.rollback()
+            return False
+        return True
+
+    @staticmethod
+    def claimable():
+        """Filter for events that are due to be processed"""
+        now = datetime.utcnow()
+        return or_(
+            StripeWebhookEvent.status == 'received',
+            and_(
+                StripeWebhookEvent.status == 'failed',
+                StripeWebhookEvent.attempts < StripeWebhookEvent.MAX_ATTEMPTS,
+                StripeWebhookEvent.locked_at < now - StripeWebhookEvent.RETRY_DELAY
+            ),
+            and_(
+                StripeWebhookEvent.status == 'processing',
+                StripeWebhookEvent.locked_at < now - StripeWebhookEvent.STALE_CLAIM
+            )
+        )
+
+    @staticmethod
+    def pending(limit=100):
+        """Ids of events waiting to be processed, oldest first"""
+        rows = StripeWebhookEvent.query.with_entities(StripeWebhookEvent.event_id)\
+                .filter(StripeWebhookEvent.claimable())\
+                .order_by(StripeWebhookEvent.id).limit(limit).all()
+        db.session.rollback()
+        return [row.event_id for row in rows]
+
+    @staticmethod
+    def claim(event_id):
+        """Take an event for processing and commit.
+
+        Returns the claimed event, whose attempt number fences the later
+        finish or fail, or None if the event is not due or another
+        consumer holds it.
+        """
+        updated = StripeWebhookEvent.query.filter(
+            StripeWebhookEvent.event_id == event_id,
+            StripeWebhookEvent.claimable()
+        ).update({
+            StripeWebhookEvent.status: 'processing',
+            StripeWebhookEvent.attempts: StripeWebhookEvent.attempts + 1,
+            StripeWebhookEvent.locked_at: datetime.utcnow()
+        }, synchronize_session=False)
+        db.session.commit()
+        if updated != 1:
+            return None
+        return StripeWebhookEvent.query.populate_existing().filter_by(event_id=event_id).first()
+
+    @staticmethod
+    def _settle(event_id, attempt, values):
+        return StripeWebhookEvent.query.filter_by(
+            event_id=event_id, status='processing', attempts=attempt
+        ).update(values, synchronize_session=False) == 1
+
+    @staticmethod
+    def finish(event_id, attempt):
+        """Mark a claimed event processed in the handler's transaction.
+
+        Returns False if the claim was lost, in which case the caller must
+        roll back the handler's changes. The caller commits.
+        """
+        return StripeWebhookEvent._settle(event_id, attempt, {
+            StripeWebhookEvent.status: 'processed',
+            StripeWebhookEvent.processed_at: datetime.utcnow(),
+            StripeWebhookEvent.last_error: None
+        })
+
+    @staticmethod
+    def fail(event_id, attempt, error):
+        """Release a claimed event for a later retry; the caller commits"""
+        return StripeWebhookEvent._settle(event_id, attempt, {
+            StripeWebhookEvent.status: 'failed',
+            StripeWebhookEvent.last_error: error
+        })
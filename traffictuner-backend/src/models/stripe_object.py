@@ -0,0 +1,47 @@
+from src.models.user import db
+from datetime import datetime
+import json
+
+class StripeObject(db.Model):
+    """Local copy of a Stripe object (subscription, price, customer), kept fresh by webhooks"""
+    __tablename__ = 'stripe_objects'
+
+    id = db.Column(db.Integer, primary_key=True)
+    object_id = db.Column(db.String(255), unique=True, nullable=False, index=True)
+    object_type = db.Column(db.String(50), nullable=False)  # subscription, price, customer
+    data = db.Column(db.Text, nullable=False)  # Object JSON as returned by Stripe
+
+    # Creation time of the event that last wrote this copy, so that
+    # webhooks delivered out of order cannot overwrite newer data
+    source_created = db.Column(db.Integer, nullable=True)
+
+    # Timestamps
+    fetched_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<StripeObject {self.object_type} {self.object_id}>'
+
+    def get_data(self):
+        return json.loads(self.data)
+
+    def age(self):
+        """Seconds since this copy was written"""
+        return (datetime.utcnow() - self.fetched_at).total_seconds()
+
+    @staticmethod
+    def store(object_type, data, source_created=None):
+        """Create or replace the local copy of an object; the caller commits.
+
+        Returns False if the copy was kept because it came from a newer event.
+        """
+        stored = StripeObject.query.filter_by(object_id=data['id']).first()
+        if not stored:
+            stored = StripeObject(object_id=data['id'], object_type=object_type)
+            db.session.add(stored)
+        elif source_created and stored.source_created and stored.source_created > source_created:
+            return False
+
+        stored.data = json.dumps(data)
+        stored.source_created = source_created or stored.source_created
+        stored.fetched_at = datetime.utcnow()
+        return True
@@ -70,13 +70,17 @@ class Subscription(db.Model):
         """Check if subscription has remaining credits"""
         return self.credits_remaining > 0
 
-    def use_credit(self):
-        """Use one credit from the subscription"""
-        if self.credits_remaining > 0:
-            self.credits_remaining -= 1
-            self.credits_used += 1
-            return True
-        return False
+    def use_credit(self, amount=1):
+        """Use credits from the subscription with a single conditional UPDATE"""
+        updated = Subscription.query.filter(
+            Subscription.id == self.id,
+            Subscription.credits_remaining >= amount
+        ).update({
+            Subscription.credits_remaining: Subscription.credits_remaining - amount,
+            Subscription.credits_used: Subscription.credits_used + amount
+        }, synchronize_session=False)
+        db.session.expire(self, ['credits_remaining', 'credits_used'])
+        return updated == 1
 
     def reset_monthly_credits(self):
         """Reset credits for new billing period"""
@@ -0,0 +1,53 @@
+from src.models.user import db
+from src.models.tracking_config import TrackingConfig
+from src.services.tracking_snippets import LoaderScript
+from datetime import datetime
+
+class TrackingScript(db.Model):
+    """Published tt.js loader for a domain, rendered and compressed when its configs change"""
+    __tablename__ = 'tracking_bundles'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    domain_id = db.Column(db.String(36), unique=True, nullable=False, index=True)
+    
+    # Script bodies, stored ready to serve
+    body = db.Column(db.LargeBinary, nullable=False)
+    body_gzip = db.Column(db.LargeBinary, nullable=False)
+    body_brotli = db.Column(db.LargeBinary, nullable=True)  # None when brotli is not installed
+    etag = db.Column(db.String(64), nullable=False)
+    config_count = db.Column(db.Integer, default=0)
+    
+    # Timestamps
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def __repr__(self):
+        return f'<TrackingScript {self.domain_id}: {self.etag}>'
+
+    def to_loader(self):
+        """Detach the stored bodies from the session for caching"""
+        return LoaderScript(self.body, self.body_gzip, self.body_brotli, self.etag)
+
+    @staticmethod
+    def publish(domain_id):
+        """Render and store the loader for a domain's active configs.
+
+        Configs added or changed in the current session are included. The
+        caller is responsible for committing.
+        """
+        configs = TrackingConfig.query.filter_by(domain_id=domain_id, is_active=True)\
+                    .order_by(TrackingConfig.config_id).all()
+        loader = LoaderScript.build(configs)
+        
+        script = TrackingScript.query.filter_by(domain_id=domain_id).first()
+        if not script:
+            script = TrackingScript(domain_id=domain_id)
+            db.session.add(script)
+        
+        if script.etag != loader.etag:
+            script.body = loader.body
+            script.body_gzip = loader.body_gzip
+            script.body_brotli = loader.body_brotli
+            script.etag = loader.etag
+            script.updated_at = datetime.utcnow()
+        script.config_count = len(configs)
+        return script
@@ -7,6 +7,7 @@ from src.models.user import db
 from datetime import datetime
 from sqlalchemy import Column, Integer, String, Text, DateTime, Boolean, ForeignKey
 from sqlalchemy.orm import relationship
+from src.services.tracking_snippets import render_snippet
 
 class TrackingConfig(db.Model):
     __tablename__ = 'tracking_configs'
@@ -85,70 +86,4 @@ class TrackingConfig(db.Model):
     @staticmethod
     def generate_tracking_code(platform, tracking_id, settings=None):
         """Generate the tracking code for different platforms"""
-        
-        if platform == 'meta_pixel':
-            return f"""
-<!-- Meta Pixel Code -->
-<script>
-!function(f,b,e,v,n,t,s)
-{{if(f.fbq)return;n=f.fbq=function(){{n.callMethod?
-n.callMethod.apply(n,arguments):n.queue.push(arguments)}};
-if(!f._fbq)f._fbq=n;n.push=n;n.loaded=!0;n.version='2.0';
-n.queue=[];t=b.createElement(e);t.async=!0;
-t.src=v;s=b.getElementsByTagName(e)[0];
-s.parentNode.insertBefore(t,s)}}(window, document,'script',
-'https://connect.facebook.net/en_US/fbevents.js');
-fbq('init', '{tracking_id}');
-fbq('track', 'PageView');
-</script>
-<noscript><img height="1" width="1" style="display:none"
-src="https://www.facebook.com/tr?id={tracking_id}&ev=PageView&noscript=1"
-/></noscript>
-<!-- End Meta Pixel Code -->
-"""
-        
-        elif platform == 'ga4':
-            return f"""
-<!-- Google Analytics 4 -->
-<script async src="https://www.googletagmanager.com/gtag/js?id={tracking_id}"></script>
-<script>
-  window.dataLayer = window.dataLayer || [];
-  function gtag(){{dataLayer.push(arguments);}}
-  gtag('js', new Date());
-  gtag('config', '{tracking_id}');
-</script>
-<!-- End Google Analytics 4 -->
-"""
-        
-        elif platform == 'gtm':
-            return f"""
-<!-- Google Tag Manager -->
-<script>(function(w,d,s,l,i){{w[l]=w[l]||[];w[l].push({{'gtm.start':
-new Date().getTime(),event:'gtm.js'}});var f=d.getElementsByTagName(s)[0],
-j=d.createElement(s),dl=l!='dataLayer'?'&l='+l:'';j.async=true;j.src=
-'https://www.googletagmanager.com/gtm.js?id='+i+dl;f.parentNode.insertBefore(j,f);
-}})(window,document,'script','dataLayer','{tracking_id}');</script>
-<!-- End Google Tag Manager -->
-
-<!-- Google Tag Manager (noscript) -->
-<noscript><iframe src="https://www.googletagmanager.com/ns.html?id={tracking_id}"
-height="0" width="0" style="display:none;visibility:hidden"></iframe></noscript>
-<!-- End Google Tag Manager (noscript) -->
-"""
-        
-        elif platform == 'clarity':
-            return f"""
-<!-- Microsoft Clarity -->
-<script type="text/javascript">
-    (function(c,l,a,r,i,t,y){{
-        c[a]=c[a]||function(){{(c[a].q=c[a].q||[]).push(arguments)}};
-        t=l.createElement(r);t.async=1;t.src="https://www.clarity.ms/tag/"+i;
-        y=l.getElementsByTagName(r)[0];y.parentNode.insertBefore(t,y);
-    }})(window, document, "clarity", "script", "{tracking_id}");
-</script>
-<!-- End Microsoft Clarity -->
-"""
-        
-        else:
-            return f"<!-- Unknown tracking platform: {platform} -->"
-
+        return render_snippet(platform, tracking_id, settings)
@@ -0,0 +1,69 @@
+from src.models.user import db
+from datetime import datetime
+
+class UsageEntry(db.Model):
+    """Append-only ledger of credit changes and LLM usage, written in batches by the usage ledger"""
+    __tablename__ = 'usage_ledger'
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False, index=True)
+    report_id = db.Column(db.String(36), nullable=True, index=True)
+    llm_config_id = db.Column(db.Integer, nullable=True)
+
+    # What was used
+    source = db.Column(db.String(30), nullable=False)  # analysis, refund, subscription, renewal, purchase, admin, llm, llm_test
+    credit_delta = db.Column(db.Integer, default=0)
+    tokens = db.Column(db.Integer, default=0)
+    cost = db.Column(db.Float, default=0.0)
+
+    # Timestamps
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
+    def __repr__(self):
+        return f'<UsageEntry {self.source} for User {self.user_id}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'report_id': self.report_id,
+            'source': self.source,
+            'credit_delta': self.credit_delta,
+            'tokens': self.tokens,
+            'cost': self.cost,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class UsageDaily(db.Model):
+    """Per-user, per-day rollup of the usage ledger"""
+    __tablename__ = 'usage_daily'
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', name='uq_usage_daily_user_day'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)
+
+    # Totals for the day
+    credits_spent = db.Column(db.Integer, default=0)
+    credits_added = db.Column(db.Integer, default=0)
+    tokens = db.Column(db.Integer, default=0)
+    cost = db.Column(db.Float, default=0.0)
+    entries = db.Column(db.Integer, default=0)
+
+    def __repr__(self):
+        return f'<UsageDaily {self.day} for User {self.user_id}>'
+
+    def to_dict(self):
+        return {
+            'date': self.day.isoformat(),
+            'credits_spent': self.credits_spent,
+            'credits_added': self.credits_added,
+            'tokens': self.tokens,
+            'cost': round(self.cost or 0.0, 6),
+            'entries': self.entries
+        }
+
+    @staticmethod
+    def for_user(user_pk, since):
+        """Daily rollups for a user from ``since`` (a date) on"""
+        return UsageDaily.query.filter(UsageDaily.user_id == user_pk, UsageDaily.day >= since)\
+                .order_by(UsageDaily.day).all()
@@ -1,9 +1,19 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from blinker import Namespace
 from datetime import datetime
 import uuid
 
 db = SQLAlchemy()
 
+# Sent with the user's primary key whenever a user row changes
+user_signals = Namespace()
+user_changed = user_signals.signal('user-changed')
+
+# Sent with the user's primary key and delta, source and report_id keywords
+# whenever credits are added or deducted
+credits_changed = user_signals.signal('credits-changed')
+
 class User(db.Model):
     __tablename__ = 'users'
     
@@ -82,14 +92,40 @@ class User(db.Model):
         """Check if user has credits to perform analysis"""
         return self.credits > 0
 
-    def deduct_credit(self):
+    def deduct_credit(self, source='analysis', report_id=None):
         """Deduct one credit from user"""
-        if self.credits > 0:
-            self.credits -= 1
-            return True
-        return False
+        deducted = User.deduct_credits(self.id, 1, source, report_id)
+        db.session.expire(self, ['credits'])
+        return deducted
 
-    def add_credits(self, amount):
+    def add_credits(self, amount, source='purchase'):
         """Add credits to user account"""
-        self.credits += amount
+        User.increase_credits(self.id, amount, source)
+        db.session.expire(self, ['credits'])
+
+    @staticmethod
+    def deduct_credits(user_pk, amount=1, source='analysis', report_id=None):
+        """Atomically deduct credits if the balance covers them.
+
+        Uses a single conditional UPDATE so concurrent requests from the same
+        account can neither overspend nor lose updates. Returns True if the
+        credits were deducted; the caller is responsible for committing.
+        """
+        updated = User.query.filter(User.id == user_pk, User.credits >= amount)\
+                    .update({User.credits: User.credits - amount}, synchronize_session=False)
+        if updated == 1:
+            user_changed.send(user_pk)
+            credits_changed.send(user_pk, delta=-amount, source=source, report_id=report_id)
+        return updated == 1
+
+    @staticmethod
+    def increase_credits(user_pk, amount, source='refund', report_id=None):
+        """Atomically return credits to a user's balance"""
+        User.query.filter(User.id == user_pk)\
+            .update({User.credits: User.credits + amount}, synchronize_session=False)
+        user_changed.send(user_pk)
+        credits_changed.send(user_pk, delta=amount, source=source, report_id=report_id)
 
+@event.listens_for(User, 'after_update')
+def _user_updated(mapper, connection, target):
+    user_changed.send(target.id)
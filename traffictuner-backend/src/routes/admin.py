@@ -1,12 +1,14 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
 from datetime import datetime
 
-from src.models.user import db, User
+from src.models.user import db, User, credits_changed
 from src.models.llm_config import LLMConfig
 from src.models.domain import Domain
 from src.models.analysis_report import AnalysisReport
 from src.models.subscription import Subscription
+from src.security_enhancements import rate_limit
+from src.services.llm_usage import get_llm_usage
 
 admin_bp = Blueprint('admin', __name__)
 
@@ -14,10 +16,7 @@ def require_admin():
     """Decorator to require admin role"""
     def decorator(f):
         def wrapper(*args, **kwargs):
-            user_id = get_jwt_identity()
-            user = User.query.filter_by(user_id=user_id).first()
-            
-            if not user or not user.is_admin():
+            if not current_user.is_admin():
                 return jsonify({'error': 'Admin access required'}), 403
             
             return f(*args, **kwargs)
@@ -237,6 +236,7 @@ def delete_llm_config(config_id):
         return jsonify({'error': 'Failed to delete LLM config', 'details': str(e)}), 500
 
 @admin_bp.route('/llm-configs/<config_id>/test', methods=['POST'])
+@rate_limit('llm_test')
 @jwt_required()
 @require_admin()
 def test_llm_config(config_id):
@@ -260,8 +260,7 @@ def test_llm_config(config_id):
             response, tokens_used = call_llm_api(test_prompt, config)
             
             # Record the test usage
-            config.record_usage(tokens_used)
-            db.session.commit()
+            get_llm_usage().record(config, tokens_used, current_user.id, 'llm_test')
             
             return jsonify({
                 'message': 'LLM configuration test successful',
@@ -324,15 +323,19 @@ def update_user_credits(user_id):
         credits = data['credits']
         action = data.get('action', 'set')  # set, add, subtract
         
+        previous_credits = user.credits
         if action == 'set':
             user.credits = credits
         elif action == 'add':
-            user.add_credits(credits)
+            user.add_credits(credits, 'admin')
         elif action == 'subtract':
             user.credits = max(0, user.credits - credits)
         else:
             return jsonify({'error': 'Invalid action'}), 400
         
+        if action != 'add' and user.credits != previous_credits:
+            credits_changed.send(user.id, delta=user.credits - previous_credits, source='admin', report_id=None)
+        
         user.updated_at = datetime.utcnow()
         db.session.commit()
         
@@ -1,49 +1,60 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from datetime import datetime
-import requests
-import json
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app
+from flask_jwt_extended import jwt_required, current_user
+from datetime import datetime, timedelta
+import csv
+import io
 import time
+import requests
 
-from src.models.user import db, User
+from src.models.user import db
 from src.models.domain import Domain
 from src.models.analysis_report import AnalysisReport
-from src.models.llm_config import LLMConfig
+from src.models.report_state import COMPLETED, TRANSITIONS
+from src.services.progress import get_broker, load_progress_events
+from src.security_enhancements import rate_limit
+from src.services.metrics import LLM_REQUEST_DURATION, LLM_TOKENS, LLM_ERRORS
+from src.services.circuit_breaker import get_llm_breakers, CircuitOpenError
+from src.services.http_cache import conditional_response, make_etag, IMMUTABLE, REVALIDATE
+from src.services.view_cache import view_cache
+from src.services.keyset import iter_keyset
 
 analysis_bp = Blueprint('analysis', __name__)
 
-def generate_llms_txt(domain_url, analysis_data):
-    """Generate LLMs.txt file content"""
-    llms_content = f"""# LLMs.txt for {domain_url}
-# Generated by TrafficTuner.site
-
-# Site Information
-Site: {domain_url}
-Description: {analysis_data.get('description', 'Website optimized for AI search engines')}
-Generated: {datetime.utcnow().isoformat()}
-
-# Content Guidelines
-- This site provides accurate and up-to-date information
-- Content is regularly reviewed and updated
-- All claims are backed by reliable sources
-
-# SEO Optimization
-SEO Score: {analysis_data.get('seo_score', 'N/A')}
-AEO Score: {analysis_data.get('aeo_score', 'N/A')}
-
-# Key Topics
-{chr(10).join([f"- {topic}" for topic in analysis_data.get('topics', [])])}
-
-# Contact Information
-Contact: {analysis_data.get('contact', 'Available on website')}
-
-# Last Updated
-{datetime.utcnow().strftime('%Y-%m-%d')}
-"""
-    return llms_content
+# Report columns of exports, in CSV column order; JSONL rows add the parsed analysis data
+EXPORT_FIELDS = [
+    'report_id', 'domain_id', 'domain_url', 'analysis_type', 'status', 'seo_score', 'aeo_score',
+    'overall_score', 'summary', 'processing_time', 'error_message', 'created_at', 'completed_at'
+]
+EXPORT_JSON_FIELDS = {
+    'seo_analysis': {}, 'aeo_analysis': {}, 'recommendations': [], 'competitor_analysis': {}
+}
+# Rows fetched from the database, and written to the response, at a time
+EXPORT_BATCH_SIZE = 500
 
 def call_llm_api(prompt, config):
     """Call LLM API with the given prompt and configuration"""
+    # Fail fast while the provider keeps failing
+    breaker = get_llm_breakers().get(config.config_id)
+    if not breaker.allow():
+        raise CircuitOpenError(f"LLM API call failed: circuit open for config {config.name}")
+    
+    labels = (config.config_id, config.provider)
+    start = time.perf_counter()
+    try:
+        content, tokens_used = request_completion(prompt, config)
+    except Exception:
+        breaker.record_failure()
+        LLM_ERRORS.inc(*labels)
+        raise
+    finally:
+        LLM_REQUEST_DURATION.observe(time.perf_counter() - start, *labels)
+    
+    breaker.record_success()
+    LLM_TOKENS.inc(*labels, amount=tokens_used)
+    return content, tokens_used
+
+def request_completion(prompt, config):
+    """Send the prompt to the configured provider, returning (content, tokens used)"""
     try:
         api_key = config.get_api_key()
         if not api_key:
@@ -111,163 +122,110 @@ def call_llm_api(prompt, config):
     except Exception as e:
         raise Exception(f"LLM API call failed: {str(e)}")
 
-def perform_seo_analysis(domain_url):
-    """Perform SEO analysis (mock implementation)"""
-    # This is a mock implementation
-    # In a real system, this would crawl the website and analyze SEO factors
-    
-    seo_data = {
-        'score': 75.5,
-        'factors': {
-            'title_tags': {'score': 85, 'status': 'good'},
-            'meta_descriptions': {'score': 70, 'status': 'needs_improvement'},
-            'headings': {'score': 80, 'status': 'good'},
-            'internal_links': {'score': 65, 'status': 'needs_improvement'},
-            'page_speed': {'score': 75, 'status': 'good'},
-            'mobile_friendly': {'score': 90, 'status': 'excellent'}
-        },
-        'recommendations': [
-            {
-                'category': 'Meta Descriptions',
-                'priority': 'high',
-                'description': 'Add compelling meta descriptions to improve click-through rates',
-                'impact': 'medium'
-            },
-            {
-                'category': 'Internal Linking',
-                'priority': 'medium',
-                'description': 'Improve internal link structure for better crawlability',
-                'impact': 'medium'
-            }
-        ]
-    }
-    
-    return seo_data
-
-def perform_aeo_analysis(domain_url, llm_config):
-    """Perform AEO (Answer Engine Optimization) analysis using LLM"""
-    try:
-        prompt = f"""
-        Analyze the website {domain_url} for Answer Engine Optimization (AEO). 
-        Provide a comprehensive analysis including:
-        
-        1. AEO Score (0-100)
-        2. Content structure analysis
-        3. Schema markup assessment
-        4. FAQ optimization
-        5. Featured snippet potential
-        6. Voice search readiness
-        7. AI-friendly content formatting
-        8. Recommendations for improvement
-        
-        Return the analysis in JSON format with the following structure:
-        {{
-            "score": <number>,
-            "factors": {{
-                "content_structure": {{"score": <number>, "status": "<status>"}},
-                "schema_markup": {{"score": <number>, "status": "<status>"}},
-                "faq_optimization": {{"score": <number>, "status": "<status>"}},
-                "featured_snippets": {{"score": <number>, "status": "<status>"}},
-                "voice_search": {{"score": <number>, "status": "<status>"}},
-                "ai_formatting": {{"score": <number>, "status": "<status>"}}
-            }},
-            "recommendations": [
-                {{
-                    "category": "<category>",
-                    "priority": "<high|medium|low>",
-                    "description": "<description>",
-                    "impact": "<high|medium|low>"
-                }}
-            ]
-        }}
-        """
-        
-        content, tokens_used = call_llm_api(prompt, llm_config)
-        
-        # Record usage
-        llm_config.record_usage(tokens_used)
-        db.session.commit()
-        
-        # Parse JSON response
-        try:
-            aeo_data = json.loads(content)
-            return aeo_data
-        except json.JSONDecodeError:
-            # Fallback if LLM doesn't return valid JSON
-            return {
-                'score': 70.0,
-                'factors': {
-                    'content_structure': {'score': 75, 'status': 'good'},
-                    'schema_markup': {'score': 60, 'status': 'needs_improvement'},
-                    'faq_optimization': {'score': 65, 'status': 'needs_improvement'},
-                    'featured_snippets': {'score': 70, 'status': 'good'},
-                    'voice_search': {'score': 75, 'status': 'good'},
-                    'ai_formatting': {'score': 80, 'status': 'good'}
-                },
-                'recommendations': [
-                    {
-                        'category': 'Schema Markup',
-                        'priority': 'high',
-                        'description': 'Implement structured data markup for better AI understanding',
-                        'impact': 'high'
-                    }
-                ]
-            }
-    
-    except Exception as e:
-        # Return default analysis if LLM call fails
-        return {
-            'score': 65.0,
-            'factors': {
-                'content_structure': {'score': 70, 'status': 'good'},
-                'schema_markup': {'score': 50, 'status': 'needs_improvement'},
-                'faq_optimization': {'score': 60, 'status': 'needs_improvement'},
-                'featured_snippets': {'score': 65, 'status': 'needs_improvement'},
-                'voice_search': {'score': 70, 'status': 'good'},
-                'ai_formatting': {'score': 75, 'status': 'good'}
-            },
-            'recommendations': [
-                {
-                    'category': 'AI Optimization',
-                    'priority': 'high',
-                    'description': 'Optimize content for AI search engines and answer engines',
-                    'impact': 'high'
-                }
-            ],
-            'error': str(e)
-        }
-
 @analysis_bp.route('/reports/<report_id>', methods=['GET'])
 @jwt_required()
 def get_report(report_id):
     """Get a specific analysis report"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
+        user = current_user
         
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        # Only the version columns are read until the client's copy is known to be stale
+        version = db.session.query(AnalysisReport.status, AnalysisReport.completed_at)\
+                    .filter_by(report_id=report_id, user_id=user.id).first()
         
-        report = AnalysisReport.query.filter_by(report_id=report_id, user_id=user.id).first()
+        if not version:
+            return jsonify({'error': 'Report not found'}), 404
+        
+        def build():
+            report = AnalysisReport.query.filter_by(report_id=report_id, user_id=user.id).first()
+            return jsonify({'report': report.to_dict(include_full_data=True)})
+        
+        return conditional_response(
+            make_etag(report_id, version.status, version.completed_at),
+            build,
+            IMMUTABLE if version.status == COMPLETED else REVALIDATE
+        )
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to get report', 'details': str(e)}), 500
+
+def event_stream_response(generator):
+    """Wrap a server-sent event generator in a streaming response"""
+    return Response(
+        stream_with_context(generator),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no'
+        }
+    )
+
+@analysis_bp.route('/reports/<report_id>/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_report_events(report_id):
+    """Stream status and stage progress for a report as server-sent events"""
+    try:
+        user = current_user
+        
+        report = AnalysisReport.query.with_entities(
+            AnalysisReport.report_id, AnalysisReport.status
+        ).filter_by(report_id=report_id, user_id=user.id).first()
         
         if not report:
             return jsonify({'error': 'Report not found'}), 404
         
-        return jsonify({'report': report.to_dict(include_full_data=True)}), 200
+        owner_id = user.id
+        
+        def load_events(since):
+            events = load_progress_events(since, report_id=report.report_id)
+            if not events and since is None:
+                # Reports created before progress tracking have no progress row
+                events = [{
+                    'report_id': report.report_id,
+                    'user_id': owner_id,
+                    'status': report.status,
+                    'stage': report.status,
+                    'progress': 100 if report.status in ['completed', 'failed'] else 0,
+                    'message': None,
+                    'updated_at': None
+                }]
+            return events
+        
+        return event_stream_response(
+            get_broker().stream([f"report:{report.report_id}"], load_events, report_stream=True)
+        )
         
     except Exception as e:
-        return jsonify({'error': 'Failed to get report', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to stream report events', 'details': str(e)}), 500
+
+@analysis_bp.route('/events', methods=['GET'])
+@jwt_required(locations=['headers', 'query_string'])
+def stream_user_events():
+    """Stream progress for all of the user's reports as server-sent events"""
+    try:
+        user = current_user
+        
+        # Only replay recent activity when the stream opens
+        window_start = datetime.utcnow() - timedelta(hours=1)
+        owner_id = user.id
+        
+        def load_events(since):
+            return load_progress_events(since or window_start, user_id=owner_id)
+        
+        return event_stream_response(
+            get_broker().stream([f"user:{owner_id}"], load_events)
+        )
+        
+    except Exception as e:
+        return jsonify({'error': 'Failed to stream events', 'details': str(e)}), 500
 
 @analysis_bp.route('/process/<report_id>', methods=['POST'])
+@rate_limit('analysis')
 @jwt_required()
 def process_analysis(report_id):
-    """Process a pending analysis report"""
+    """Queue a pending analysis report for background processing"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         report = AnalysisReport.query.filter_by(report_id=report_id, user_id=user.id).first()
         
@@ -277,76 +235,20 @@ def process_analysis(report_id):
         if report.status != 'pending':
             return jsonify({'error': 'Report is not pending'}), 400
         
-        domain = Domain.query.get(report.domain_id)
-        if not domain:
-            return jsonify({'error': 'Domain not found'}), 404
+        from src.services.analysis_worker import get_worker
+        worker = get_worker()
+        if not worker:
+            return jsonify({'error': 'Analysis worker is not available'}), 503
         
-        start_time = time.time()
+        # The worker claims the report with an atomic pending -> processing
+        # transition, so it is processed exactly once however often it is queued
+        queued = worker.queue_analysis(report.report_id)
         
-        try:
-            # Update status to processing
-            report.status = 'processing'
-            db.session.commit()
-            
-            # Perform SEO analysis
-            seo_data = perform_seo_analysis(domain.url)
-            report.seo_score = seo_data['score']
-            report.set_seo_analysis(seo_data)
-            
-            # Perform AEO analysis using LLM
-            llm_config = LLMConfig.get_active_config()
-            if llm_config:
-                aeo_data = perform_aeo_analysis(domain.url, llm_config)
-                report.aeo_score = aeo_data['score']
-                report.set_aeo_analysis(aeo_data)
-                
-                # Combine recommendations
-                all_recommendations = seo_data.get('recommendations', []) + aeo_data.get('recommendations', [])
-                report.set_recommendations(all_recommendations)
-            else:
-                # No LLM config available, use default AEO score
-                report.aeo_score = 60.0
-                report.set_aeo_analysis({'error': 'No LLM configuration available'})
-                report.set_recommendations(seo_data.get('recommendations', []))
-            
-            # Calculate overall score
-            report.calculate_overall_score()
-            
-            # Generate LLMs.txt file
-            llms_data = {
-                'description': f'Website analysis for {domain.url}',
-                'seo_score': report.seo_score,
-                'aeo_score': report.aeo_score,
-                'topics': ['SEO', 'AEO', 'Website Optimization'],
-                'contact': 'Available on website'
-            }
-            report.llms_file_content = generate_llms_txt(domain.url, llms_data)
-            
-            # Generate summary
-            report.summary = f"Analysis completed for {domain.url}. SEO Score: {report.seo_score:.1f}, AEO Score: {report.aeo_score:.1f}, Overall Score: {report.overall_score:.1f}"
-            
-            # Mark as completed
-            processing_time = time.time() - start_time
-            report.mark_completed(processing_time)
-            
-            # Update domain scores
-            domain.update_scores(report.seo_score, report.aeo_score)
-            domain.set_status('active')
-            
-            db.session.commit()
-            
-            return jsonify({
-                'message': 'Analysis completed successfully',
-                'report': report.to_dict(include_full_data=True)
-            }), 200
-            
-        except Exception as e:
-            # Mark as failed
-            report.mark_failed(str(e))
-            domain.set_status('error')
-            db.session.commit()
-            
-            return jsonify({'error': 'Analysis failed', 'details': str(e)}), 500
+        return jsonify({
+            'message': 'Analysis queued' if queued else 'Analysis already queued',
+            'report': report.to_dict(),
+            'events_url': f'/api/analysis/reports/{report.report_id}/events'
+        }), 202
         
     except Exception as e:
         return jsonify({'error': 'Failed to process analysis', 'details': str(e)}), 500
@@ -356,11 +258,7 @@ def process_analysis(report_id):
 def generate_llms_file():
     """Generate LLMs.txt file for a domain"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.get_json()
         domain_id = data.get('domain_id')
@@ -394,40 +292,155 @@ def generate_llms_file():
 def get_recommendations():
     """Get top recommendations for user"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Get latest reports for all user domains
-        latest_reports = []
-        for domain in user.domains:
-            latest_report = domain.get_latest_report()
-            if latest_report and latest_report.status == 'completed':
-                latest_reports.append(latest_report)
-        
-        # Collect all recommendations
-        all_recommendations = []
-        for report in latest_reports:
-            recommendations = report.get_recommendations()
-            for rec in recommendations:
-                rec['domain_url'] = Domain.query.get(report.domain_id).url
-                rec['report_id'] = report.report_id
-                all_recommendations.append(rec)
-        
-        # Sort by priority (high -> medium -> low)
-        priority_order = {'high': 3, 'medium': 2, 'low': 1}
-        all_recommendations.sort(key=lambda x: priority_order.get(x.get('priority', 'low'), 1), reverse=True)
-        
-        # Return top 10 recommendations
-        top_recommendations = all_recommendations[:10]
+        user = current_user
+        
+        def build():
+            # Get latest reports for all user domains
+            latest_reports = []
+            for domain in user.domains:
+                latest_report = domain.get_latest_report()
+                if latest_report and latest_report.status == 'completed':
+                    latest_reports.append(latest_report)
+            
+            # Collect all recommendations
+            all_recommendations = []
+            for report in latest_reports:
+                recommendations = report.get_recommendations()
+                for rec in recommendations:
+                    rec['domain_url'] = Domain.query.get(report.domain_id).url
+                    rec['report_id'] = report.report_id
+                    all_recommendations.append(rec)
+            
+            # Sort by priority (high -> medium -> low)
+            priority_order = {'high': 3, 'medium': 2, 'low': 1}
+            all_recommendations.sort(key=lambda x: priority_order.get(x.get('priority', 'low'), 1), reverse=True)
+            
+            # Return top 10 recommendations
+            top_recommendations = all_recommendations[:10]
+            
+            return {
+                'recommendations': top_recommendations,
+                'total': len(all_recommendations)
+            }
         
-        return jsonify({
-            'recommendations': top_recommendations,
-            'total': len(all_recommendations)
-        }), 200
+        return jsonify(view_cache.get_or_build('recommendations', user.id, build)), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to get recommendations', 'details': str(e)}), 500
 
+def parse_export_date(value, end=False):
+    """Parse a since/until export filter; a bare date as the end of a range covers that whole day"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value)
+    if end and len(value) == 10:
+        parsed += timedelta(days=1)
+    return parsed
+
+def load_export_json(text, default):
+    """Parse a stored JSON column, falling back like the report's getters do"""
+    if not text:
+        return default
+    try:
+        return current_app.json.loads(text)
+    except ValueError:
+        return default
+
+@analysis_bp.route('/export', methods=['GET'])
+@rate_limit('export')
+@jwt_required()
+def export_reports():
+    """Stream the current user's reports across all domains as JSONL or CSV.
+
+    Filters: domain_id (repeatable), status (repeatable), since and until
+    (ISO dates or timestamps on created_at; until is exclusive, or covers
+    the whole day when it is a bare date). Rows are read in keyset batches
+    and written as they arrive, so the result set is never held in memory
+    and no read stays open while the client downloads it.
+    """
+    export_format = request.args.get('format', 'jsonl')
+    if export_format not in ['jsonl', 'csv']:
+        return jsonify({'error': 'Unsupported format. Must be jsonl or csv'}), 400
+    
+    statuses = request.args.getlist('status')
+    if any(status not in TRANSITIONS for status in statuses):
+        return jsonify({'error': f"Invalid status. Must be one of: {', '.join(TRANSITIONS)}"}), 400
+    
+    try:
+        since = parse_export_date(request.args.get('since'))
+        until = parse_export_date(request.args.get('until'), end=True)
+    except ValueError:
+        return jsonify({'error': 'Invalid date. Use YYYY-MM-DD or an ISO 8601 timestamp'}), 400
+    
+    columns = [
+        AnalysisReport.id, AnalysisReport.report_id, Domain.domain_id, Domain.url.label('domain_url'),
+        AnalysisReport.analysis_type, AnalysisReport.status, AnalysisReport.seo_score,
+        AnalysisReport.aeo_score, AnalysisReport.overall_score, AnalysisReport.summary,
+        AnalysisReport.processing_time, AnalysisReport.error_message,
+        AnalysisReport.created_at, AnalysisReport.completed_at, AnalysisReport.recommendations
+    ]
+    if export_format == 'jsonl':
+        columns += [
+            AnalysisReport.seo_analysis, AnalysisReport.aeo_analysis,
+            AnalysisReport.competitor_analysis, AnalysisReport.llms_file_content
+        ]
+    
+    query = db.session.query(*columns)\
+        .join(Domain, Domain.id == AnalysisReport.domain_id)\
+        .filter(AnalysisReport.user_id == current_user.id)
+    
+    domain_ids = request.args.getlist('domain_id')
+    if domain_ids:
+        query = query.filter(Domain.domain_id.in_(domain_ids))
+    if statuses:
+        query = query.filter(AnalysisReport.status.in_(statuses))
+    if since:
+        query = query.filter(AnalysisReport.created_at >= since)
+    if until:
+        query = query.filter(AnalysisReport.created_at < until)
+    
+    def export_row(report):
+        row = {field: getattr(report, field) for field in EXPORT_FIELDS}
+        row['created_at'] = report.created_at.isoformat() if report.created_at else None
+        row['completed_at'] = report.completed_at.isoformat() if report.completed_at else None
+        return row
+    
+    reports = iter_keyset(query, [AnalysisReport.id], lambda report: report, batch_size=EXPORT_BATCH_SIZE)
+    
+    def generate_jsonl():
+        serialize = current_app.json.serialize
+        lines = []
+        for report in reports:
+            row = export_row(report)
+            for field, default in EXPORT_JSON_FIELDS.items():
+                row[field] = load_export_json(getattr(report, field), default)
+            row['llms_file_content'] = report.llms_file_content
+            lines.append(serialize(row))
+            if len(lines) >= EXPORT_BATCH_SIZE:
+                yield b'\n'.join(lines) + b'\n'
+                lines = []
+        if lines:
+            yield b'\n'.join(lines) + b'\n'
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS + ['recommendations'])
+        writer.writeheader()
+        for n, report in enumerate(reports, 1):
+            row = export_row(report)
+            # Stored JSON text, as in the tracking config export
+            row['recommendations'] = report.recommendations or ''
+            writer.writerow(row)
+            if n % EXPORT_BATCH_SIZE == 0:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+        yield buffer.getvalue()
+    
+    generator = generate_csv() if export_format == 'csv' else generate_jsonl()
+    response = Response(
+        stream_with_context(generator),
+        mimetype='text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=reports.{export_format}'
+    return response
@@ -1,11 +1,12 @@
 from flask import Blueprint, request, jsonify, current_app
-from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
+from flask_jwt_extended import create_access_token, jwt_required, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
 from datetime import datetime, timedelta
 import re
 
 from src.models.user import db, User
 from src.models.subscription import Subscription
+from src.services.view_cache import view_cache
 
 auth_bp = Blueprint('auth', __name__)
 
@@ -92,7 +93,7 @@ def login():
         
         # Check rate limiting if security is available
         if security:
-            ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+            ip_address = request.remote_addr
             if security.is_ip_blocked(ip_address):
                 return jsonify({
                     'error': 'Too many failed attempts. Please try again later.',
@@ -114,7 +115,7 @@ def login():
         if not user or not check_password_hash(user.password_hash, password):
             # Record failed attempt if security is available
             if security:
-                ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+                ip_address = request.remote_addr
                 blocked = security.record_failed_attempt(ip_address)
                 if blocked:
                     return jsonify({
@@ -126,7 +127,7 @@ def login():
         
         # Successful login - clear failed attempts
         if security:
-            ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+            ip_address = request.remote_addr
             security.clear_failed_attempts(ip_address)
         
         # Update last login
@@ -153,18 +154,17 @@ def login():
 def get_current_user():
     """Get current user information"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
+        user = current_user
         
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        # Include subscription information
-        user_data = user.to_dict()
-        if user.subscription:
-            user_data['subscription'] = user.subscription.to_dict()
+        def build():
+            # Include subscription information
+            user_data = user.to_dict()
+            if user.subscription:
+                user_data['subscription'] = user.subscription.to_dict()
+            
+            return {'user': user_data}
         
-        return jsonify({'user': user_data}), 200
+        return jsonify(view_cache.get_or_build('me', user.id, build)), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to get user information', 'details': str(e)}), 500
@@ -174,11 +174,7 @@ def get_current_user():
 def update_profile():
     """Update user profile"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.get_json()
         
@@ -212,11 +208,7 @@ def update_profile():
 def change_password():
     """Change user password"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.get_json()
         
@@ -1,18 +1,25 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
 from datetime import datetime, timedelta
 import os
 import stripe
-import hmac
-import hashlib
+from sqlalchemy import func, case
 
 from src.models.user import db, User
 from src.models.subscription import Subscription
+from src.models.stripe_event import StripeWebhookEvent
+from src.models.usage import UsageDaily
+from src.services.webhook_consumer import get_webhook_consumer
+from src.services.stripe_cache import get_stripe_cache
+from src.services.view_cache import view_cache
 
 billing_bp = Blueprint('billing', __name__)
 
 # Stripe configuration
 stripe.api_key = os.environ.get('STRIPE_SECRET_KEY', 'sk_test_51234567890abcdef')
+if os.environ.get('STRIPE_API_BASE'):
+    # Point at a local stand-in such as benchmarks/fake_stripe.py
+    stripe.api_base = os.environ['STRIPE_API_BASE']
 STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY', 'pk_test_51234567890abcdef')
 STRIPE_WEBHOOK_SECRET = os.environ.get('STRIPE_WEBHOOK_SECRET', 'whsec_1234567890abcdef')
 
@@ -57,19 +64,36 @@ PRICING_PLANS = {
     }
 }
 
-def verify_webhook_signature(payload, signature):
-    """Verify Stripe webhook signature"""
+def construct_webhook_event(payload, signature):
+    """Verify a Stripe webhook's signature and parse its event, or return None if invalid"""
     try:
-        stripe.Webhook.construct_event(
+        return stripe.Webhook.construct_event(
             payload, signature, STRIPE_WEBHOOK_SECRET
         )
-        return True
     except ValueError:
         # Invalid payload
-        return False
+        return None
     except stripe.error.SignatureVerificationError:
         # Invalid signature
-        return False
+        return None
+
+def summarize_stripe_subscription(data):
+    """Pick the fields clients need from a cached Stripe subscription"""
+    if not data:
+        return None
+    
+    items = (data.get('items') or {}).get('data') or []
+    price = items[0].get('price') if items else None
+    return {
+        'status': data.get('status'),
+        'cancel_at_period_end': data.get('cancel_at_period_end'),
+        'current_period_end': data.get('current_period_end'),
+        'price': {
+            'id': price.get('id'),
+            'unit_amount': price.get('unit_amount'),
+            'currency': price.get('currency')
+        } if price else None
+    }
 
 @billing_bp.route('/plans', methods=['GET'])
 def get_pricing_plans():
@@ -88,11 +112,7 @@ def get_pricing_plans():
 def get_subscription():
     """Get current user's subscription"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         subscription = Subscription.query.filter_by(user_id=user.id).first()
         
@@ -103,8 +123,12 @@ def get_subscription():
                 'has_subscription': False
             }), 200
         
+        # Stripe's view of the subscription, from the local cache only
+        stripe_subscription = get_stripe_cache().peek('subscription', subscription.stripe_subscription_id)
+        
         return jsonify({
             'subscription': subscription.to_dict(),
+            'stripe_subscription': summarize_stripe_subscription(stripe_subscription),
             'credits': user.credits,
             'has_subscription': True
         }), 200
@@ -117,11 +141,7 @@ def get_subscription():
 def create_checkout_session():
     """Create Stripe checkout session"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.get_json()
         plan_name = data.get('plan')
@@ -178,11 +198,7 @@ def create_checkout_session():
 def create_portal_session():
     """Create Stripe customer portal session"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         if not user.stripe_customer_id:
             return jsonify({'error': 'No Stripe customer found'}), 404
@@ -206,184 +222,167 @@ def create_portal_session():
 
 @billing_bp.route('/webhook', methods=['POST'])
 def stripe_webhook():
-    """Handle Stripe webhooks"""
+    """Store a verified Stripe webhook event and acknowledge it.
+
+    Events are processed by the background webhook consumer; deliveries of
+    an event that is already stored are acknowledged without processing.
+    """
     try:
         payload = request.get_data()
         signature = request.headers.get('Stripe-Signature')
         
-        if not verify_webhook_signature(payload, signature):
+        event = construct_webhook_event(payload, signature)
+        if event is None:
             return jsonify({'error': 'Invalid signature'}), 400
         
-        event = stripe.Webhook.construct_event(
-            payload, signature, STRIPE_WEBHOOK_SECRET
-        )
+        if not StripeWebhookEvent.record(event['id'], event['type'], payload.decode('utf-8')):
+            return jsonify({'status': 'duplicate'}), 200
+        
+        consumer = get_webhook_consumer()
+        if consumer:
+            consumer.enqueue(event['id'])
         
-        # Handle different event types
-        if event['type'] == 'checkout.session.completed':
-            handle_checkout_completed(event['data']['object'])
-        elif event['type'] == 'customer.subscription.created':
-            handle_subscription_created(event['data']['object'])
-        elif event['type'] == 'customer.subscription.updated':
-            handle_subscription_updated(event['data']['object'])
-        elif event['type'] == 'customer.subscription.deleted':
-            handle_subscription_deleted(event['data']['object'])
-        elif event['type'] == 'invoice.payment_succeeded':
-            handle_payment_succeeded(event['data']['object'])
-        elif event['type'] == 'invoice.payment_failed':
-            handle_payment_failed(event['data']['object'])
-        
-        return jsonify({'status': 'success'}), 200
+        return jsonify({'status': 'received'}), 200
         
     except Exception as e:
+        db.session.rollback()
         return jsonify({'error': 'Webhook processing failed', 'details': str(e)}), 500
 
-def handle_checkout_completed(session):
+# Webhook handlers run in the webhook consumer, which commits their changes
+# together with marking the event processed. Exceptions are retried.
+
+def handle_checkout_completed(event):
     """Handle successful checkout completion"""
-    try:
-        user_id = session['metadata'].get('user_id')
-        plan_name = session['metadata'].get('plan_name')
-        
-        if not user_id or not plan_name:
-            return
-        
-        user = User.query.filter_by(user_id=user_id).first()
-        if not user:
-            return
-        
-        # Get the subscription from Stripe
-        subscription_id = session['subscription']
-        stripe_subscription = stripe.Subscription.retrieve(subscription_id)
-        
-        # Create or update local subscription
-        subscription = Subscription.query.filter_by(user_id=user.id).first()
-        if not subscription:
-            subscription = Subscription(user_id=user.id)
-            db.session.add(subscription)
-        
-        plan = PRICING_PLANS[plan_name]
-        subscription.stripe_subscription_id = subscription_id
-        subscription.stripe_customer_id = user.stripe_customer_id
-        subscription.plan_name = plan_name
-        subscription.status = 'active'
-        subscription.monthly_credits = plan['credits']
-        subscription.current_period_start = datetime.fromtimestamp(stripe_subscription['current_period_start'])
-        subscription.current_period_end = datetime.fromtimestamp(stripe_subscription['current_period_end'])
-        
-        # Add credits to user
-        user.add_credits(plan['credits'])
-        
-        db.session.commit()
-        
-    except Exception as e:
-        print(f"Error handling checkout completed: {str(e)}")
+    session = event['data']['object']
+    user_id = session['metadata'].get('user_id')
+    plan_name = session['metadata'].get('plan_name')
+    
+    if not user_id or not plan_name:
+        return
+    
+    user = User.query.filter_by(user_id=user_id).first()
+    if not user:
+        return
+    
+    # Usually cached from the subscription's own webhook; fetched otherwise
+    subscription_id = session['subscription']
+    stripe_subscription = get_stripe_cache().get('subscription', subscription_id)
+    
+    # Create or update local subscription
+    subscription = Subscription.query.filter_by(user_id=user.id).first()
+    if not subscription:
+        subscription = Subscription(user_id=user.id)
+        db.session.add(subscription)
+    
+    plan = PRICING_PLANS[plan_name]
+    subscription.stripe_subscription_id = subscription_id
+    subscription.stripe_customer_id = user.stripe_customer_id
+    subscription.plan_name = plan_name
+    subscription.status = 'active'
+    subscription.monthly_credits = plan['credits']
+    subscription.current_period_start = datetime.fromtimestamp(stripe_subscription['current_period_start'])
+    subscription.current_period_end = datetime.fromtimestamp(stripe_subscription['current_period_end'])
+    
+    # Add credits to user
+    user.add_credits(plan['credits'], 'subscription')
 
-def handle_subscription_created(subscription):
+def handle_subscription_created(event):
     """Handle subscription creation"""
-    try:
-        customer_id = subscription['customer']
-        user = User.query.filter_by(stripe_customer_id=customer_id).first()
-        
-        if not user:
-            return
-        
-        # Update subscription status
-        local_subscription = Subscription.query.filter_by(
-            stripe_subscription_id=subscription['id']
-        ).first()
-        
-        if local_subscription:
-            local_subscription.status = subscription['status']
-            db.session.commit()
-        
-    except Exception as e:
-        print(f"Error handling subscription created: {str(e)}")
+    subscription = event['data']['object']
+    get_stripe_cache().store('subscription', subscription, event['created'])
+    
+    customer_id = subscription['customer']
+    user = User.query.filter_by(stripe_customer_id=customer_id).first()
+    
+    if not user:
+        return
+    
+    # Update subscription status
+    local_subscription = Subscription.query.filter_by(
+        stripe_subscription_id=subscription['id']
+    ).first()
+    
+    if local_subscription:
+        local_subscription.status = subscription['status']
 
-def handle_subscription_updated(subscription):
+def handle_subscription_updated(event):
     """Handle subscription updates"""
-    try:
-        local_subscription = Subscription.query.filter_by(
-            stripe_subscription_id=subscription['id']
-        ).first()
-        
-        if not local_subscription:
-            return
-        
-        local_subscription.status = subscription['status']
-        local_subscription.current_period_start = datetime.fromtimestamp(subscription['current_period_start'])
-        local_subscription.current_period_end = datetime.fromtimestamp(subscription['current_period_end'])
-        
-        db.session.commit()
-        
-    except Exception as e:
-        print(f"Error handling subscription updated: {str(e)}")
+    subscription = event['data']['object']
+    get_stripe_cache().store('subscription', subscription, event['created'])
+    
+    local_subscription = Subscription.query.filter_by(
+        stripe_subscription_id=subscription['id']
+    ).first()
+    
+    if not local_subscription:
+        return
+    
+    local_subscription.status = subscription['status']
+    local_subscription.current_period_start = datetime.fromtimestamp(subscription['current_period_start'])
+    local_subscription.current_period_end = datetime.fromtimestamp(subscription['current_period_end'])
 
-def handle_subscription_deleted(subscription):
+def handle_subscription_deleted(event):
     """Handle subscription cancellation"""
-    try:
-        local_subscription = Subscription.query.filter_by(
-            stripe_subscription_id=subscription['id']
-        ).first()
-        
-        if not local_subscription:
-            return
-        
-        local_subscription.cancel()
-        db.session.commit()
-        
-    except Exception as e:
-        print(f"Error handling subscription deleted: {str(e)}")
+    subscription = event['data']['object']
+    get_stripe_cache().store('subscription', subscription, event['created'])
+    
+    local_subscription = Subscription.query.filter_by(
+        stripe_subscription_id=subscription['id']
+    ).first()
+    
+    if not local_subscription:
+        return
+    
+    local_subscription.cancel()
 
-def handle_payment_succeeded(invoice):
+def handle_payment_succeeded(event):
     """Handle successful payment"""
-    try:
-        subscription_id = invoice['subscription']
-        local_subscription = Subscription.query.filter_by(
-            stripe_subscription_id=subscription_id
-        ).first()
-        
-        if not local_subscription:
-            return
-        
-        # Reset monthly credits
-        user = User.query.get(local_subscription.user_id)
-        if user:
-            plan = PRICING_PLANS.get(local_subscription.plan_name)
-            if plan:
-                user.add_credits(plan['credits'])
-                local_subscription.credits_used = 0
-                db.session.commit()
-        
-    except Exception as e:
-        print(f"Error handling payment succeeded: {str(e)}")
+    invoice = event['data']['object']
+    subscription_id = invoice['subscription']
+    local_subscription = Subscription.query.filter_by(
+        stripe_subscription_id=subscription_id
+    ).first()
+    
+    if not local_subscription:
+        return
+    
+    # Reset monthly credits
+    user = User.query.get(local_subscription.user_id)
+    if user:
+        plan = PRICING_PLANS.get(local_subscription.plan_name)
+        if plan:
+            user.add_credits(plan['credits'], 'renewal')
+            local_subscription.credits_used = 0
 
-def handle_payment_failed(invoice):
+def handle_payment_failed(event):
     """Handle failed payment"""
-    try:
-        subscription_id = invoice['subscription']
-        local_subscription = Subscription.query.filter_by(
-            stripe_subscription_id=subscription_id
-        ).first()
-        
-        if not local_subscription:
-            return
-        
-        # Mark subscription as past due
-        local_subscription.status = 'past_due'
-        db.session.commit()
-        
-    except Exception as e:
-        print(f"Error handling payment failed: {str(e)}")
+    invoice = event['data']['object']
+    subscription_id = invoice['subscription']
+    local_subscription = Subscription.query.filter_by(
+        stripe_subscription_id=subscription_id
+    ).first()
+    
+    if not local_subscription:
+        return
+    
+    # Mark subscription as past due
+    local_subscription.status = 'past_due'
+
+WEBHOOK_HANDLERS = {
+    'checkout.session.completed': handle_checkout_completed,
+    'customer.subscription.created': handle_subscription_created,
+    'customer.subscription.updated': handle_subscription_updated,
+    'customer.subscription.deleted': handle_subscription_deleted,
+    'invoice.payment_succeeded': handle_payment_succeeded,
+    'invoice.payment_failed': handle_payment_failed
+}
 
 @billing_bp.route('/credits/purchase', methods=['POST'])
 @jwt_required()
 def purchase_credits():
     """Purchase additional credits"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.get_json()
         credit_amount = data.get('credits', 10)
@@ -435,71 +434,131 @@ def purchase_credits():
     except Exception as e:
         return jsonify({'error': 'Failed to purchase credits', 'details': str(e)}), 500
 
+def load_daily_usage(user_pk):
+    """Per-day analysis counts for a user, with their subscription and domain count, in one query.
+
+    Returns (subscription or None, domain count,
+    {'YYYY-MM-DD': {'analyses', 'completed', 'failed'}}).
+    """
+    from src.models.analysis_report import AnalysisReport
+    from src.models.domain import Domain
+    
+    day = func.date(AnalysisReport.created_at)
+    domain_count = db.session.query(func.count(Domain.id))\
+                    .filter(Domain.user_id == user_pk).scalar_subquery()
+    # Outer joins from the user row, so users without reports or a subscription still get a row
+    rows = db.session.query(
+        Subscription,
+        day.label('day'),
+        func.count(AnalysisReport.id).label('analyses'),
+        func.sum(case((AnalysisReport.status == 'completed', 1), else_=0)).label('completed'),
+        func.sum(case((AnalysisReport.status == 'failed', 1), else_=0)).label('failed'),
+        domain_count.label('domains')
+    ).select_from(User)\
+        .outerjoin(Subscription, Subscription.user_id == User.id)\
+        .outerjoin(AnalysisReport, AnalysisReport.user_id == User.id)\
+        .filter(User.id == user_pk)\
+        .group_by(day, Subscription.id).all()
+    
+    if not rows:
+        return None, 0, {}
+    
+    return rows[0].Subscription, rows[0].domains, {
+        str(row.day)[:10]: {'analyses': row.analyses, 'completed': row.completed, 'failed': row.failed}
+        for row in rows if row.day is not None
+    }
+
 @billing_bp.route('/usage', methods=['GET'])
 @jwt_required()
 def get_usage_stats():
     """Get user's usage statistics"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
+        user = current_user
+        
+        def build():
+            # Subscription info comes back with the usage counts
+            subscription, total_domains, daily = load_daily_usage(user.id)
+            
+            # Totals are rolled up from the per-day counts
+            now = datetime.utcnow()
+            current_month = now.strftime('%Y-%m')
+            total_analyses = sum(counts['analyses'] for counts in daily.values())
+            completed_analyses = sum(counts['completed'] for counts in daily.values())
+            monthly_analyses = sum(counts['analyses'] for day, counts in daily.items() if day.startswith(current_month))
+            
+            # Histogram for the current billing period, one entry per day
+            if subscription and subscription.current_period_start and subscription.current_period_start <= now:
+                period_start = subscription.current_period_start.date()
+            else:
+                period_start = now.date().replace(day=1)
+            
+            histogram = []
+            day = period_start
+            while day <= now.date():
+                counts = daily.get(day.isoformat(), {'analyses': 0, 'completed': 0, 'failed': 0})
+                histogram.append(dict(counts, date=day.isoformat()))
+                day += timedelta(days=1)
+            
+            usage_stats = {
+                'credits': {
+                    'current': user.credits,
+                    'monthly_limit': subscription.monthly_credits if subscription else 0,
+                    'used_this_month': subscription.credits_used if subscription else 0
+                },
+                'analyses': {
+                    'total': total_analyses,
+                    'completed': completed_analyses,
+                    'this_month': monthly_analyses
+                },
+                'domains': {
+                    'total': total_domains
+                },
+                'period': {
+                    'start': period_start.isoformat(),
+                    'end': subscription.current_period_end.date().isoformat() if subscription and subscription.current_period_end else None,
+                    'daily': histogram
+                },
+                'subscription': subscription.to_dict() if subscription else None
+            }
+            
+            return {'usage': usage_stats}
         
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        return jsonify(view_cache.get_or_build('usage', user.id, build)), 200
         
-        # Get subscription info
-        subscription = Subscription.query.filter_by(user_id=user.id).first()
+    except Exception as e:
+        return jsonify({'error': 'Failed to get usage stats', 'details': str(e)}), 500
+
+@billing_bp.route('/usage/daily', methods=['GET'])
+@jwt_required()
+def get_daily_usage():
+    """Get the user's credit and LLM usage per day from the usage ledger rollups"""
+    try:
+        user = current_user
+        
+        days = min(max(request.args.get('days', 30, type=int), 1), 366)
+        since = datetime.utcnow().date() - timedelta(days=days - 1)
+        rollups = UsageDaily.for_user(user.id, since)
         
-        # Calculate usage statistics
-        from src.models.analysis_report import AnalysisReport
-        from src.models.domain import Domain
-        
-        total_analyses = AnalysisReport.query.filter_by(user_id=user.id).count()
-        completed_analyses = AnalysisReport.query.filter_by(
-            user_id=user.id, 
-            status='completed'
-        ).count()
-        
-        total_domains = Domain.query.filter_by(user_id=user.id).count()
-        
-        # Get current month usage
-        current_month_start = datetime.utcnow().replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-        monthly_analyses = AnalysisReport.query.filter(
-            AnalysisReport.user_id == user.id,
-            AnalysisReport.created_at >= current_month_start
-        ).count()
-        
-        usage_stats = {
-            'credits': {
-                'current': user.credits,
-                'monthly_limit': subscription.monthly_credits if subscription else 0,
-                'used_this_month': subscription.credits_used if subscription else 0
-            },
-            'analyses': {
-                'total': total_analyses,
-                'completed': completed_analyses,
-                'this_month': monthly_analyses
-            },
-            'domains': {
-                'total': total_domains
-            },
-            'subscription': subscription.to_dict() if subscription else None
-        }
-        
-        return jsonify({'usage': usage_stats}), 200
+        return jsonify({
+            'since': since.isoformat(),
+            'daily': [rollup.to_dict() for rollup in rollups],
+            'totals': {
+                'credits_spent': sum(rollup.credits_spent for rollup in rollups),
+                'credits_added': sum(rollup.credits_added for rollup in rollups),
+                'tokens': sum(rollup.tokens for rollup in rollups),
+                'cost': round(sum(rollup.cost for rollup in rollups), 6)
+            }
+        }), 200
         
     except Exception as e:
-        return jsonify({'error': 'Failed to get usage stats', 'details': str(e)}), 500
+        return jsonify({'error': 'Failed to get daily usage', 'details': str(e)}), 500
 
 @billing_bp.route('/cancel-subscription', methods=['POST'])
 @jwt_required()
 def cancel_subscription():
     """Cancel user's subscription"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         subscription = Subscription.query.filter_by(user_id=user.id).first()
         
@@ -507,10 +566,11 @@ def cancel_subscription():
             return jsonify({'error': 'No active subscription found'}), 404
         
         # Cancel subscription in Stripe
-        stripe.Subscription.modify(
+        stripe_subscription = stripe.Subscription.modify(
             subscription.stripe_subscription_id,
             cancel_at_period_end=True
         )
+        get_stripe_cache().store('subscription', stripe_subscription)
         
         # Update local subscription
         subscription.status = 'canceled'
@@ -1,12 +1,20 @@
 from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask_jwt_extended import jwt_required, current_user
 from datetime import datetime
 import validators
+import uuid
 from urllib.parse import urlparse
 
-from src.models.user import db, User
+from src.models.user import db
 from src.models.domain import Domain
 from src.models.analysis_report import AnalysisReport
+from src.models.credit_reservation import CreditReservation
+from src.services.progress import get_broker
+from src.services.http_cache import conditional_response, make_etag
+from src.services.json_provider import stream_json, STREAM, STREAM_CHUNK_SIZE
+from src.services.keyset import iter_keyset
+from src.services.view_cache import view_cache
+from src.security_enhancements import rate_limit
 
 domains_bp = Blueprint('domains', __name__)
 
@@ -34,31 +42,30 @@ def validate_url(url):
 def get_domains():
     """Get all domains for the current user"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
-        
-        domains = Domain.query.filter_by(user_id=user.id).order_by(Domain.created_at.desc()).all()
-        
-        domains_data = []
-        for domain in domains:
-            domain_data = domain.to_dict()
-            # Add latest report info
-            latest_report = domain.get_latest_report()
-            if latest_report:
-                domain_data['latest_report'] = {
-                    'report_id': latest_report.report_id,
-                    'status': latest_report.status,
-                    'created_at': latest_report.created_at.isoformat()
-                }
-            domains_data.append(domain_data)
+        user = current_user
+        
+        def build():
+            domains = Domain.query.filter_by(user_id=user.id).order_by(Domain.created_at.desc()).all()
+            
+            domains_data = []
+            for domain in domains:
+                domain_data = domain.to_dict()
+                # Add latest report info
+                latest_report = domain.get_latest_report()
+                if latest_report:
+                    domain_data['latest_report'] = {
+                        'report_id': latest_report.report_id,
+                        'status': latest_report.status,
+                        'created_at': latest_report.created_at.isoformat()
+                    }
+                domains_data.append(domain_data)
+            
+            return {
+                'domains': domains_data,
+                'total': len(domains_data)
+            }
         
-        return jsonify({
-            'domains': domains_data,
-            'total': len(domains_data)
-        }), 200
+        return jsonify(view_cache.get_or_build('domains', user.id, build)), 200
         
     except Exception as e:
         return jsonify({'error': 'Failed to get domains', 'details': str(e)}), 500
@@ -68,11 +75,7 @@ def get_domains():
 def add_domain():
     """Add a new domain for analysis"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         data = request.get_json()
         
@@ -112,28 +115,36 @@ def add_domain():
 def get_domain(domain_id):
     """Get a specific domain"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         domain = Domain.query.filter_by(domain_id=domain_id, user_id=user.id).first()
         
         if not domain:
             return jsonify({'error': 'Domain not found'}), 404
         
-        domain_data = domain.to_dict()
-        
-        # Add reports
-        reports = AnalysisReport.query.filter_by(domain_id=domain.id)\
-                    .order_by(AnalysisReport.created_at.desc()).all()
-        domain_data['reports'] = [report.to_dict() for report in reports]
-        
-        # Add score trend
-        domain_data['score_trend'] = domain.get_score_trend()
-        
-        return jsonify({'domain': domain_data}), 200
+        def build():
+            domain_data = domain.to_dict()
+            
+            # Add score trend
+            domain_data['score_trend'] = domain.get_score_trend()
+            
+            # Reports are streamed in keyset batches, so long histories are never held in memory
+            # at once and no read stays open while a slow client downloads them
+            reports = iter_keyset(
+                AnalysisReport.query.filter_by(domain_id=domain.id),
+                [AnalysisReport.created_at, AnalysisReport.id],
+                lambda report: report.to_dict(),
+                batch_size=STREAM_CHUNK_SIZE,
+                descending=True
+            )
+            domain_data['reports'] = STREAM
+            
+            return stream_json({'domain': domain_data}, reports)
+        
+        return conditional_response(
+            make_etag(domain.domain_id, domain.updated_at, domain.get_reports_version()),
+            build
+        )
         
     except Exception as e:
         return jsonify({'error': 'Failed to get domain', 'details': str(e)}), 500
@@ -143,11 +154,7 @@ def get_domain(domain_id):
 def update_domain(domain_id):
     """Update domain information"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         domain = Domain.query.filter_by(domain_id=domain_id, user_id=user.id).first()
         
@@ -183,11 +190,7 @@ def update_domain(domain_id):
 def delete_domain(domain_id):
     """Delete a domain"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         domain = Domain.query.filter_by(domain_id=domain_id, user_id=user.id).first()
         
@@ -208,11 +211,7 @@ def delete_domain(domain_id):
 def get_domain_reports(domain_id):
     """Get all reports for a domain"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         domain = Domain.query.filter_by(domain_id=domain_id, user_id=user.id).first()
         
@@ -223,35 +222,38 @@ def get_domain_reports(domain_id):
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         
-        reports = AnalysisReport.query.filter_by(domain_id=domain.id)\
-                    .order_by(AnalysisReport.created_at.desc())\
-                    .paginate(page=page, per_page=per_page, error_out=False)
+        def build():
+            reports = AnalysisReport.query.filter_by(domain_id=domain.id)\
+                        .order_by(AnalysisReport.created_at.desc())\
+                        .paginate(page=page, per_page=per_page, error_out=False)
+            
+            return jsonify({
+                'reports': [report.to_dict() for report in reports.items],
+                'pagination': {
+                    'page': page,
+                    'per_page': per_page,
+                    'total': reports.total,
+                    'pages': reports.pages,
+                    'has_next': reports.has_next,
+                    'has_prev': reports.has_prev
+                }
+            })
         
-        return jsonify({
-            'reports': [report.to_dict() for report in reports.items],
-            'pagination': {
-                'page': page,
-                'per_page': per_page,
-                'total': reports.total,
-                'pages': reports.pages,
-                'has_next': reports.has_next,
-                'has_prev': reports.has_prev
-            }
-        }), 200
+        return conditional_response(
+            make_etag(domain.domain_id, domain.updated_at, domain.get_reports_version(), page, per_page),
+            build
+        )
         
     except Exception as e:
         return jsonify({'error': 'Failed to get reports', 'details': str(e)}), 500
 
 @domains_bp.route('/<domain_id>/analyze', methods=['POST'])
+@rate_limit('analysis')
 @jwt_required()
 def analyze_domain(domain_id):
     """Trigger analysis for a domain"""
     try:
-        user_id = get_jwt_identity()
-        user = User.query.filter_by(user_id=user_id).first()
-        
-        if not user:
-            return jsonify({'error': 'User not found'}), 404
+        user = current_user
         
         # Check if user has credits
         if not user.can_analyze():
@@ -275,22 +277,27 @@ def analyze_domain(domain_id):
         analysis_type = request.get_json().get('analysis_type', 'full')
         
         report = AnalysisReport(
+            report_id=str(uuid.uuid4()),
             domain_id=domain.id,
             user_id=user.id,
             analysis_type=analysis_type,
             status='pending'
         )
         
-        db.session.add(report)
+        # Reserve a credit; it is refunded if the analysis fails
+        if not CreditReservation.reserve(user.id, report.report_id):
+            db.session.rollback()
+            return jsonify({'error': 'Insufficient credits'}), 402
         
-        # Deduct credit
-        user.deduct_credit()
+        db.session.add(report)
         
         # Update domain status
         domain.set_status('analyzing')
         
         db.session.commit()
         
+        get_broker().record(report, 'queued')
+        
         # Queue analysis job for background processing
         from src.services.analysis_worker import get_worker
         worker = get_worker()
@@ -0,0 +1,21 @@
+from flask import Blueprint, jsonify
+
+from src.services.health import get_health, FAIL
+
+health_bp = Blueprint('health', __name__)
+
+def health_response(result):
+    response = jsonify(result)
+    response.status_code = 503 if result['status'] == FAIL else 200
+    response.headers['Cache-Control'] = 'no-store'
+    return response
+
+@health_bp.route('/live', methods=['GET'])
+def live():
+    """Liveness probe: fails only when the process should be restarted"""
+    return health_response(get_health().liveness())
+
+@health_bp.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe: cached database, worker, backlog and LLM circuit checks"""
+    return health_response(get_health().readiness())
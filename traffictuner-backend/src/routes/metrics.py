@@ -0,0 +1,16 @@
+from flask import Blueprint, Response, current_app, request, jsonify
+import hmac
+
+from src.services.metrics import get_registry, CONTENT_TYPE
+
+metrics_bp = Blueprint('metrics', __name__)
+
+@metrics_bp.route('/metrics', methods=['GET'])
+def metrics():
+    """Expose metrics in the Prometheus text format"""
+    # Scrapers authenticate with a static bearer token when METRICS_TOKEN is set
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and not hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return jsonify({'error': 'Invalid metrics token'}), 401
+
+    return Response(get_registry().render(), content_type=CONTENT_TYPE)
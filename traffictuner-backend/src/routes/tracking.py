@@ -3,15 +3,48 @@ Tracking Configuration Routes
 API endpoints for managing tracking codes (Meta Pixel, GA4, GTM, Clarity)
 """
 
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
+from flask import Blueprint, request, jsonify, make_response, Response, stream_with_context
+from flask_jwt_extended import jwt_required, get_jwt_identity, current_user
 from src.models.user import db, User
 from src.models.domain import Domain
 from src.models.tracking_config import TrackingConfig
+from src.models.tracking_bundle import TrackingScript
+from src.services.tracking_snippets import (
+    TrackingBundle, bundle_cache, script_cache, parse_settings, is_valid_tracking_id,
+    SCRIPT_MAX_AGE, SCRIPT_STALE_WHILE_REVALIDATE
+)
+from src.routes.domains import validate_url
+from sqlalchemy import insert, update, or_, tuple_
+from datetime import datetime
+import csv
+import hashlib
+import io
 import json
 
 tracking_bp = Blueprint('tracking', __name__)
 
+SUPPORTED_PLATFORMS = ['meta_pixel', 'ga4', 'gtm', 'clarity']
+
+# Columns of bulk imports and exports; domain is the domain's public id or URL
+BULK_FIELDS = ['domain', 'platform', 'tracking_id', 'name', 'settings', 'is_active']
+MAX_BULK_ROWS = 1000
+
+def get_user_domain(domain_id):
+    """Get a domain by its public id if it belongs to the current user"""
+    return Domain.query.filter_by(domain_id=domain_id, user_id=current_user.id).first()
+
+def publish_domains(domain_ids):
+    """Republish the tt.js loaders of domains whose configs changed; the caller commits"""
+    for domain_id in set(domain_ids):
+        if domain_id:
+            TrackingScript.publish(domain_id)
+
+def invalidate_domains(user_id, domain_ids):
+    """Drop cached bundles and loaders once changes to the domains are committed"""
+    for domain_id in set(domain_ids):
+        bundle_cache.invalidate(user_id, domain_id)
+        script_cache.invalidate(domain_id)
+
 @tracking_bp.route('/platforms', methods=['GET'])
 @jwt_required()
 def get_platforms():
@@ -33,7 +66,7 @@ def get_tracking_configs():
         current_user_id = get_jwt_identity()
         
         # Get query parameters
-        domain_id = request.args.get('domain_id', type=int)
+        domain_id = request.args.get('domain_id')
         platform = request.args.get('platform')
         
         # Build query
@@ -69,14 +102,16 @@ def create_tracking_config():
                 return jsonify({'error': f'Missing required field: {field}'}), 400
         
         # Validate platform
-        supported_platforms = ['meta_pixel', 'ga4', 'gtm', 'clarity']
-        if data['platform'] not in supported_platforms:
-            return jsonify({'error': f'Unsupported platform. Must be one of: {supported_platforms}'}), 400
+        if data['platform'] not in SUPPORTED_PLATFORMS:
+            return jsonify({'error': f'Unsupported platform. Must be one of: {SUPPORTED_PLATFORMS}'}), 400
+        
+        if not is_valid_tracking_id(data['tracking_id']):
+            return jsonify({'error': 'Invalid tracking ID. Use letters, digits, hyphens and underscores only'}), 400
         
         # Validate domain_id if provided
         domain_id = data.get('domain_id')
         if domain_id:
-            domain = Domain.query.filter_by(domain_id=domain_id, user_id=current_user_id).first()
+            domain = get_user_domain(domain_id)
             if not domain:
                 return jsonify({'error': 'Domain not found or access denied'}), 404
         
@@ -102,7 +137,9 @@ def create_tracking_config():
         )
         
         db.session.add(config)
+        publish_domains([config.domain_id])
         db.session.commit()
+        invalidate_domains(current_user_id, [config.domain_id])
         
         return jsonify({
             'tracking_config': config.to_dict(),
@@ -151,10 +188,14 @@ def update_tracking_config(config_id):
         if not config:
             return jsonify({'error': 'Tracking configuration not found'}), 404
         
+        previous_domain_id = config.domain_id
+        
         # Update fields
         if 'name' in data:
             config.name = data['name']
         if 'tracking_id' in data:
+            if not is_valid_tracking_id(data['tracking_id']):
+                return jsonify({'error': 'Invalid tracking ID. Use letters, digits, hyphens and underscores only'}), 400
             config.tracking_id = data['tracking_id']
         if 'settings' in data:
             config.settings = json.dumps(data['settings']) if data['settings'] else None
@@ -163,12 +204,14 @@ def update_tracking_config(config_id):
         if 'domain_id' in data:
             domain_id = data['domain_id']
             if domain_id:
-                domain = Domain.query.filter_by(domain_id=domain_id, user_id=current_user_id).first()
+                domain = get_user_domain(domain_id)
                 if not domain:
                     return jsonify({'error': 'Domain not found or access denied'}), 404
             config.domain_id = domain_id
         
+        publish_domains([previous_domain_id, config.domain_id])
         db.session.commit()
+        invalidate_domains(current_user_id, [previous_domain_id, config.domain_id])
         
         return jsonify({
             'tracking_config': config.to_dict(),
@@ -194,8 +237,11 @@ def delete_tracking_config(config_id):
         if not config:
             return jsonify({'error': 'Tracking configuration not found'}), 404
         
+        domain_id = config.domain_id
         db.session.delete(config)
+        publish_domains([domain_id])
         db.session.commit()
+        invalidate_domains(current_user_id, [domain_id])
         
         return jsonify({
             'message': 'Tracking configuration deleted successfully'
@@ -220,19 +266,11 @@ def get_tracking_code(config_id):
         if not config:
             return jsonify({'error': 'Tracking configuration not found'}), 404
         
-        # Parse settings
-        settings = None
-        if config.settings:
-            try:
-                settings = json.loads(config.settings)
-            except json.JSONDecodeError:
-                settings = None
-        
         # Generate tracking code
         tracking_code = TrackingConfig.generate_tracking_code(
             config.platform,
             config.tracking_id,
-            settings
+            parse_settings(config.settings)
         )
         
         return jsonify({
@@ -245,7 +283,7 @@ def get_tracking_code(config_id):
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
-@tracking_bp.route('/domain/<int:domain_id>/code', methods=['GET'])
+@tracking_bp.route('/domain/<domain_id>/code', methods=['GET'])
 @jwt_required()
 def get_domain_tracking_codes(domain_id):
     """Get all tracking codes for a specific domain"""
@@ -253,53 +291,86 @@ def get_domain_tracking_codes(domain_id):
         current_user_id = get_jwt_identity()
         
         # Verify domain ownership
-        domain = Domain.query.filter_by(domain_id=domain_id, user_id=current_user_id).first()
+        domain = get_user_domain(domain_id)
         if not domain:
             return jsonify({'error': 'Domain not found or access denied'}), 404
         
-        # Get all active tracking configs for this domain
-        configs = TrackingConfig.query.filter_by(
-            user_id=current_user_id,
-            domain_id=domain_id,
-            is_active=True
-        ).all()
-        
-        tracking_codes = []
-        for config in configs:
-            settings = None
-            if config.settings:
-                try:
-                    settings = json.loads(config.settings)
-                except json.JSONDecodeError:
-                    settings = None
-            
-            code = TrackingConfig.generate_tracking_code(
-                config.platform,
-                config.tracking_id,
-                settings
-            )
-            
-            tracking_codes.append({
-                'config_id': config.config_id,
-                'platform': config.platform,
-                'name': config.name,
-                'tracking_id': config.tracking_id,
-                'code': code
+        # Rendered codes are cached per domain until its configs change
+        bundle = bundle_cache.get(current_user_id, domain_id)
+        if bundle is None:
+            configs = TrackingConfig.query.filter_by(
+                user_id=current_user_id,
+                domain_id=domain_id,
+                is_active=True
+            ).all()
+            bundle = TrackingBundle.build(configs)
+            bundle_cache.set(current_user_id, domain_id, bundle)
+        
+        # The response also embeds the domain, so its last update is part of the ETag
+        domain_version = domain.updated_at.isoformat() if domain.updated_at else ''
+        etag = hashlib.sha256(f"{bundle.etag}:{domain_version}".encode()).hexdigest()[:32]
+        if request.if_none_match.contains_weak(etag):
+            response = make_response('', 304)
+        else:
+            response = jsonify({
+                'domain': domain.to_dict(),
+                'tracking_codes': bundle.tracking_codes,
+                'combined_code': bundle.combined_code,
+                'count': len(bundle.tracking_codes)
             })
         
-        # Combine all codes
-        combined_code = '\n'.join([tc['code'] for tc in tracking_codes])
-        
-        return jsonify({
-            'domain': domain.to_dict(),
-            'tracking_codes': tracking_codes,
-            'combined_code': combined_code,
-            'count': len(tracking_codes)
-        }), 200
+        response.set_etag(etag)
+        response.headers['Cache-Control'] = 'private, no-cache'
+        return response
         
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+@tracking_bp.route('/domain/<domain_id>/tt.js', methods=['GET'])
+def get_domain_loader(domain_id):
+    """Public loader script with a domain's active tracking codes, for embedding on the site"""
+    try:
+        found, script = script_cache.get(domain_id)
+        if not found:
+            stored = TrackingScript.query.filter_by(domain_id=domain_id).first()
+            if not stored and Domain.query.filter_by(domain_id=domain_id).first():
+                # Domains whose configs predate published loaders
+                stored = TrackingScript.publish(domain_id)
+                db.session.commit()
+            script = stored.to_loader() if stored else None
+            script_cache.set(domain_id, script)
+        
+        if script is None:
+            response = Response('/* Unknown domain */', status=404, mimetype='application/javascript')
+            response.headers['Cache-Control'] = f'public, max-age={SCRIPT_MAX_AGE}'
+            return response
+        
+        variants = script.variants()
+        encoding = request.accept_encodings.best_match([name for name, body in variants], default='identity')
+        body = dict(variants)[encoding]
+        
+        # Strong validators differ per content coding
+        etag = script.etag if encoding == 'identity' else f'{script.etag}-{encoding}'
+        if request.if_none_match.contains_weak(etag):
+            response = Response(status=304)
+        else:
+            response = Response(body, mimetype='application/javascript')
+            if encoding != 'identity':
+                response.headers['Content-Encoding'] = encoding
+        
+        response.set_etag(etag)
+        response.headers['Vary'] = 'Accept-Encoding'
+        response.headers['Cache-Control'] = (
+            f'public, max-age={SCRIPT_MAX_AGE}, stale-while-revalidate={SCRIPT_STALE_WHILE_REVALIDATE}'
+        )
+        return response
+        
+    except Exception as e:
+        db.session.rollback()
+        response = Response('/* Tracking script unavailable */', status=500, mimetype='application/javascript')
+        response.headers['Cache-Control'] = 'no-store'
+        return response
+
 @tracking_bp.route('/bulk-toggle', methods=['POST'])
 @jwt_required()
 def bulk_toggle_tracking():
@@ -314,13 +385,18 @@ def bulk_toggle_tracking():
         if not config_ids:
             return jsonify({'error': 'No configuration IDs provided'}), 400
         
-        # Update configurations
-        updated_count = TrackingConfig.query.filter(
+        selected = TrackingConfig.query.filter(
             TrackingConfig.config_id.in_(config_ids),
             TrackingConfig.user_id == current_user_id
-        ).update({TrackingConfig.is_active: is_active}, synchronize_session=False)
+        )
+        domain_ids = [row.domain_id for row in selected.with_entities(TrackingConfig.domain_id).distinct()]
         
+        # Update configurations
+        updated_count = selected.update({TrackingConfig.is_active: is_active}, synchronize_session=False)
+        
+        publish_domains(domain_ids)
         db.session.commit()
+        invalidate_domains(current_user_id, domain_ids)
         
         return jsonify({
             'message': f'Updated {updated_count} tracking configurations',
@@ -331,3 +407,231 @@ def bulk_toggle_tracking():
         db.session.rollback()
         return jsonify({'error': str(e)}), 500
 
+def read_bulk_rows():
+    """Read bulk import rows from a CSV body or upload, or a JSON list"""
+    upload = request.files.get('file')
+    if upload:
+        text = upload.read().decode('utf-8-sig')
+        if upload.filename and upload.filename.lower().endswith('.json'):
+            data = json.loads(text)
+        else:
+            return list(csv.DictReader(io.StringIO(text)))
+    elif request.mimetype in ['text/csv', 'application/csv']:
+        return list(csv.DictReader(io.StringIO(request.get_data(as_text=True))))
+    else:
+        data = request.get_json()
+    
+    if isinstance(data, dict):
+        data = data.get('configs')
+    if not isinstance(data, list) or not all(isinstance(row, dict) for row in data):
+        raise ValueError('Expected a list of tracking configurations')
+    return data
+
+def parse_bulk_settings(value):
+    """Settings arrive as an object (JSON) or a JSON string (CSV); returns the stored text"""
+    if value in [None, '', {}]:
+        return None
+    if isinstance(value, str):
+        value = json.loads(value)
+    if not isinstance(value, dict):
+        raise ValueError('settings must be a JSON object')
+    return json.dumps(value)
+
+def parse_bulk_flag(value):
+    if value in [None, '']:
+        return None
+    if isinstance(value, bool):
+        return value
+    if str(value).strip().lower() in ['1', 'true', 'yes']:
+        return True
+    if str(value).strip().lower() in ['0', 'false', 'no']:
+        return False
+    raise ValueError('is_active must be true or false')
+
+@tracking_bp.route('/bulk', methods=['POST'])
+@jwt_required()
+def bulk_upsert_tracking():
+    """Create or update many tracking configurations in one transaction.
+
+    Rows are matched to existing configurations by platform and tracking id.
+    Nothing is written unless every row is valid.
+    """
+    try:
+        current_user_id = get_jwt_identity()
+        
+        try:
+            rows = read_bulk_rows()
+        except (ValueError, UnicodeDecodeError, csv.Error) as e:
+            return jsonify({'error': 'Invalid import file', 'details': str(e)}), 400
+        
+        if not rows:
+            return jsonify({'error': 'No tracking configurations provided'}), 400
+        if len(rows) > MAX_BULK_ROWS:
+            return jsonify({'error': f'Too many rows. At most {MAX_BULK_ROWS} per import'}), 400
+        
+        # Resolve every referenced domain with one query
+        references = {str(row.get('domain') or '').strip() for row in rows} - {''}
+        urls = {}
+        for reference in references:
+            url, error = validate_url(reference)
+            if not error:
+                urls[reference] = url
+        
+        domains = Domain.query.filter(
+            Domain.user_id == current_user.id,
+            or_(Domain.domain_id.in_(references), Domain.url.in_(set(urls.values())))
+        ).all() if references else []
+        domain_ids = {domain.domain_id for domain in domains}
+        domain_ids_by_url = {domain.url: domain.domain_id for domain in domains}
+        
+        errors = []
+        configs = {}
+        for number, row in enumerate(rows, start=1):
+            platform = str(row.get('platform') or '').strip()
+            tracking_id = str(row.get('tracking_id') or '').strip()
+            name = str(row.get('name') or '').strip()
+            reference = str(row.get('domain') or '').strip()
+            
+            if platform not in SUPPORTED_PLATFORMS:
+                errors.append({'row': number, 'error': f'Unsupported platform: {platform}'})
+                continue
+            if not is_valid_tracking_id(tracking_id):
+                errors.append({'row': number, 'error': f'Invalid tracking ID: {tracking_id}'})
+                continue
+            if not name or len(name) > 255:
+                errors.append({'row': number, 'error': 'Name is required and must be at most 255 characters'})
+                continue
+            if (platform, tracking_id) in configs:
+                errors.append({'row': number, 'error': f'Duplicate of an earlier row: {platform} {tracking_id}'})
+                continue
+            
+            domain_id = None
+            if reference:
+                domain_id = reference if reference in domain_ids else domain_ids_by_url.get(urls.get(reference))
+                if not domain_id:
+                    errors.append({'row': number, 'error': f'Domain not found or access denied: {reference}'})
+                    continue
+            
+            try:
+                settings = parse_bulk_settings(row.get('settings'))
+                is_active = parse_bulk_flag(row.get('is_active'))
+            except ValueError as e:
+                errors.append({'row': number, 'error': str(e)})
+                continue
+            
+            configs[(platform, tracking_id)] = {
+                'domain_id': domain_id,
+                'platform': platform,
+                'tracking_id': tracking_id,
+                'name': name,
+                'settings': settings,
+                'is_active': is_active
+            }
+        
+        if errors:
+            return jsonify({'error': 'Validation failed', 'errors': errors}), 400
+        
+        # Find the rows that already exist with one query
+        existing = {
+            (config.platform, config.tracking_id): (config.config_id, config.domain_id)
+            for config in TrackingConfig.query.with_entities(
+                TrackingConfig.config_id, TrackingConfig.platform,
+                TrackingConfig.tracking_id, TrackingConfig.domain_id
+            ).filter(
+                TrackingConfig.user_id == current_user_id,
+                tuple_(TrackingConfig.platform, TrackingConfig.tracking_id).in_(list(configs))
+            )
+        }
+        
+        now = datetime.utcnow()
+        inserts = []
+        updates = []
+        affected_domains = set()
+        for key, values in configs.items():
+            affected_domains.add(values['domain_id'])
+            if values['is_active'] is None:
+                del values['is_active']
+            
+            if key in existing:
+                config_id, previous_domain_id = existing[key]
+                affected_domains.add(previous_domain_id)
+                updates.append(dict(values, config_id=config_id, updated_at=now))
+            else:
+                inserts.append(dict({'is_active': True}, **values, user_id=current_user_id, created_at=now, updated_at=now))
+        
+        # Rows without is_active keep their current state, so they update separately
+        if inserts:
+            db.session.execute(insert(TrackingConfig), inserts)
+        for has_flag in [True, False]:
+            batch = [values for values in updates if ('is_active' in values) == has_flag]
+            if batch:
+                db.session.execute(update(TrackingConfig), batch)
+        
+        publish_domains(affected_domains)
+        db.session.commit()
+        invalidate_domains(current_user_id, affected_domains)
+        
+        return jsonify({
+            'message': f'Imported {len(configs)} tracking configurations',
+            'created': len(inserts),
+            'updated': len(updates),
+            'count': len(configs)
+        }), 200
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+@tracking_bp.route('/export', methods=['GET'])
+@jwt_required()
+def export_tracking_configs():
+    """Stream all tracking configurations of the current user as CSV or JSON"""
+    export_format = request.args.get('format', 'csv')
+    if export_format not in ['csv', 'json']:
+        return jsonify({'error': 'Unsupported format. Must be csv or json'}), 400
+    
+    current_user_id = get_jwt_identity()
+    query = TrackingConfig.query.with_entities(
+        TrackingConfig.domain_id, TrackingConfig.platform, TrackingConfig.tracking_id,
+        TrackingConfig.name, TrackingConfig.settings, TrackingConfig.is_active
+    ).filter_by(user_id=current_user_id)\
+        .order_by(TrackingConfig.config_id)\
+        .execution_options(yield_per=500)
+    
+    def export_row(config):
+        return {
+            'domain': config.domain_id or '',
+            'platform': config.platform,
+            'tracking_id': config.tracking_id,
+            'name': config.name,
+            'settings': config.settings or '',
+            'is_active': 'true' if config.is_active else 'false'
+        }
+    
+    def generate_csv():
+        buffer = io.StringIO()
+        writer = csv.DictWriter(buffer, fieldnames=BULK_FIELDS)
+        writer.writeheader()
+        for config in query:
+            writer.writerow(export_row(config))
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+        yield buffer.getvalue()
+    
+    def generate_json():
+        yield '['
+        for n, config in enumerate(query):
+            row = export_row(config)
+            row['settings'] = parse_settings(config.settings)
+            row['is_active'] = bool(config.is_active)
+            yield (',' if n else '') + json.dumps(row)
+        yield ']'
+    
+    generator = generate_csv() if export_format == 'csv' else generate_json()
+    response = Response(
+        stream_with_context(generator),
+        mimetype='text/csv' if export_format == 'csv' else 'application/json'
+    )
+    response.headers['Content-Disposition'] = f'attachment; filename=tracking_configs.{export_format}'
+    return response
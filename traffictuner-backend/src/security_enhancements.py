@@ -4,23 +4,63 @@ Fixes for vulnerabilities identified in security assessment
 """
 
 from flask import Flask, request, jsonify
+from flask_jwt_extended import verify_jwt_in_request, get_jwt_identity, current_user
 from functools import wraps
 from datetime import datetime, timedelta
+import math
 import time
-from collections import defaultdict
-import threading
+
+from src.services.limiter_backends import create_backend
+from src.services.metrics import RATE_LIMIT_BLOCKS
+
+# Token bucket limits per rate limit group and subscription plan, as "<requests>/<period>".
+# Routes without a declared group fall under 'api' when the caller is authenticated.
+RATE_LIMITS = {
+    'api': {'free': '60/minute', 'starter': '120/minute', 'pro': '300/minute', 'agency': '1200/minute'},
+    'analysis': {'free': '3/minute', 'starter': '10/minute', 'pro': '30/minute', 'agency': '120/minute'},
+    'llm_test': {'free': '5/minute', 'starter': '5/minute', 'pro': '5/minute', 'agency': '5/minute'},
+    'export': {'free': '2/minute', 'starter': '5/minute', 'pro': '10/minute', 'agency': '30/minute'}
+}
+
+# Limits per client IP, whatever the plan
+IP_RATE_LIMITS = {
+    'api': '1200/minute',
+    'analysis': '120/minute',
+    'llm_test': '20/minute',
+    'export': '60/minute'
+}
+
+RATE_LIMIT_PERIODS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+def parse_rate_limit(limit):
+    """Parse "<requests>/<period>" into a token bucket (capacity, refill rate per second)"""
+    requests, period = limit.split('/')
+    capacity = int(requests)
+    return capacity, capacity / RATE_LIMIT_PERIODS[period]
+
+def rate_limit(group):
+    """Declare the rate limit group for a route; place it directly below the route decorator"""
+    def decorator(f):
+        f.rate_limit_group = group
+        return f
+    return decorator
 
 class SecurityEnhancements:
-    def __init__(self, app):
+    def __init__(self, app, backend=None):
         self.app = app
-        self.failed_attempts = defaultdict(list)
-        self.blocked_ips = defaultdict(datetime)
-        self.lock = threading.Lock()
+        # Failed attempts and blocks live in a backend shared by all workers
+        self.backend = backend or create_backend(app)
         
         # Configuration
         self.MAX_ATTEMPTS = 5
         self.BLOCK_DURATION = timedelta(minutes=15)
         self.ATTEMPT_WINDOW = timedelta(minutes=5)
+        self.RATE_LIMITS = app.config.get('RATE_LIMITS', RATE_LIMITS)
+        self.IP_RATE_LIMITS = app.config.get('IP_RATE_LIMITS', IP_RATE_LIMITS)
+        self.PLAN_CACHE_TTL = 60
+        
+        # user_id -> (expires at, plan name)
+        self.plan_cache = {}
         
     def add_security_headers(self, response):
         """Add security headers to all responses"""
@@ -39,53 +79,34 @@ class SecurityEnhancements:
     
     def is_ip_blocked(self, ip_address):
         """Check if IP address is currently blocked"""
-        with self.lock:
-            if ip_address in self.blocked_ips:
-                if datetime.now() < self.blocked_ips[ip_address]:
-                    return True
-                else:
-                    # Block expired, remove it
-                    del self.blocked_ips[ip_address]
-                    if ip_address in self.failed_attempts:
-                        del self.failed_attempts[ip_address]
-            return False
+        return self.backend.blocked_for(f"login:{ip_address}") > 0
     
     def record_failed_attempt(self, ip_address):
         """Record a failed login attempt"""
-        with self.lock:
-            now = datetime.now()
-            
-            # Clean old attempts outside the window
-            if ip_address in self.failed_attempts:
-                self.failed_attempts[ip_address] = [
-                    attempt for attempt in self.failed_attempts[ip_address]
-                    if now - attempt < self.ATTEMPT_WINDOW
-                ]
-            
-            # Add current attempt
-            self.failed_attempts[ip_address].append(now)
-            
-            # Check if should block
-            if len(self.failed_attempts[ip_address]) >= self.MAX_ATTEMPTS:
-                self.blocked_ips[ip_address] = now + self.BLOCK_DURATION
-                return True
-            
-            return False
+        key = f"login:{ip_address}"
+        attempts = self.backend.hit(key, self.ATTEMPT_WINDOW.total_seconds())
+        
+        # Check if should block
+        if attempts >= self.MAX_ATTEMPTS:
+            self.backend.block(key, self.BLOCK_DURATION.total_seconds())
+            self.backend.reset(key, self.ATTEMPT_WINDOW.total_seconds())
+            return True
+        
+        return False
     
     def clear_failed_attempts(self, ip_address):
         """Clear failed attempts for successful login"""
-        with self.lock:
-            if ip_address in self.failed_attempts:
-                del self.failed_attempts[ip_address]
+        self.backend.reset(f"login:{ip_address}", self.ATTEMPT_WINDOW.total_seconds())
     
     def rate_limit_decorator(self, f):
         """Decorator for rate limiting login attempts"""
         @wraps(f)
         def decorated_function(*args, **kwargs):
-            ip_address = request.environ.get('HTTP_X_FORWARDED_FOR', request.remote_addr)
+            ip_address = self.get_client_ip()
             
             # Check if IP is blocked
             if self.is_ip_blocked(ip_address):
+                RATE_LIMIT_BLOCKS.inc('login', 'ip')
                 return jsonify({
                     'error': 'Too many failed attempts. Please try again later.',
                     'retry_after': 900  # 15 minutes in seconds
@@ -98,6 +119,7 @@ class SecurityEnhancements:
             if hasattr(response, 'status_code') and response.status_code == 401:
                 blocked = self.record_failed_attempt(ip_address)
                 if blocked:
+                    RATE_LIMIT_BLOCKS.inc('login', 'ip')
                     return jsonify({
                         'error': 'Too many failed attempts. Account temporarily locked.',
                         'retry_after': 900
@@ -110,6 +132,68 @@ class SecurityEnhancements:
         
         return decorated_function
     
+    def get_client_ip(self):
+        """Get the client IP address; ProxyFix resolves it from trusted proxy headers (PROXY_COUNT)"""
+        return request.remote_addr
+    
+    def get_plan(self, user_id):
+        """Get the subscription plan used to pick a user's rate limits"""
+        now = time.time()
+        cached = self.plan_cache.get(user_id)
+        if cached and cached[0] > now:
+            return cached[1]
+        
+        subscription = current_user.subscription
+        plan = subscription.plan_name if subscription and subscription.is_active() else 'free'
+        
+        if len(self.plan_cache) > 10000:
+            self.plan_cache.clear()
+        self.plan_cache[user_id] = (now + self.PLAN_CACHE_TTL, plan)
+        return plan
+    
+    def check_rate_limits(self):
+        """Apply token bucket limits for the current request by user and by IP"""
+        if request.method == 'OPTIONS' or not request.endpoint:
+            return None
+        
+        view = self.app.view_functions.get(request.endpoint)
+        group = getattr(view, 'rate_limit_group', None)
+        
+        # Identify the caller from the JWT; invalid tokens are rejected by the route itself
+        user_id = None
+        try:
+            if verify_jwt_in_request(optional=True):
+                user_id = get_jwt_identity()
+        except Exception:
+            user_id = None
+        
+        if group is None:
+            if user_id is None or not request.path.startswith('/api/'):
+                return None
+            group = 'api'
+        
+        limits = [(f"rl:{group}:ip:{self.get_client_ip()}", self.IP_RATE_LIMITS[group])]
+        if user_id:
+            plan_limits = self.RATE_LIMITS[group]
+            limits.append((f"rl:{group}:user:{user_id}", plan_limits.get(self.get_plan(user_id), plan_limits['free'])))
+        
+        for key, limit in limits:
+            capacity, rate = parse_rate_limit(limit)
+            allowed, retry_after = self.backend.take(key, capacity, rate)
+            if not allowed:
+                RATE_LIMIT_BLOCKS.inc(group, key.split(':')[2])
+                retry_after = math.ceil(retry_after)
+                response = jsonify({
+                    'error': 'Rate limit exceeded. Please try again later.',
+                    'limit': limit,
+                    'retry_after': retry_after
+                })
+                response.status_code = 429
+                response.headers['Retry-After'] = str(retry_after)
+                return response
+        
+        return None
+    
     def setup_security_middleware(self):
         """Setup security middleware for the Flask app"""
         
@@ -119,14 +203,13 @@ class SecurityEnhancements:
         
         @self.app.before_request
         def security_checks():
-            # Add any pre-request security checks here
-            pass
+            return self.check_rate_limits()
         
         return self
 
-def init_security(app):
+def init_security(app, backend=None):
     """Initialize security enhancements"""
-    security = SecurityEnhancements(app)
+    security = SecurityEnhancements(app, backend)
     security.setup_security_middleware()
     return security
 
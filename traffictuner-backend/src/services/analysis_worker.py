@@ -9,6 +9,13 @@ from src.models.user import db
 from src.models.analysis_report import AnalysisReport
 from src.models.domain import Domain
 from src.models.llm_config import LLMConfig
+from src.models.credit_reservation import CreditReservation
+from src.services.progress import get_broker
+from src.services.llm_usage import get_llm_usage
+from src.services.view_cache import invalidate_user_views
+from src.services.metrics import (
+    ANALYSIS_QUEUE_DEPTH, ANALYSIS_QUEUE_OLDEST_AGE, ANALYSIS_JOB_WAIT, ANALYSIS_JOB_DURATION, ANALYSIS_JOBS
+)
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
@@ -19,9 +26,13 @@ class AnalysisWorker:
     
     def __init__(self, app):
         self.app = app
+        self.crawl_delay = app.config.get('ANALYSIS_CRAWL_DELAY', 2.0)
         self.task_queue = Queue()
+        self.queued_reports = set()
+        self.queue_lock = threading.Lock()
         self.is_running = False
         self.worker_thread = None
+        self.last_heartbeat = None
     
     def start(self):
         """Start the background worker"""
@@ -39,19 +50,48 @@ class AnalysisWorker:
         logger.info("Analysis worker stopped")
     
     def queue_analysis(self, report_id):
-        """Queue an analysis task"""
+        """Queue an analysis task, returning False if it is already queued"""
+        with self.queue_lock:
+            if report_id in self.queued_reports:
+                return False
+            self.queued_reports.add(report_id)
+        
         self.task_queue.put({
             'type': 'analysis',
             'report_id': report_id,
             'queued_at': datetime.utcnow().isoformat()
         })
         logger.info(f"Queued analysis task for report {report_id}")
+        return True
+    
+    def queue_depth(self):
+        """Number of tasks waiting for the worker"""
+        return self.task_queue.qsize()
+    
+    def is_alive(self):
+        """Whether the worker thread is running"""
+        return self.worker_thread is not None and self.worker_thread.is_alive()
+    
+    def heartbeat_age(self):
+        """Seconds since the worker loop last ran, or None before it has started"""
+        if self.last_heartbeat is None:
+            return None
+        return time.time() - self.last_heartbeat
+    
+    def oldest_task_age(self):
+        """Seconds the oldest waiting task has been queued, or 0 when the queue is empty"""
+        with self.task_queue.mutex:
+            oldest = self.task_queue.queue[0] if self.task_queue.queue else None
+        if oldest is None:
+            return 0.0
+        return (datetime.utcnow() - datetime.fromisoformat(oldest['queued_at'])).total_seconds()
     
     def _worker_loop(self):
         """Main worker loop"""
         logger.info("Worker loop started")
         
         while self.is_running:
+            self.last_heartbeat = time.time()
             try:
                 # Get task from queue (blocking with timeout)
                 try:
@@ -60,7 +100,12 @@ class AnalysisWorker:
                     continue
                 
                 if task['type'] == 'analysis':
+                    with self.queue_lock:
+                        self.queued_reports.discard(task['report_id'])
+                    ANALYSIS_JOB_WAIT.observe((datetime.utcnow() - datetime.fromisoformat(task['queued_at'])).total_seconds())
+                    started = time.perf_counter()
                     self._process_analysis_task(task)
+                    ANALYSIS_JOB_DURATION.observe(time.perf_counter() - started)
                 
                 self.task_queue.task_done()
                 
@@ -92,76 +137,103 @@ class AnalysisWorker:
                     logger.error(f"Domain not found for report {report_id}")
                     return
                 
-                # Update status to processing
-                report.status = 'processing'
-                db.session.commit()
-                
-                start_time = time.time()
-                
-                # Perform SEO analysis
-                seo_data = self._perform_seo_analysis(domain.url)
-                report.seo_score = seo_data['score']
-                report.set_seo_analysis(seo_data)
+                # Claim the report; another processor may have got there first.
+                # Status changes are bulk UPDATEs, so the user's cached views are dropped explicitly
+                invalidate_user_views(report.user_id)
+                if not AnalysisReport.claim_for_processing(report_id):
+                    logger.warning(f"Report {report_id} was already claimed by another processor")
+                    return
+                db.session.refresh(report)
                 
-                # Perform AEO analysis using LLM
-                llm_config = LLMConfig.get_active_config()
-                if llm_config and llm_config.is_available():
-                    aeo_data = self._perform_aeo_analysis(domain.url, llm_config)
-                    report.aeo_score = aeo_data['score']
-                    report.set_aeo_analysis(aeo_data)
+                # Report results stay unflushed until the final transition, so no write
+                # transaction (and, on SQLite, no database lock) is held during the
+                # crawl and LLM calls or while progress is recorded on its own session
+                with db.session.no_autoflush:
+                    broker = get_broker()
+                    broker.record(report, 'started')
                     
-                    # Combine recommendations
-                    all_recommendations = seo_data.get('recommendations', []) + aeo_data.get('recommendations', [])
-                    report.set_recommendations(all_recommendations)
-                else:
-                    # No LLM config available, use default AEO score
-                    report.aeo_score = 60.0
-                    report.set_aeo_analysis({'error': 'No LLM configuration available'})
-                    report.set_recommendations(seo_data.get('recommendations', []))
-                
-                # Calculate overall score
-                report.calculate_overall_score()
-                
-                # Generate LLMs.txt file
-                llms_data = {
-                    'description': f'Website analysis for {domain.url}',
-                    'seo_score': report.seo_score,
-                    'aeo_score': report.aeo_score,
-                    'topics': ['SEO', 'AEO', 'Website Optimization'],
-                    'contact': 'Available on website'
-                }
-                report.llms_file_content = self._generate_llms_txt(domain.url, llms_data)
-                
-                # Generate summary
-                report.summary = f"Analysis completed for {domain.url}. SEO Score: {report.seo_score:.1f}, AEO Score: {report.aeo_score:.1f}, Overall Score: {report.overall_score:.1f}"
+                    start_time = time.time()
+                    
+                    # Perform SEO analysis
+                    broker.record(report, 'seo_analysis')
+                    seo_data = self._perform_seo_analysis(domain.url)
+                    report.seo_score = seo_data['score']
+                    report.set_seo_analysis(seo_data)
+                    
+                    # Perform AEO analysis using LLM
+                    llm_config = LLMConfig.get_active_config()
+                    if llm_config and llm_config.is_available():
+                        broker.record(report, 'aeo_analysis')
+                        aeo_data = self._perform_aeo_analysis(domain.url, llm_config, report)
+                        report.aeo_score = aeo_data['score']
+                        report.set_aeo_analysis(aeo_data)
+                    
+                        # Combine recommendations
+                        all_recommendations = seo_data.get('recommendations', []) + aeo_data.get('recommendations', [])
+                        report.set_recommendations(all_recommendations)
+                    else:
+                        # No LLM config available, use default AEO score
+                        report.aeo_score = 60.0
+                        report.set_aeo_analysis({'error': 'No LLM configuration available'})
+                        report.set_recommendations(seo_data.get('recommendations', []))
+                    
+                    # Calculate overall score
+                    report.calculate_overall_score()
+                    
+                    # Generate LLMs.txt file
+                    broker.record(report, 'generating_llms_txt')
+                    llms_data = {
+                        'description': f'Website analysis for {domain.url}',
+                        'seo_score': report.seo_score,
+                        'aeo_score': report.aeo_score,
+                        'topics': ['SEO', 'AEO', 'Website Optimization'],
+                        'contact': 'Available on website'
+                    }
+                    report.llms_file_content = self._generate_llms_txt(domain.url, llms_data)
+                    
+                    # Generate summary
+                    report.summary = f"Analysis completed for {domain.url}. SEO Score: {report.seo_score:.1f}, AEO Score: {report.aeo_score:.1f}, Overall Score: {report.overall_score:.1f}"
                 
                 # Mark as completed
                 processing_time = time.time() - start_time
-                report.mark_completed(processing_time)
+                if not report.mark_completed(processing_time):
+                    db.session.rollback()
+                    logger.warning(f"Report {report_id} left processing before it could be completed")
+                    return
+                
+                CreditReservation.capture(report_id)
                 
                 # Update domain scores
                 domain.update_scores(report.seo_score, report.aeo_score)
                 domain.set_status('active')
                 
+                invalidate_user_views(report.user_id)
                 db.session.commit()
+                broker.record(report, 'completed')
+                ANALYSIS_JOBS.inc('completed')
                 
                 logger.info(f"Analysis completed for report {report_id} in {processing_time:.2f}s")
                 
             except Exception as e:
                 logger.error(f"Analysis failed for report {report_id}: {str(e)}")
+                ANALYSIS_JOBS.inc('failed')
                 
                 # Mark as failed
                 try:
-                    report.mark_failed(str(e))
-                    domain.set_status('error')
-                    db.session.commit()
+                    db.session.rollback()
+                    if report.mark_failed(str(e)):
+                        CreditReservation.refund(report_id)
+                        domain.set_status('error')
+                        invalidate_user_views(report.user_id)
+                        db.session.commit()
+                        get_broker().record(report, 'failed', message=str(e))
                 except:
                     pass
     
     def _perform_seo_analysis(self, domain_url):
         """Perform SEO analysis (mock implementation)"""
         # Simulate analysis time
-        time.sleep(2)
+        time.sleep(self.crawl_delay)
         
         # Mock SEO analysis results
         seo_data = {
@@ -192,7 +264,7 @@ class AnalysisWorker:
         
         return seo_data
     
-    def _perform_aeo_analysis(self, domain_url, llm_config):
+    def _perform_aeo_analysis(self, domain_url, llm_config, report):
         """Perform AEO analysis using LLM"""
         try:
             from src.routes.analysis import call_llm_api
@@ -234,9 +306,8 @@ class AnalysisWorker:
             
             content, tokens_used = call_llm_api(prompt, llm_config)
             
-            # Record usage
-            llm_config.record_usage(tokens_used)
-            db.session.commit()
+            # Record usage; totals are written to the config in batches
+            get_llm_usage().record(llm_config, tokens_used, report.user_id, 'llm', report.report_id)
             
             # Parse JSON response
             try:
@@ -310,6 +381,8 @@ def init_worker(app):
     global analysis_worker
     analysis_worker = AnalysisWorker(app)
     analysis_worker.start()
+    ANALYSIS_QUEUE_DEPTH.set_function(analysis_worker.queue_depth)
+    ANALYSIS_QUEUE_OLDEST_AGE.set_function(analysis_worker.oldest_task_age)
     return analysis_worker
 
 def get_worker():
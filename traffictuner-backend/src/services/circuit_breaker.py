@@ -0,0 +1,109 @@
+import threading
+import time
+import logging
+
+logger = logging.getLogger(__name__)
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose circuit is open"""
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for a while.
+
+    After ``failure_threshold`` consecutive failures the circuit opens and
+    calls are refused for ``reset_timeout`` seconds. Then a single trial
+    call is let through (half open): success closes the circuit, failure
+    opens it again.
+    """
+
+    def __init__(self, name, failure_threshold=5, reset_timeout=30.0):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self.trial_running = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return CLOSED
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return OPEN
+        return HALF_OPEN
+
+    def allow(self):
+        """Whether a call may go ahead; the caller must then record its outcome"""
+        with self.lock:
+            state = self.state
+            if state == CLOSED:
+                return True
+            if state == HALF_OPEN and not self.trial_running:
+                self.trial_running = True
+                return True
+            return False
+
+    def record_success(self):
+        with self.lock:
+            if self.opened_at is not None:
+                logger.info(f"Circuit {self.name} closed")
+            self.failures = 0
+            self.opened_at = None
+            self.trial_running = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            if self.trial_running or (self.opened_at is None and self.failures >= self.failure_threshold):
+                logger.warning(f"Circuit {self.name} opened after {self.failures} failures")
+                self.opened_at = time.monotonic()
+            self.trial_running = False
+
+    def to_dict(self):
+        return {
+            'state': self.state,
+            'consecutive_failures': self.failures
+        }
+
+class CircuitBreakers:
+    """Circuit breakers created on first use, one per key"""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.breakers = {}
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            with self.lock:
+                breaker = self.breakers.setdefault(
+                    key, CircuitBreaker(key, self.failure_threshold, self.reset_timeout)
+                )
+        return breaker
+
+    def states(self):
+        """{key: breaker state} for every breaker used so far"""
+        return {key: breaker.to_dict() for key, breaker in list(self.breakers.items())}
+
+# Global breakers for LLM configs, keyed by config_id
+llm_breakers = None
+
+def init_llm_breakers(app):
+    """Initialize the LLM provider circuit breakers"""
+    global llm_breakers
+    llm_breakers = CircuitBreakers(
+        failure_threshold=app.config.get('LLM_BREAKER_FAILURES', 5),
+        reset_timeout=app.config.get('LLM_BREAKER_RESET_TIMEOUT', 30.0)
+    )
+    return llm_breakers
+
+def get_llm_breakers():
+    """Get the global LLM circuit breakers"""
+    return llm_breakers
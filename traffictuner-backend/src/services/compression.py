@@ -0,0 +1,120 @@
+import gzip
+import zlib
+import logging
+
+from flask import request
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+# Content codings offered, in order of preference
+CODINGS = ['br', 'gzip'] if brotli else ['gzip']
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'application/javascript', 'text/')
+# Server-sent events must reach the client as they are written
+UNCOMPRESSED_TYPES = ('text/event-stream',)
+
+def coded_etags(etag):
+    """The ETag and its per-coding variants; strong validators differ per content coding"""
+    return [etag] + [f'{etag}-{coding}' for coding in CODINGS]
+
+class GzipStream:
+    def __init__(self, level):
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data):
+        return self.compressor.compress(data)
+
+    def finish(self):
+        return self.compressor.flush()
+
+class BrotliStream:
+    def __init__(self, quality):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data):
+        return self.compressor.process(data)
+
+    def finish(self):
+        return self.compressor.finish()
+
+class ResponseCompressor:
+    """Compresses responses with brotli or gzip, as the client accepts.
+
+    Bodies under min_size are sent as they are, since compressing them
+    costs more than the bytes saved. Streamed responses are compressed
+    chunk by chunk whatever their size. Responses that already carry a
+    Content-Encoding, such as the precompressed tt.js loaders, are left
+    alone.
+    """
+
+    def __init__(self, app, min_size=1024, level=6, brotli_quality=4):
+        self.min_size = min_size
+        self.level = level
+        self.brotli_quality = brotli_quality
+        app.after_request(self.compress_response)
+
+    def should_compress(self, response):
+        if request.method == 'HEAD' or not 200 <= response.status_code < 300 or response.status_code in (204, 206):
+            return False
+        if response.direct_passthrough or 'Content-Encoding' in response.headers:
+            return False
+        if 'no-transform' in response.headers.get('Cache-Control', ''):
+            return False
+        mimetype = response.mimetype or ''
+        return mimetype.startswith(COMPRESSIBLE_TYPES) and not mimetype.startswith(UNCOMPRESSED_TYPES)
+
+    def compress(self, data, coding):
+        if coding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        return gzip.compress(data, compresslevel=self.level, mtime=0)
+
+    def compress_stream(self, chunks, coding):
+        stream = BrotliStream(self.brotli_quality) if coding == 'br' else GzipStream(self.level)
+        try:
+            for chunk in chunks:
+                data = stream.compress(chunk.encode() if isinstance(chunk, str) else chunk)
+                if data:
+                    yield data
+            yield stream.finish()
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+
+    def compress_response(self, response):
+        if not self.should_compress(response):
+            return response
+
+        response.vary.add('Accept-Encoding')
+        if not response.is_streamed and (response.calculate_content_length() or 0) < self.min_size:
+            return response
+
+        coding = request.accept_encodings.best_match(CODINGS)
+        if coding is None:
+            return response
+
+        if response.is_streamed:
+            response.response = self.compress_stream(response.response, coding)
+            response.headers.pop('Content-Length', None)
+        else:
+            response.set_data(self.compress(response.get_data(), coding))
+        response.headers['Content-Encoding'] = coding
+
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(f'{etag}-{coding}')
+        return response
+
+def init_compression(app):
+    """Compress the app's responses according to its COMPRESS_* settings"""
+    logger.info(f"Response compression codings: {', '.join(CODINGS)}{'' if brotli else ' (brotli not installed)'}")
+    return ResponseCompressor(
+        app,
+        min_size=app.config.get('COMPRESS_MIN_SIZE', 1024),
+        level=app.config.get('COMPRESS_LEVEL', 6),
+        brotli_quality=app.config.get('COMPRESS_BROTLI_QUALITY', 4)
+    )
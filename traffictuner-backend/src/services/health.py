@@ -0,0 +1,161 @@
+import threading
+import time
+from datetime import datetime
+import logging
+
+from sqlalchemy import text
+
+from src.models.user import db
+from src.services.analysis_worker import get_worker
+from src.services.circuit_breaker import get_llm_breakers, OPEN
+
+logger = logging.getLogger(__name__)
+
+OK = 'ok'
+DEGRADED = 'degraded'
+FAIL = 'fail'
+
+STATUS_ORDER = {OK: 0, DEGRADED: 1, FAIL: 2}
+
+class HealthMonitor:
+    """Runs dependency checks in the background and caches the result.
+
+    Probes read the cached snapshot, so they cost no database or worker
+    access however often load balancers poll. A snapshot older than three
+    check intervals means the checks themselves are stuck (for instance
+    on a hung database) and is reported as failing.
+    """
+
+    def __init__(self, app, interval=2.0, db_slow=0.25, worker_stale=180, max_backlog_age=300):
+        self.app = app
+        self.interval = interval
+        self.db_slow = db_slow
+        self.worker_stale = worker_stale
+        self.max_backlog_age = max_backlog_age
+        self.snapshot = None
+        self.is_running = False
+        self.check_thread = None
+
+    def start(self):
+        """Start the background checks"""
+        if not self.is_running:
+            self.is_running = True
+            self.check_thread = threading.Thread(target=self._check_loop, daemon=True)
+            self.check_thread.start()
+
+    def stop(self):
+        """Stop the background checks"""
+        self.is_running = False
+        if self.check_thread:
+            self.check_thread.join()
+
+    def check_database(self):
+        start = time.perf_counter()
+        try:
+            with self.app.app_context():
+                with db.engine.connect() as connection:
+                    connection.execute(text('SELECT 1'))
+        except Exception as e:
+            return {'status': FAIL, 'error': str(e)}
+
+        latency = time.perf_counter() - start
+        return {
+            'status': DEGRADED if latency > self.db_slow else OK,
+            'latency_ms': round(latency * 1000, 2)
+        }
+
+    def check_worker(self):
+        worker = get_worker()
+        if worker is None or not worker.is_alive():
+            return {'status': FAIL, 'error': 'Worker thread is not running'}
+
+        heartbeat_age = worker.heartbeat_age()
+        if heartbeat_age is None or heartbeat_age > self.worker_stale:
+            return {'status': FAIL, 'error': 'Worker heartbeat is stale', 'heartbeat_age': heartbeat_age}
+        return {'status': OK, 'heartbeat_age': round(heartbeat_age, 2)}
+
+    def check_backlog(self):
+        worker = get_worker()
+        if worker is None:
+            return {'status': FAIL, 'error': 'Worker is not initialized'}
+
+        oldest_age = worker.oldest_task_age()
+        return {
+            'status': DEGRADED if oldest_age > self.max_backlog_age else OK,
+            'depth': worker.queue_depth(),
+            'oldest_age': round(oldest_age, 2)
+        }
+
+    def check_llm(self):
+        breakers = get_llm_breakers()
+        states = breakers.states() if breakers else {}
+        return {
+            'status': DEGRADED if any(state['state'] == OPEN for state in states.values()) else OK,
+            'circuits': states
+        }
+
+    def run_checks(self):
+        """Run every check and cache the combined result"""
+        checks = {
+            'database': self.check_database(),
+            'worker': self.check_worker(),
+            'backlog': self.check_backlog(),
+            'llm': self.check_llm()
+        }
+        status = max((check['status'] for check in checks.values()), key=STATUS_ORDER.get)
+        self.snapshot = {
+            'status': status,
+            'checked_at': datetime.utcnow().isoformat(),
+            'checked_monotonic': time.monotonic(),
+            'checks': checks
+        }
+        return self.snapshot
+
+    def readiness(self):
+        """The cached check results, failing when they are missing or stale"""
+        snapshot = self.snapshot
+        if snapshot is None:
+            return {'status': FAIL, 'error': 'Health checks have not run yet'}
+
+        age = time.monotonic() - snapshot['checked_monotonic']
+        result = {key: value for key, value in snapshot.items() if key != 'checked_monotonic'}
+        result['age'] = round(age, 3)
+        if age > self.interval * 3:
+            result['status'] = FAIL
+            result['error'] = 'Health checks are stuck'
+        return result
+
+    def liveness(self):
+        """Whether the process can still do its work"""
+        worker = get_worker()
+        if worker is None or not worker.is_alive():
+            return {'status': FAIL, 'error': 'Worker thread is not running'}
+        return {'status': OK}
+
+    def _check_loop(self):
+        while self.is_running:
+            try:
+                self.run_checks()
+            except Exception as e:
+                logger.error(f"Health check error: {str(e)}")
+            time.sleep(self.interval)
+
+# Global monitor instance
+health_monitor = None
+
+def init_health(app):
+    """Initialize the health monitor"""
+    global health_monitor
+    health_monitor = HealthMonitor(
+        app,
+        interval=app.config.get('HEALTH_CHECK_INTERVAL', 2.0),
+        db_slow=app.config.get('HEALTH_DB_SLOW', 0.25),
+        worker_stale=app.config.get('HEALTH_WORKER_STALE', 180),
+        max_backlog_age=app.config.get('HEALTH_MAX_BACKLOG_AGE', 300)
+    )
+    health_monitor.start()
+    return health_monitor
+
+def get_health():
+    """Get the global health monitor"""
+    return health_monitor
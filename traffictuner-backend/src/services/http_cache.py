@@ -0,0 +1,38 @@
+import hashlib
+
+from flask import request, make_response
+
+from src.services.compression import coded_etags
+
+# Completed reports never change again, so clients may keep them for good
+IMMUTABLE = 'private, max-age=31536000, immutable'
+# Anything else is revalidated on every use
+REVALIDATE = 'private, no-cache'
+
+def make_etag(*parts):
+    """Strong ETag value from a resource's version fields"""
+    key = ':'.join(
+        '' if part is None else part.isoformat() if hasattr(part, 'isoformat') else str(part)
+        for part in parts
+    )
+    return hashlib.sha256(key.encode()).hexdigest()[:32]
+
+def conditional_response(etag, build, cache_control=REVALIDATE):
+    """Answer 304 when the client already holds etag, otherwise call build() for the full response.
+
+    build is only called on a miss, so a revalidation never loads or
+    serializes the resource body.
+    """
+    matched = next((tag for tag in coded_etags(etag) if request.if_none_match.contains_weak(tag)), None)
+    if matched:
+        # Echo the variant the client holds; the compressor only suffixes 2xx responses
+        response = make_response('', 304)
+        response.set_etag(matched)
+    else:
+        response = make_response(build())
+        if response.status_code != 200:
+            return response
+        response.set_etag(etag)
+
+    response.headers['Cache-Control'] = cache_control
+    return response
@@ -0,0 +1,94 @@
+"""
+Request Identity
+Resolves the JWT identity to a User at most once per request
+"""
+
+from flask import jsonify, current_app, g
+from sqlalchemy.orm import make_transient_to_detached
+from collections import OrderedDict
+import threading
+import time
+
+from src.models.user import db, User, user_changed
+
+class IdentityCache:
+    """Small TTL cache of user rows keyed by JWT ``jti``"""
+
+    def __init__(self, ttl=0, max_size=1024):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, jti):
+        """Return cached column values for a token, or None"""
+        if not self.ttl or not jti:
+            return None
+        with self.lock:
+            entry = self.entries.get(jti)
+            if not entry:
+                return None
+            expires_at, values = entry
+            if time.monotonic() >= expires_at:
+                del self.entries[jti]
+                return None
+            self.entries.move_to_end(jti)
+            return values
+
+    def set(self, jti, user):
+        """Cache a snapshot of the user's columns for a token"""
+        if not self.ttl or not jti:
+            return
+        values = {column.key: getattr(user, column.key) for column in User.__table__.columns}
+        with self.lock:
+            self.entries[jti] = (time.monotonic() + self.ttl, values)
+            self.entries.move_to_end(jti)
+            while len(self.entries) > self.max_size:
+                self.entries.popitem(last=False)
+
+    def invalidate_user(self, user_pk):
+        """Drop every cached token belonging to a user"""
+        with self.lock:
+            stale = [jti for jti, (_, values) in self.entries.items() if values['id'] == user_pk]
+            for jti in stale:
+                del self.entries[jti]
+
+identity_cache = IdentityCache()
+
+def load_user(jwt_header, jwt_data):
+    """Flask-JWT-Extended user lookup callback.
+
+    The user is memoized on ``g`` because the JWT may be verified more than
+    once per request (rate limiting verifies it before the route does);
+    routes read it through ``current_user`` without querying.
+    """
+    jti = jwt_data.get('jti')
+    loaded = g.get('_identity_user')
+    if loaded and loaded[0] == jti:
+        return loaded[1]
+
+    values = identity_cache.get(jti)
+    if values:
+        # Rebuild the row without a query and attach it to this request's session
+        user = User(**values)
+        make_transient_to_detached(user)
+        user = db.session.merge(user, load=False)
+    else:
+        identity = jwt_data[current_app.config['JWT_IDENTITY_CLAIM']]
+        user = User.query.filter_by(user_id=identity).one_or_none()
+        if user:
+            identity_cache.set(jti, user)
+
+    g._identity_user = (jti, user)
+    return user
+
+def user_not_found(jwt_header, jwt_data):
+    return jsonify({'error': 'User not found'}), 404
+
+def init_identity(app, jwt):
+    """Register the user loader; JWT_USER_CACHE_TTL (seconds) enables the token cache"""
+    identity_cache.ttl = app.config.get('JWT_USER_CACHE_TTL', 0)
+    jwt.user_lookup_loader(load_user)
+    jwt.user_lookup_error_loader(user_not_found)
+    user_changed.connect(lambda user_pk: identity_cache.invalidate_user(user_pk), weak=False)
+    return identity_cache
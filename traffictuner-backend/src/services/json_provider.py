@@ -0,0 +1,87 @@
+import json
+import logging
+
+from flask import current_app, stream_with_context
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+# Placeholder for the list a streamed response fills in as it is read
+STREAM = '\x00stream\x00'
+STREAM_CHUNK_SIZE = 100
+
+class FastJSONProvider(DefaultJSONProvider):
+    """JSON provider that serializes responses with orjson when it is installed.
+
+    Output matches the default provider: sorted keys, compact separators
+    outside debug mode and datetimes as HTTP dates (they are passed through
+    to the same default function). orjson writes non-ASCII characters as
+    UTF-8 rather than escaping them. Without orjson, or for values it
+    cannot encode such as integers over 64 bits, the stdlib encoder is used.
+    """
+
+    def serialize(self, obj, indent=False):
+        """obj as UTF-8 JSON bytes, compact unless indent is set"""
+        if orjson is not None:
+            option = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+            if self.sort_keys:
+                option |= orjson.OPT_SORT_KEYS
+            if indent:
+                option |= orjson.OPT_INDENT_2
+            try:
+                return orjson.dumps(obj, default=self.default, option=option)
+            except orjson.JSONEncodeError:
+                pass
+
+        layout = {'indent': 2} if indent else {'separators': (',', ':')}
+        return json.dumps(
+            obj, default=self.default, ensure_ascii=self.ensure_ascii, sort_keys=self.sort_keys, **layout
+        ).encode()
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return super().loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = (self.compact is None and self._app.debug) or self.compact is False
+        return self._app.response_class(self.serialize(obj, indent) + b'\n', mimetype=self.mimetype)
+
+def stream_json(payload, items):
+    """Streaming JSON response for payload with its STREAM placeholder replaced by a list of items.
+
+    items is consumed lazily inside the request context, so a batched
+    query such as iter_keyset is never held in memory at once. The body matches what jsonify
+    would produce for the complete payload.
+    """
+    serialize = current_app.json.serialize
+    prefix, suffix = serialize(payload).split(serialize(STREAM), 1)
+
+    def generate():
+        yield prefix + b'['
+        chunk = []
+        separator = b''
+        for item in items:
+            chunk.append(serialize(item))
+            if len(chunk) >= STREAM_CHUNK_SIZE:
+                yield separator + b','.join(chunk)
+                chunk = []
+                separator = b','
+        if chunk:
+            yield separator + b','.join(chunk)
+        yield b']' + suffix + b'\n'
+
+    return current_app.response_class(stream_with_context(generate()), mimetype='application/json')
+
+def init_json_provider(app):
+    """Serialize the app's JSON responses with FastJSONProvider"""
+    app.json_provider_class = FastJSONProvider
+    app.json = FastJSONProvider(app)
+    logger.info(f"JSON responses encoded with {'orjson' if orjson else 'the stdlib json module (orjson not installed)'}")
+    return app.json
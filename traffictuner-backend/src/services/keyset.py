@@ -0,0 +1,40 @@
+"""
+Keyset Batches
+Reads long result sets for streamed responses in short batches, without
+holding a transaction open while the response is written
+"""
+
+from sqlalchemy import tuple_
+
+from src.models.user import db
+
+def iter_keyset(query, key_columns, convert, batch_size=500, descending=False):
+    """Yield convert(row) for every row of query in key order, batch_size rows at a time.
+
+    Each batch is a ``WHERE key > last ORDER BY key LIMIT batch_size``
+    query that is read and converted in full, and the transaction is ended
+    before its items are yielded. A slow client therefore never keeps a
+    read open, which on SQLite without WAL would block every writer for as
+    long as the response takes. key_columns must be unique together and
+    not null; query must not be ordered already. ORM rows are expired once
+    their batch ends, so convert should read everything it needs from them.
+    """
+    key = tuple_(*key_columns) if len(key_columns) > 1 else key_columns[0]
+    order = [column.desc() if descending else column.asc() for column in key_columns]
+    last = None
+
+    while True:
+        batch = query
+        if last is not None:
+            bound = tuple_(*last) if len(last) > 1 else last[0]
+            batch = batch.filter(key < bound if descending else key > bound)
+        rows = batch.order_by(*order).limit(batch_size).all()
+
+        items = [convert(row) for row in rows]
+        if rows:
+            last = tuple(getattr(rows[-1], column.key) for column in key_columns)
+        db.session.commit()
+
+        yield from items
+        if len(rows) < batch_size:
+            return
@@ -0,0 +1,407 @@
+"""
+Rate Limiter Backends
+Shared storage for the sliding-window counters, token buckets and blocks used by SecurityEnhancements
+"""
+
+from sqlalchemy import MetaData, Table, Column, String, Integer, Float, create_engine, text
+from collections import OrderedDict
+import threading
+import time
+
+class LimiterBackend:
+    """Interface for rate limiter storage.
+
+    Counters use the sliding-window-counter approximation: each key keeps
+    the hit count of the current fixed window and of the previous one, and
+    the previous count is weighted by how much of it still overlaps the
+    sliding window. Token buckets keep their token count and the time it
+    was last refilled. Every update is O(1) regardless of the hit rate.
+    """
+
+    def hit(self, key, window):
+        """Record a hit and return the estimated number of hits in the last ``window`` seconds"""
+        raise NotImplementedError
+
+    def reset(self, key, window):
+        """Forget all hits recorded for a key"""
+        raise NotImplementedError
+
+    def take(self, key, capacity, rate):
+        """Take a token from a bucket holding up to ``capacity`` tokens refilled at ``rate`` per second.
+
+        Returns ``(allowed, retry_after)`` where retry_after is the number of
+        seconds until a token is available when the request is refused.
+        """
+        raise NotImplementedError
+
+    def block(self, key, duration):
+        """Block a key for ``duration`` seconds"""
+        raise NotImplementedError
+
+    def blocked_for(self, key):
+        """Return the number of seconds a key remains blocked, or 0"""
+        raise NotImplementedError
+
+    def sweep(self):
+        """Remove expired counters and blocks"""
+
+    @staticmethod
+    def estimate(window, current, previous, now):
+        """Weight the previous window by its overlap with the sliding window"""
+        elapsed = (now % window) / window
+        return previous * (1 - elapsed) + current
+
+class _Counter:
+    """Compact per-key sliding-window state"""
+    __slots__ = ('window', 'window_index', 'current', 'previous')
+
+    def __init__(self, window, window_index):
+        self.window = window
+        self.window_index = window_index
+        self.current = 0
+        self.previous = 0
+
+    def expired(self, now):
+        return self.window_index < int(now // self.window) - 1
+
+class _Bucket:
+    """Compact per-key token bucket state"""
+    __slots__ = ('capacity', 'rate', 'tokens', 'updated')
+
+    def __init__(self, capacity, rate, now):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def expired(self, now):
+        # A bucket that has refilled completely is the same as no bucket
+        return self.tokens + (now - self.updated) * self.rate >= self.capacity
+
+class MemoryLimiterBackend(LimiterBackend):
+    """Per-process storage; only suitable for a single worker process.
+
+    Memory is bounded: counters and blocks are kept in least-recently-used
+    order, expired entries are trimmed from the cold end a few at a time on
+    every write, and once ``max_keys`` is reached the least recently seen
+    counter or bucket is evicted. Live blocks are never evicted; a block
+    past the cap sweeps out expired blocks and evicts counters instead.
+    """
+
+    TRIM_PER_WRITE = 8
+
+    def __init__(self, max_keys=100000, sweep_interval=60):
+        self.counters = OrderedDict()  # key -> _Counter, least recently hit first
+        self.buckets = OrderedDict()  # key -> _Bucket, least recently used first
+        self.blocks = OrderedDict()  # key -> blocked until (epoch seconds), oldest first
+        self.lock = threading.Lock()
+        self.max_keys = max_keys
+        self.sweep_interval = sweep_interval
+        self.next_sweep = time.time() + sweep_interval
+
+    def hit(self, key, window):
+        now = time.time()
+        window_index = int(now // window)
+        with self.lock:
+            self._trim(now)
+            counter = self.counters.get(key)
+            if counter is None or counter.window_index < window_index - 1:
+                counter = _Counter(window, window_index)
+                self.counters[key] = counter
+                if len(self.counters) > self.max_keys:
+                    self.counters.popitem(last=False)
+            elif counter.window_index == window_index - 1:
+                counter.window_index, counter.previous, counter.current = window_index, counter.current, 0
+            self.counters.move_to_end(key)
+            counter.current += 1
+            return self.estimate(window, counter.current, counter.previous, now)
+
+    def reset(self, key, window):
+        with self.lock:
+            self.counters.pop(key, None)
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        with self.lock:
+            self._trim(now)
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = _Bucket(capacity, rate, now)
+                self.buckets[key] = bucket
+                if len(self.buckets) > self.max_keys:
+                    self.buckets.popitem(last=False)
+            else:
+                bucket.capacity, bucket.rate = capacity, rate
+                bucket.refill(now)
+            self.buckets.move_to_end(key)
+
+            if bucket.tokens >= 1:
+                bucket.tokens -= 1
+                return True, 0
+            return False, (1 - bucket.tokens) / rate
+
+    def block(self, key, duration):
+        now = time.time()
+        with self.lock:
+            self._trim(now)
+            self.blocks.pop(key, None)
+            self.blocks[key] = now + duration
+            if len(self.blocks) > self.max_keys:
+                # Evicting a live block would let new offenders unblock old ones
+                self._sweep(now)
+                for _ in range(min(len(self.blocks) - self.max_keys, len(self.counters))):
+                    self.counters.popitem(last=False)
+
+    def blocked_for(self, key):
+        now = time.time()
+        with self.lock:
+            until = self.blocks.get(key)
+            if until is None:
+                return 0
+            if until <= now:
+                del self.blocks[key]
+                return 0
+            return until - now
+
+    def sweep(self):
+        with self.lock:
+            self._sweep(time.time())
+
+    def _trim(self, now):
+        """Drop a bounded number of expired entries from the cold end"""
+        for entries in (self.counters, self.buckets):
+            for _ in range(self.TRIM_PER_WRITE):
+                if not entries:
+                    break
+                key, entry = next(iter(entries.items()))
+                if not entry.expired(now):
+                    break
+                del entries[key]
+
+        for _ in range(self.TRIM_PER_WRITE):
+            if not self.blocks:
+                break
+            key, until = next(iter(self.blocks.items()))
+            if until > now:
+                break
+            del self.blocks[key]
+
+        # Keys with different windows can hide expired entries behind live
+        # ones, so still do a full pass once per sweep interval
+        if now >= self.next_sweep:
+            self._sweep(now)
+
+    def _sweep(self, now):
+        for entries in (self.counters, self.buckets):
+            for key in [key for key, entry in entries.items() if entry.expired(now)]:
+                del entries[key]
+        for key in [key for key, until in self.blocks.items() if until <= now]:
+            del self.blocks[key]
+        self.next_sweep = now + self.sweep_interval
+
+class SQLLimiterBackend(LimiterBackend):
+    """Storage in SQL tables shared by every worker process (SQLite or PostgreSQL).
+
+    Counter updates are a single atomic UPSERT, so concurrent processes
+    never lose hits.
+    """
+
+    metadata = MetaData()
+
+    counters = Table(
+        'rate_limit_counters', metadata,
+        Column('key', String(255), primary_key=True),
+        Column('window_index', Integer, nullable=False),
+        Column('current_count', Integer, nullable=False),
+        Column('previous_count', Integer, nullable=False),
+        Column('expires_at', Float, nullable=False, index=True)
+    )
+
+    buckets = Table(
+        'rate_limit_buckets', metadata,
+        Column('key', String(255), primary_key=True),
+        Column('tokens', Float, nullable=False),
+        Column('allowed', Integer, nullable=False),
+        Column('updated_at', Float, nullable=False),
+        Column('expires_at', Float, nullable=False, index=True)
+    )
+
+    blocks = Table(
+        'rate_limit_blocks', metadata,
+        Column('key', String(255), primary_key=True),
+        Column('blocked_until', Float, nullable=False, index=True)
+    )
+
+    HIT_SQL = text("""
+        INSERT INTO rate_limit_counters (key, window_index, current_count, previous_count, expires_at)
+        VALUES (:key, :window_index, 1, 0, :expires_at)
+        ON CONFLICT (key) DO UPDATE SET
+            previous_count = CASE
+                WHEN rate_limit_counters.window_index = :window_index THEN rate_limit_counters.previous_count
+                WHEN rate_limit_counters.window_index = :window_index - 1 THEN rate_limit_counters.current_count
+                ELSE 0 END,
+            current_count = CASE
+                WHEN rate_limit_counters.window_index = :window_index THEN rate_limit_counters.current_count + 1
+                ELSE 1 END,
+            window_index = :window_index,
+            expires_at = :expires_at
+        RETURNING current_count, previous_count
+    """)
+
+    # Tokens after refilling since the last update, capped at capacity
+    REFILLED = """CASE
+        WHEN rate_limit_buckets.tokens + (:now - rate_limit_buckets.updated_at) * :rate > :capacity THEN :capacity
+        ELSE rate_limit_buckets.tokens + (:now - rate_limit_buckets.updated_at) * :rate END"""
+
+    TAKE_SQL = text(f"""
+        INSERT INTO rate_limit_buckets (key, tokens, allowed, updated_at, expires_at)
+        VALUES (:key, :capacity - 1, 1, :now, :expires_at)
+        ON CONFLICT (key) DO UPDATE SET
+            tokens = CASE WHEN {REFILLED} >= 1 THEN {REFILLED} - 1 ELSE {REFILLED} END,
+            allowed = CASE WHEN {REFILLED} >= 1 THEN 1 ELSE 0 END,
+            updated_at = :now,
+            expires_at = :expires_at
+        RETURNING tokens, allowed
+    """)
+
+    BLOCK_SQL = text("""
+        INSERT INTO rate_limit_blocks (key, blocked_until) VALUES (:key, :blocked_until)
+        ON CONFLICT (key) DO UPDATE SET blocked_until = :blocked_until
+    """)
+
+    def __init__(self, engine, sweep_every=1000):
+        self.engine = engine
+        self.metadata.create_all(engine)
+        self.sweep_every = sweep_every
+        self.hits = 0
+
+    def hit(self, key, window):
+        now = time.time()
+        window_index = int(now // window)
+        with self.engine.begin() as conn:
+            current, previous = conn.execute(self.HIT_SQL, {
+                'key': key,
+                'window_index': window_index,
+                'expires_at': (window_index + 2) * window
+            }).one()
+
+        # Amortized expiry sweep
+        self.hits += 1
+        if self.hits % self.sweep_every == 0:
+            self.sweep()
+
+        return self.estimate(window, current, previous, now)
+
+    def reset(self, key, window):
+        with self.engine.begin() as conn:
+            conn.execute(self.counters.delete().where(self.counters.c.key == key))
+
+    def take(self, key, capacity, rate):
+        now = time.time()
+        with self.engine.begin() as conn:
+            tokens, allowed = conn.execute(self.TAKE_SQL, {
+                'key': key,
+                'capacity': capacity,
+                'rate': rate,
+                'now': now,
+                'expires_at': now + capacity / rate
+            }).one()
+        if allowed:
+            return True, 0
+        return False, (1 - tokens) / rate
+
+    def block(self, key, duration):
+        with self.engine.begin() as conn:
+            conn.execute(self.BLOCK_SQL, {'key': key, 'blocked_until': time.time() + duration})
+
+    def blocked_for(self, key):
+        with self.engine.connect() as conn:
+            until = conn.execute(
+                self.blocks.select().with_only_columns(self.blocks.c.blocked_until)
+                .where(self.blocks.c.key == key)
+            ).scalar()
+        if until is None:
+            return 0
+        return max(0, until - time.time())
+
+    def sweep(self):
+        now = time.time()
+        with self.engine.begin() as conn:
+            conn.execute(self.counters.delete().where(self.counters.c.expires_at <= now))
+            conn.execute(self.buckets.delete().where(self.buckets.c.expires_at <= now))
+            conn.execute(self.blocks.delete().where(self.blocks.c.blocked_until <= now))
+
+class RedisLimiterBackend(LimiterBackend):
+    """Storage in Redis or any server speaking its protocol.
+
+    ``client`` only needs ``incr``, ``expire``, ``get``, ``set``, ``ttl``
+    and ``delete`` with redis-py semantics. Keys expire on their own, so no
+    sweep is needed. benchmarks/fake_redis.py provides an in-memory client
+    for testing without a server.
+    """
+
+    def __init__(self, client, prefix='tt:rl:'):
+        self.client = client
+        self.prefix = prefix
+
+    def hit(self, key, window):
+        now = time.time()
+        window_index = int(now // window)
+        current_key = f"{self.prefix}{key}:{window_index}"
+        current = self.client.incr(current_key)
+        if current == 1:
+            self.client.expire(current_key, int(window * 2) + 1)
+        previous = int(self.client.get(f"{self.prefix}{key}:{window_index - 1}") or 0)
+        return self.estimate(window, current, previous, now)
+
+    def reset(self, key, window):
+        # Only the current and previous windows can still hold counts
+        window_index = int(time.time() // window)
+        self.client.delete(f"{self.prefix}{key}:{window_index}", f"{self.prefix}{key}:{window_index - 1}")
+
+    def take(self, key, capacity, rate):
+        # Approximated with a fixed window that holds a full bucket, since a
+        # true token bucket needs a server-side script
+        window = max(1, int(round(capacity / rate)))
+        window_key = f"{self.prefix}bucket:{key}:{int(time.time() // window)}"
+        used = self.client.incr(window_key)
+        if used == 1:
+            self.client.expire(window_key, window)
+        if used <= capacity:
+            return True, 0
+        return False, max(1, self.client.ttl(window_key) or window)
+
+    def block(self, key, duration):
+        self.client.set(f"{self.prefix}block:{key}", 1, ex=max(1, int(duration)))
+
+    def blocked_for(self, key):
+        remaining = self.client.ttl(f"{self.prefix}block:{key}")
+        return max(0, remaining or 0)
+
+def create_backend(app):
+    """Build the limiter backend selected by RATE_LIMIT_BACKEND (memory, sqlite or redis)"""
+    backend = app.config.get('RATE_LIMIT_BACKEND', 'memory')
+    storage_uri = app.config.get('RATE_LIMIT_STORAGE_URI')
+
+    if backend == 'memory':
+        return MemoryLimiterBackend(max_keys=app.config.get('RATE_LIMIT_MAX_KEYS', 100000))
+
+    if backend == 'sqlite':
+        if storage_uri:
+            return SQLLimiterBackend(create_engine(storage_uri))
+        from src.models.user import db
+        with app.app_context():
+            return SQLLimiterBackend(db.engine)
+
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATE_LIMIT_BACKEND=redis requires the redis package")
+        return RedisLimiterBackend(redis.Redis.from_url(storage_uri or 'redis://localhost:6379/0'))
+
+    raise ValueError(f"Unknown rate limit backend: {backend}")
@@ -0,0 +1,139 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+import logging
+
+from sqlalchemy import text
+
+from src.models.user import db
+from src.services.usage_ledger import get_usage_ledger
+
+logger = logging.getLogger(__name__)
+
+class LLMUsageRecorder:
+    """Buffers LLM usage per config and applies it as aggregated increments.
+
+    Recording a call only updates an in-memory total, so LLM callers no
+    longer take a write lock on their llm_configs row. Totals are written
+    every ``flush_interval`` seconds, or sooner once ``flush_threshold``
+    calls are pending, with one relative UPDATE per config. Relative
+    updates keep totals exact when several processes flush concurrently.
+    Pending usage is also flushed at exit.
+    """
+
+    FLUSH_SQL = text("""
+        UPDATE llm_configs SET
+            total_requests = COALESCE(total_requests, 0) + :requests,
+            total_tokens = COALESCE(total_tokens, 0) + :tokens,
+            total_cost = COALESCE(total_cost, 0) + :cost,
+            last_used = CASE WHEN last_used IS NULL OR last_used < :last_used THEN :last_used ELSE last_used END
+        WHERE id = :id
+    """)
+
+    def __init__(self, app, flush_threshold=100, flush_interval=5.0):
+        self.app = app
+        self.flush_threshold = flush_threshold
+        self.flush_interval = flush_interval
+        self.pending = {}  # llm_configs.id -> {'requests', 'tokens', 'cost', 'last_used'}
+        self.pending_calls = 0
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.is_running = False
+        self.flush_thread = None
+
+    def start(self):
+        """Start the background flusher"""
+        if not self.is_running:
+            self.is_running = True
+            self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self.flush_thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write what is left"""
+        self.is_running = False
+        self.wakeup.set()
+        if self.flush_thread:
+            self.flush_thread.join()
+        self.flush()
+
+    def record(self, llm_config, tokens_used, user_id=None, source='llm', report_id=None):
+        """Record one LLM call against a config, and in the usage ledger when it is attributable to a user"""
+        cost = llm_config.usage_cost(tokens_used)
+        self._add(llm_config.id, 1, tokens_used, cost, datetime.utcnow())
+
+        if user_id is not None:
+            get_usage_ledger().record(
+                user_id, source,
+                tokens=tokens_used,
+                cost=cost,
+                report_id=report_id,
+                llm_config_id=llm_config.id,
+                on_commit=False
+            )
+
+    def _add(self, config_pk, requests, tokens, cost, last_used):
+        with self.lock:
+            totals = self.pending.setdefault(config_pk, {
+                'id': config_pk, 'requests': 0, 'tokens': 0, 'cost': 0.0, 'last_used': last_used
+            })
+            totals['requests'] += requests
+            totals['tokens'] += tokens
+            totals['cost'] += cost
+            totals['last_used'] = max(totals['last_used'], last_used)
+            self.pending_calls += requests
+            full = self.pending_calls >= self.flush_threshold
+        if full:
+            self.wakeup.set()
+
+    def flush(self):
+        """Apply pending totals, returning the number of calls written"""
+        with self.flush_lock:
+            with self.lock:
+                pending, self.pending = self.pending, {}
+                calls, self.pending_calls = self.pending_calls, 0
+            if not pending:
+                return 0
+
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(self.FLUSH_SQL, list(pending.values()))
+            except Exception as e:
+                # Merge back so the usage is written on the next flush
+                for totals in pending.values():
+                    self._add(totals['id'], totals['requests'], totals['tokens'], totals['cost'], totals['last_used'])
+                logger.error(f"Failed to write LLM usage for {calls} calls: {str(e)}")
+                return 0
+
+            return calls
+
+    def _flush_loop(self):
+        while self.is_running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"LLM usage flush error: {str(e)}")
+                time.sleep(self.flush_interval)
+
+# Global recorder instance
+llm_usage = None
+
+def init_llm_usage(app):
+    """Initialize the LLM usage recorder"""
+    global llm_usage
+    llm_usage = LLMUsageRecorder(
+        app,
+        flush_threshold=app.config.get('LLM_USAGE_FLUSH_THRESHOLD', 100),
+        flush_interval=app.config.get('LLM_USAGE_FLUSH_INTERVAL', 5.0)
+    )
+    llm_usage.start()
+    atexit.register(llm_usage.flush)
+    return llm_usage
+
+def get_llm_usage():
+    """Get the global LLM usage recorder"""
+    return llm_usage
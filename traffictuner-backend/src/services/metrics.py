@@ -0,0 +1,309 @@
+import threading
+import time
+from bisect import bisect_left
+import logging
+
+from flask import request, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Dead threads' values are folded together once a metric has this many shards
+MAX_SHARDS = 64
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values)) + '}'
+
+class Metric:
+    """Base for metrics whose values are kept in per-thread shards.
+
+    Each thread updates its own dict, so recording never takes a lock;
+    only a thread's first update and collection do. Collection sums the
+    shards, folding in and dropping those of threads that have exited.
+    """
+
+    kind = None
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._shards = []  # (thread, values)
+        self._retired = {}
+
+    def _values(self):
+        values = getattr(self._local, 'values', None)
+        if values is None:
+            values = self._local.values = {}
+            with self._lock:
+                if len(self._shards) >= MAX_SHARDS:
+                    self._retire_dead()
+                self._shards.append((threading.current_thread(), values))
+        return values
+
+    def _retire_dead(self):
+        live = []
+        for thread, values in self._shards:
+            if thread.is_alive():
+                live.append((thread, values))
+            else:
+                self._merge(self._retired, values)
+        self._shards = live
+
+    def _merge(self, into, values):
+        raise NotImplementedError
+
+    def collect(self):
+        """Return {label values: value} summed over all threads"""
+        with self._lock:
+            self._retire_dead()
+            total = {}
+            self._merge(total, self._retired)
+            for _, values in self._shards:
+                self._merge(total, values.copy())
+        return total
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.kind}']
+        for labels, value in sorted(self.collect().items()):
+            lines.extend(self._render_sample(labels, value))
+        return lines
+
+    def _render_sample(self, labels, value):
+        return [f'{self.name}{_format_labels(self.labelnames, labels)} {_format_value(value)}']
+
+class Counter(Metric):
+    kind = 'counter'
+
+    def inc(self, *labels, amount=1):
+        values = self._values()
+        values[labels] = values.get(labels, 0) + amount
+
+    def _merge(self, into, values):
+        for labels, value in values.items():
+            into[labels] = into.get(labels, 0) + value
+
+class Histogram(Metric):
+    """Histogram kept as per-bucket counts followed by the sum of observations"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def observe(self, value, *labels):
+        values = self._values()
+        entry = values.get(labels)
+        if entry is None:
+            entry = values[labels] = [0] * (len(self.buckets) + 2)
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    def _merge(self, into, values):
+        for labels, entry in values.items():
+            total = into.get(labels)
+            if total is None:
+                into[labels] = list(entry)
+            else:
+                for i, value in enumerate(entry):
+                    total[i] += value
+
+    def _render_sample(self, labels, entry):
+        names = self.labelnames + ('le',)
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), entry):
+            cumulative += count
+            lines.append(f'{self.name}_bucket{_format_labels(names, labels + (_format_value(bound),))} {cumulative}')
+        label_text = _format_labels(self.labelnames, labels)
+        lines.append(f'{self.name}_sum{label_text} {_format_value(entry[-1])}')
+        lines.append(f'{self.name}_count{label_text} {cumulative}')
+        return lines
+
+class Gauge(Metric):
+    """Gauge read from a function at collection time.
+
+    The function returns a number, or {label values: number} for a
+    labelled gauge.
+    """
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self.function = None
+
+    def set_function(self, function):
+        self.function = function
+
+    def collect(self):
+        if self.function is None:
+            return {}
+        try:
+            value = self.function()
+        except Exception as e:
+            logger.warning(f"Failed to read gauge {self.name}: {str(e)}")
+            return {}
+        return value if isinstance(value, dict) else {(): value}
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text format"""
+
+    def __init__(self):
+        self.metrics = {}
+
+    def register(self, metric):
+        if metric.name in self.metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, labelnames=()):
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def render(self):
+        lines = []
+        for metric in self.metrics.values():
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+# Global registry and the metrics recorded by the app
+registry = MetricsRegistry()
+
+HTTP_REQUEST_DURATION = registry.histogram(
+    'http_request_duration_seconds', 'Time spent handling HTTP requests.',
+    ('blueprint', 'route', 'method', 'status')
+)
+DB_QUERY_DURATION = registry.histogram(
+    'db_query_duration_seconds', 'Time spent executing SQL statements.', ('operation',)
+)
+DB_REQUEST_QUERIES = registry.histogram(
+    'db_request_queries', 'SQL statements executed per HTTP request.', ('blueprint', 'route'),
+    buckets=(0, 1, 2, 5, 10, 20, 50, 100, 200)
+)
+DB_REQUEST_DURATION = registry.histogram(
+    'db_request_duration_seconds', 'Time spent executing SQL statements per HTTP request.', ('blueprint', 'route')
+)
+ANALYSIS_QUEUE_DEPTH = registry.gauge(
+    'analysis_queue_depth', 'Analysis jobs waiting for the worker.'
+)
+ANALYSIS_QUEUE_OLDEST_AGE = registry.gauge(
+    'analysis_queue_oldest_job_age_seconds', 'Age of the oldest analysis job waiting for the worker.'
+)
+ANALYSIS_JOB_WAIT = registry.histogram(
+    'analysis_job_wait_seconds', 'Time analysis jobs spent queued before the worker picked them up.',
+    buckets=(0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600)
+)
+ANALYSIS_JOB_DURATION = registry.histogram(
+    'analysis_job_duration_seconds', 'Time the worker spent processing analysis jobs.',
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300)
+)
+ANALYSIS_JOBS = registry.counter(
+    'analysis_jobs_total', 'Analysis jobs finished by the worker, by outcome.', ('outcome',)
+)
+LLM_REQUEST_DURATION = registry.histogram(
+    'llm_request_duration_seconds', 'Latency of LLM API calls.', ('config', 'provider'),
+    buckets=(0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+)
+LLM_TOKENS = registry.counter(
+    'llm_tokens_total', 'Tokens used by LLM API calls.', ('config', 'provider')
+)
+LLM_ERRORS = registry.counter(
+    'llm_errors_total', 'Failed LLM API calls.', ('config', 'provider')
+)
+RATE_LIMIT_BLOCKS = registry.counter(
+    'rate_limit_blocked_total', 'Requests rejected by the rate limiter.', ('group', 'scope')
+)
+VIEW_CACHE_REQUESTS = registry.counter(
+    'view_cache_requests_total', 'Per-user view cache lookups, by view and result (hit or miss).', ('view', 'result')
+)
+VIEW_CACHE_INVALIDATIONS = registry.counter(
+    'view_cache_invalidations_total', 'Users whose cached views were invalidated.'
+)
+
+# SQL statements and time of the request handled by the current thread
+_request_db = threading.local()
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('metrics_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    DB_QUERY_DURATION.observe(elapsed, statement.lstrip().split(None, 1)[0].upper())
+
+    totals = getattr(_request_db, 'totals', None)
+    if totals is not None:
+        totals[0] += 1
+        totals[1] += elapsed
+
+def _handle_error(exception_context):
+    # after_cursor_execute does not run for failed statements
+    conn = exception_context.connection
+    starts = conn.info.get('metrics_query_start') if conn is not None else None
+    if starts:
+        starts.pop()
+
+def _start_request():
+    g.metrics_start = time.perf_counter()
+    _request_db.totals = [0, 0.0]
+
+def _finish_request(response):
+    start = g.pop('metrics_start', None)
+    totals = getattr(_request_db, 'totals', None)
+    _request_db.totals = None
+    if start is None:
+        return response
+
+    blueprint = request.blueprint or ''
+    route = request.url_rule.rule if request.url_rule else 'unmatched'
+    HTTP_REQUEST_DURATION.observe(time.perf_counter() - start, blueprint, route, request.method, str(response.status_code))
+    if totals is not None:
+        DB_REQUEST_QUERIES.observe(totals[0], blueprint, route)
+        DB_REQUEST_DURATION.observe(totals[1], blueprint, route)
+    return response
+
+def init_metrics(app):
+    """Record request, SQL and background job metrics for the app.
+
+    Initialize before other request hooks so request timings include them.
+    Metrics are per process; scrape each worker process separately.
+    """
+    event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+    event.listen(Engine, 'handle_error', _handle_error)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+    return registry
+
+def get_registry():
+    """Get the global metrics registry"""
+    return registry
@@ -0,0 +1,186 @@
+import json
+import time
+import threading
+from datetime import datetime
+from queue import Queue, Empty, Full
+import logging
+
+from sqlalchemy.orm import Session
+
+from src.models.user import db
+from src.models.analysis_progress import AnalysisProgress
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages and their completion percentage
+STAGES = {
+    'queued': 0,
+    'started': 5,
+    'seo_analysis': 25,
+    'aeo_analysis': 50,
+    'generating_llms_txt': 80,
+    'completed': 100,
+    'failed': 100
+}
+
+class ProgressBroker:
+    """In-process pub/sub for analysis progress, backed by the analysis_progress table"""
+
+    def __init__(self, heartbeat_interval=15, poll_interval=2.0, max_stream_duration=300, queue_size=100):
+        self.subscribers = {}
+        self.lock = threading.Lock()
+
+        # Configuration
+        self.HEARTBEAT_INTERVAL = heartbeat_interval
+        self.POLL_INTERVAL = poll_interval
+        self.MAX_STREAM_DURATION = max_stream_duration
+        self.QUEUE_SIZE = queue_size
+
+    def subscribe(self, channels):
+        """Register a subscriber queue for the given channels"""
+        queue = Queue(maxsize=self.QUEUE_SIZE)
+        with self.lock:
+            for channel in channels:
+                self.subscribers.setdefault(channel, set()).add(queue)
+        return queue
+
+    def unsubscribe(self, queue, channels):
+        """Remove a subscriber queue"""
+        with self.lock:
+            for channel in channels:
+                queues = self.subscribers.get(channel)
+                if queues:
+                    queues.discard(queue)
+                    if not queues:
+                        del self.subscribers[channel]
+
+    def publish(self, event):
+        """Deliver an event to every subscriber of its report and user channels"""
+        channels = [f"report:{event['report_id']}", f"user:{event['user_id']}"]
+        with self.lock:
+            queues = set()
+            for channel in channels:
+                queues.update(self.subscribers.get(channel, ()))
+
+        for queue in queues:
+            try:
+                queue.put_nowait(event)
+            except Full:
+                # Slow consumer; it will catch up from the database on its next poll
+                pass
+
+    def record(self, report, stage, status=None, message=None):
+        """Persist the report's current stage and notify local subscribers.
+
+        Progress is written and committed on its own short-lived session, so
+        streams served by other processes see it at once while any report
+        changes pending in the caller's session are left untouched. When the
+        caller has nothing pending, its transaction is ended first so its
+        pooled connection is back before the progress session takes one;
+        otherwise every concurrent caller would hold two and exhaust the pool.
+        """
+        report_id = None
+        try:
+            report_id, user_id, report_status = report.report_id, report.user_id, report.status
+            if not (db.session.new or db.session.dirty or db.session.deleted):
+                db.session.commit()
+
+            with Session(db.engine, expire_on_commit=False) as session:
+                try:
+                    progress = session.query(AnalysisProgress).filter_by(report_id=report_id).first()
+                    if not progress:
+                        progress = AnalysisProgress(report_id=report_id, user_id=user_id)
+                        session.add(progress)
+
+                    progress.status = status or report_status
+                    progress.stage = stage
+                    progress.progress = STAGES.get(stage, 0)
+                    progress.message = message
+                    progress.updated_at = datetime.utcnow()
+                    session.commit()
+                except Exception:
+                    session.rollback()
+                    raise
+
+            event = progress.to_dict()
+            event['user_id'] = progress.user_id
+            self.publish(event)
+        except Exception as e:
+            logger.error(f"Failed to record progress for report {report_id}: {str(e)}")
+
+    def stream(self, channels, load_events, report_stream=False):
+        """Yield server-sent events for the given channels.
+
+        ``load_events(since)`` returns progress events updated after ``since``
+        (or all of them when ``since`` is None) and is used both for the
+        initial snapshot and as the cross-process fallback when no local
+        event arrives within the poll interval.
+        """
+        queue = self.subscribe(channels)
+        last_seen = {}
+        started = time.time()
+        last_write = started
+        last_poll = None
+
+        def fresh(events):
+            for event in events:
+                if event['updated_at'] and event['updated_at'] <= last_seen.get(event['report_id'], ''):
+                    continue
+                last_seen[event['report_id']] = event['updated_at'] or ''
+                yield event
+
+        def format_event(event):
+            event = {key: value for key, value in event.items() if key != 'user_id'}
+            return f"id: {event['updated_at']}\nevent: progress\ndata: {json.dumps(event)}\n\n"
+
+        try:
+            yield f"retry: {int(self.POLL_INTERVAL * 1000)}\n\n"
+
+            while time.time() - started < self.MAX_STREAM_DURATION:
+                if last_poll is None or time.time() - last_poll >= self.POLL_INTERVAL:
+                    events = load_events(last_poll and datetime.utcfromtimestamp(last_poll - self.POLL_INTERVAL))
+                    last_poll = time.time()
+                else:
+                    try:
+                        events = [queue.get(timeout=self.POLL_INTERVAL)]
+                    except Empty:
+                        continue
+
+                for event in fresh(events):
+                    last_write = time.time()
+                    yield format_event(event)
+                    if report_stream and event['status'] in ['completed', 'failed']:
+                        return
+
+                if time.time() - last_write >= self.HEARTBEAT_INTERVAL:
+                    last_write = time.time()
+                    yield ": keep-alive\n\n"
+        finally:
+            self.unsubscribe(queue, channels)
+
+def load_progress_events(since=None, report_id=None, user_id=None):
+    """Load progress events from the database, optionally only those updated after ``since``"""
+    query = AnalysisProgress.query.populate_existing()
+    if report_id:
+        query = query.filter_by(report_id=report_id)
+    if user_id:
+        query = query.filter_by(user_id=user_id)
+    if since:
+        query = query.filter(AnalysisProgress.updated_at > since)
+
+    events = []
+    for progress in query.order_by(AnalysisProgress.updated_at).all():
+        event = progress.to_dict()
+        event['user_id'] = progress.user_id
+        events.append(event)
+
+    # Don't hold a read transaction open between polls
+    db.session.rollback()
+    return events
+
+# Global broker instance
+progress_broker = ProgressBroker()
+
+def get_broker():
+    """Get the global progress broker"""
+    return progress_broker
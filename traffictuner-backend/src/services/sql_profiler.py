@@ -0,0 +1,179 @@
+import re
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from functools import lru_cache
+import logging
+
+from flask import request, g
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+logger = logging.getLogger(__name__)
+
+WHITESPACE = re.compile(r'\s+')
+PLACEHOLDER_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+NUMBER = re.compile(r'\b\d+\b')
+STRING = re.compile(r"'(?:[^']|'')*'")
+
+@lru_cache(maxsize=1024)
+def statement_shape(statement):
+    """Normalize a statement so queries differing only in their values compare equal"""
+    shape = WHITESPACE.sub(' ', statement).strip()
+    shape = STRING.sub('?', shape)
+    shape = NUMBER.sub('?', shape)
+    return PLACEHOLDER_LIST.sub('(...)', shape)
+
+class QueryProfile:
+    """SQL statements executed by one thread while the profile is active"""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.shapes = Counter()
+
+    def record(self, statement, elapsed):
+        self.count += 1
+        self.duration += elapsed
+        self.shapes[statement_shape(statement)] += 1
+
+    def repeated(self, threshold):
+        """[(shape, count)] of statements run at least ``threshold`` times, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def describe(self, limit=10):
+        """Summary with the ``limit`` most frequent statement shapes"""
+        lines = [f"{self.count} queries in {self.duration * 1000:.1f}ms"]
+        lines.extend(f"  {count}x {shape[:300]}" for shape, count in self.shapes.most_common(limit))
+        return '\n'.join(lines)
+
+# Profiles active on the current thread; every statement is recorded in all of them
+_active = threading.local()
+_install_lock = threading.Lock()
+_installed = False
+
+def _active_profiles():
+    return getattr(_active, 'profiles', None)
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if _active_profiles():
+        conn.info.setdefault('profiler_query_start', []).append(time.perf_counter())
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    starts = conn.info.get('profiler_query_start')
+    if not starts:
+        return
+    elapsed = time.perf_counter() - starts.pop()
+    for profile in _active_profiles() or ():
+        profile.record(statement, elapsed)
+
+def _handle_error(exception_context):
+    conn = exception_context.connection
+    starts = conn.info.get('profiler_query_start') if conn is not None else None
+    if starts:
+        starts.pop()
+
+def _install():
+    global _installed
+    with _install_lock:
+        if not _installed:
+            event.listen(Engine, 'before_cursor_execute', _before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', _after_cursor_execute)
+            event.listen(Engine, 'handle_error', _handle_error)
+            _installed = True
+
+def start_profile():
+    """Start recording this thread's statements in a new profile"""
+    _install()
+    profile = QueryProfile()
+    if _active_profiles() is None:
+        _active.profiles = []
+    _active.profiles.append(profile)
+    return profile
+
+def stop_profile(profile):
+    """Stop recording statements in a profile"""
+    profiles = _active_profiles()
+    if profiles and profile in profiles:
+        profiles.remove(profile)
+
+@contextmanager
+def assert_max_queries(max_queries):
+    """Fail when the block executes more than ``max_queries`` SQL statements.
+
+    Requests made with the Flask test client run on the calling thread,
+    so this bounds an endpoint's queries:
+
+        with assert_max_queries(3):
+            client.get('/api/domains', headers=headers)
+    """
+    profile = start_profile()
+    try:
+        yield profile
+    finally:
+        stop_profile(profile)
+    if profile.count > max_queries:
+        raise AssertionError(f"Expected at most {max_queries} queries, got {profile.describe()}")
+
+class SQLProfiler:
+    """Request-scoped SQL profiling for development and staging.
+
+    Adds a Server-Timing header with each request's SQL statements and
+    time, and logs requests over ``max_queries`` statements, over
+    ``slow_ms`` of SQL time, or repeating one statement shape at least
+    ``repeat_threshold`` times (the N+1 pattern).
+    """
+
+    def __init__(self, app, max_queries=20, slow_ms=200, repeat_threshold=5):
+        self.app = app
+        self.max_queries = max_queries
+        self.slow_ms = slow_ms
+        self.repeat_threshold = repeat_threshold
+
+    def start_request(self):
+        g.sql_profile = start_profile()
+
+    def finish_request(self, response):
+        profile = g.pop('sql_profile', None)
+        if profile is None:
+            return response
+        stop_profile(profile)
+
+        duration_ms = profile.duration * 1000
+        response.headers.add('Server-Timing', f'db;dur={duration_ms:.2f};desc="{profile.count} queries"')
+
+        problems = []
+        if profile.count > self.max_queries:
+            problems.append(f"{profile.count} queries")
+        if duration_ms > self.slow_ms:
+            problems.append(f"{duration_ms:.1f}ms in SQL")
+        repeated = profile.repeated(self.repeat_threshold)
+        if repeated:
+            problems.append(f"{len(repeated)} repeated statements")
+        if problems:
+            logger.warning(f"{request.method} {request.path}: {', '.join(problems)}\n{profile.describe()}")
+
+        return response
+
+    def teardown_request(self, exception=None):
+        # Requests that never reached after_request must not leave their profile recording
+        profile = g.pop('sql_profile', None)
+        if profile is not None:
+            stop_profile(profile)
+
+def init_sql_profiler(app):
+    """Profile each request's SQL when SQL_PROFILER is enabled"""
+    if not app.config.get('SQL_PROFILER'):
+        return None
+
+    profiler = SQLProfiler(
+        app,
+        max_queries=app.config.get('SQL_PROFILER_MAX_QUERIES', 20),
+        slow_ms=app.config.get('SQL_PROFILER_SLOW_MS', 200),
+        repeat_threshold=app.config.get('SQL_PROFILER_REPEAT_THRESHOLD', 5)
+    )
+    app.before_request(profiler.start_request)
+    app.after_request(profiler.finish_request)
+    app.teardown_request(profiler.teardown_request)
+    return profiler
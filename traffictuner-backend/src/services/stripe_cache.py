@@ -0,0 +1,136 @@
+import threading
+import time
+from queue import Queue, Empty
+import logging
+
+import stripe
+
+from src.models.user import db
+from src.models.stripe_object import StripeObject
+
+logger = logging.getLogger(__name__)
+
+def _to_dict(obj):
+    return obj.to_dict() if hasattr(obj, 'to_dict') else dict(obj)
+
+# How each cached object type is fetched from the Stripe API
+FETCHERS = {
+    'subscription': lambda object_id: stripe.Subscription.retrieve(object_id),
+    'price': lambda object_id: stripe.Price.retrieve(object_id),
+    'customer': lambda object_id: stripe.Customer.retrieve(object_id)
+}
+
+class StripeCache:
+    """Read-through cache of Stripe objects in the stripe_objects table.
+
+    Webhooks keep copies current. Copies older than ``ttl`` seconds are
+    still served but refreshed in the background (stale-while-revalidate),
+    so request paths using ``peek`` never wait on Stripe. ``get`` falls back
+    to a synchronous fetch when there is no usable copy and is meant for
+    background work such as webhook handlers.
+    """
+
+    def __init__(self, app, ttl=3600, max_stale=86400):
+        self.app = app
+        self.ttl = ttl
+        self.max_stale = max_stale
+        self.refresh_queue = Queue()
+        self.refreshing = set()
+        self.refresh_lock = threading.Lock()
+        self.is_running = False
+        self.refresh_thread = None
+
+    def start(self):
+        """Start the background refresher"""
+        if not self.is_running:
+            self.is_running = True
+            self.refresh_thread = threading.Thread(target=self._refresh_loop, daemon=True)
+            self.refresh_thread.start()
+
+    def stop(self):
+        """Stop the background refresher"""
+        self.is_running = False
+        if self.refresh_thread:
+            self.refresh_thread.join()
+
+    def store(self, object_type, data, source_created=None):
+        """Save an object received from Stripe; the caller commits"""
+        return StripeObject.store(object_type, _to_dict(data), source_created)
+
+    def peek(self, object_type, object_id):
+        """Return the cached copy, or None, without ever calling Stripe.
+
+        Missing and expired copies are refreshed in the background.
+        """
+        if not object_id:
+            return None
+
+        stored = StripeObject.query.filter_by(object_id=object_id).first()
+        if not stored or stored.age() >= self.ttl:
+            self.schedule_refresh(object_type, object_id)
+        if not stored or stored.age() >= self.max_stale:
+            return None
+        return stored.get_data()
+
+    def get(self, object_type, object_id):
+        """Return the cached copy, fetching from Stripe when there is no usable one.
+
+        A fetched object is stored but not committed.
+        """
+        data = self.peek(object_type, object_id)
+        if data is not None:
+            return data
+
+        data = _to_dict(FETCHERS[object_type](object_id))
+        StripeObject.store(object_type, data, int(time.time()))
+        return data
+
+    def schedule_refresh(self, object_type, object_id):
+        """Queue a background fetch unless one is already pending"""
+        with self.refresh_lock:
+            if object_id in self.refreshing:
+                return
+            self.refreshing.add(object_id)
+        self.refresh_queue.put((object_type, object_id))
+
+    def refresh(self, object_type, object_id):
+        """Fetch an object from Stripe and store it"""
+        with self.app.app_context():
+            try:
+                data = _to_dict(FETCHERS[object_type](object_id))
+                StripeObject.store(object_type, data, int(time.time()))
+                db.session.commit()
+            except Exception as e:
+                db.session.rollback()
+                logger.warning(f"Failed to refresh Stripe {object_type} {object_id}: {str(e)}")
+
+    def _refresh_loop(self):
+        while self.is_running:
+            try:
+                object_type, object_id = self.refresh_queue.get(timeout=1.0)
+            except Empty:
+                continue
+
+            try:
+                self.refresh(object_type, object_id)
+            finally:
+                with self.refresh_lock:
+                    self.refreshing.discard(object_id)
+
+# Global cache instance
+stripe_cache = None
+
+def init_stripe_cache(app):
+    """Initialize the Stripe object cache"""
+    global stripe_cache
+    stripe_cache = StripeCache(
+        app,
+        ttl=app.config.get('STRIPE_CACHE_TTL', 3600),
+        max_stale=app.config.get('STRIPE_CACHE_MAX_STALE', 86400)
+    )
+    stripe_cache.start()
+    return stripe_cache
+
+def get_stripe_cache():
+    """Get the global Stripe object cache"""
+    return stripe_cache
@@ -0,0 +1,285 @@
+"""
+Tracking Snippet Engine
+Precompiled tracking code templates, cached per-domain bundles and the
+public tt.js loader scripts
+"""
+
+from collections import OrderedDict
+from functools import lru_cache
+import gzip
+import hashlib
+import json
+import re
+import threading
+import time
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# Snippet templates per platform; {tracking_id} is the only placeholder
+
+META_PIXEL_TEMPLATE = """
+<!-- Meta Pixel Code -->
+<script>
+!function(f,b,e,v,n,t,s)
+{if(f.fbq)return;n=f.fbq=function(){n.callMethod?
+n.callMethod.apply(n,arguments):n.queue.push(arguments)};
+if(!f._fbq)f._fbq=n;n.push=n;n.loaded=!0;n.version='2.0';
+n.queue=[];t=b.createElement(e);t.async=!0;
+t.src=v;s=b.getElementsByTagName(e)[0];
+s.parentNode.insertBefore(t,s)}(window, document,'script',
+'https://connect.facebook.net/en_US/fbevents.js');
+fbq('init', '{tracking_id}');
+fbq('track', 'PageView');
+</script>
+<noscript><img height="1" width="1" style="display:none"
+src="https://www.facebook.com/tr?id={tracking_id}&ev=PageView&noscript=1"
+/></noscript>
+<!-- End Meta Pixel Code -->
+"""
+
+GA4_TEMPLATE = """
+<!-- Google Analytics 4 -->
+<script async src="https://www.googletagmanager.com/gtag/js?id={tracking_id}"></script>
+<script>
+  window.dataLayer = window.dataLayer || [];
+  function gtag(){dataLayer.push(arguments);}
+  gtag('js', new Date());
+  gtag('config', '{tracking_id}');
+</script>
+<!-- End Google Analytics 4 -->
+"""
+
+GTM_TEMPLATE = """
+<!-- Google Tag Manager -->
+<script>(function(w,d,s,l,i){w[l]=w[l]||[];w[l].push({'gtm.start':
+new Date().getTime(),event:'gtm.js'});var f=d.getElementsByTagName(s)[0],
+j=d.createElement(s),dl=l!='dataLayer'?'&l='+l:'';j.async=true;j.src=
+'https://www.googletagmanager.com/gtm.js?id='+i+dl;f.parentNode.insertBefore(j,f);
+})(window,document,'script','dataLayer','{tracking_id}');</script>
+<!-- End Google Tag Manager -->
+
+<!-- Google Tag Manager (noscript) -->
+<noscript><iframe src="https://www.googletagmanager.com/ns.html?id={tracking_id}"
+height="0" width="0" style="display:none;visibility:hidden"></iframe></noscript>
+<!-- End Google Tag Manager (noscript) -->
+"""
+
+CLARITY_TEMPLATE = """
+<!-- Microsoft Clarity -->
+<script type="text/javascript">
+    (function(c,l,a,r,i,t,y){
+        c[a]=c[a]||function(){(c[a].q=c[a].q||[]).push(arguments)};
+        t=l.createElement(r);t.async=1;t.src="https://www.clarity.ms/tag/"+i;
+        y=l.getElementsByTagName(r)[0];y.parentNode.insertBefore(t,y);
+    })(window, document, "clarity", "script", "{tracking_id}");
+</script>
+<!-- End Microsoft Clarity -->
+"""
+
+class SnippetTemplate:
+    """A template split around its placeholder once, so rendering is a single join"""
+    __slots__ = ('parts',)
+
+    PLACEHOLDER = '{tracking_id}'
+
+    def __init__(self, template):
+        self.parts = template.split(self.PLACEHOLDER)
+
+    def render(self, tracking_id):
+        return tracking_id.join(self.parts)
+
+TEMPLATES = {
+    'meta_pixel': SnippetTemplate(META_PIXEL_TEMPLATE),
+    'ga4': SnippetTemplate(GA4_TEMPLATE),
+    'gtm': SnippetTemplate(GTM_TEMPLATE),
+    'clarity': SnippetTemplate(CLARITY_TEMPLATE)
+}
+
+# Minified JavaScript equivalents of the snippets, for the tt.js loader
+LOADER_TEMPLATES = {
+    'meta_pixel': SnippetTemplate("!function(f,b,e,v,n,t,s){if(f.fbq)return;n=f.fbq=function(){n.callMethod?n.callMethod.apply(n,arguments):n.queue.push(arguments)};if(!f._fbq)f._fbq=n;n.push=n;n.loaded=!0;n.version='2.0';n.queue=[];t=b.createElement(e);t.async=!0;t.src=v;s=b.getElementsByTagName(e)[0];s.parentNode.insertBefore(t,s)}(window,document,'script','https://connect.facebook.net/en_US/fbevents.js');fbq('init','{tracking_id}');fbq('track','PageView');"),
+    'ga4': SnippetTemplate("(function(w,d,i){var s=d.createElement('script');s.async=true;s.src='https://www.googletagmanager.com/gtag/js?id='+i;d.head.appendChild(s);w.dataLayer=w.dataLayer||[];w.gtag=w.gtag||function(){w.dataLayer.push(arguments)};w.gtag('js',new Date());w.gtag('config',i)})(window,document,'{tracking_id}');"),
+    'gtm': SnippetTemplate("(function(w,d,s,l,i){w[l]=w[l]||[];w[l].push({'gtm.start':new Date().getTime(),event:'gtm.js'});var f=d.getElementsByTagName(s)[0],j=d.createElement(s),dl=l!='dataLayer'?'&l='+l:'';j.async=true;j.src='https://www.googletagmanager.com/gtm.js?id='+i+dl;f.parentNode.insertBefore(j,f)})(window,document,'script','dataLayer','{tracking_id}');"),
+    'clarity': SnippetTemplate("(function(c,l,a,r,i,t,y){c[a]=c[a]||function(){(c[a].q=c[a].q||[]).push(arguments)};t=l.createElement(r);t.async=1;t.src='https://www.clarity.ms/tag/'+i;y=l.getElementsByTagName(r)[0];y.parentNode.insertBefore(t,y)})(window,document,'clarity','script','{tracking_id}');")
+}
+
+# Tracking ids are embedded in JavaScript string literals and URLs, so only
+# plain identifiers are accepted
+TRACKING_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+def is_valid_tracking_id(tracking_id):
+    """Check that a tracking id is safe to embed in a snippet"""
+    return isinstance(tracking_id, str) and TRACKING_ID_PATTERN.match(tracking_id) is not None
+
+def render_snippet(platform, tracking_id, settings=None):
+    """Render the tracking code for a platform"""
+    template = TEMPLATES.get(platform)
+    if template is None:
+        return f"<!-- Unknown tracking platform: {platform} -->"
+    return template.render(tracking_id)
+
+@lru_cache(maxsize=4096)
+def _parse_settings(settings):
+    return json.loads(settings)
+
+def parse_settings(settings):
+    """Parse a config's settings JSON, caching by the raw string"""
+    if not settings:
+        return None
+    try:
+        # Copy so callers cannot mutate the cached value
+        return dict(_parse_settings(settings))
+    except (json.JSONDecodeError, TypeError):
+        return None
+
+class TrackingBundle:
+    """Rendered tracking codes for one domain"""
+
+    def __init__(self, tracking_codes):
+        self.tracking_codes = tracking_codes
+        self.combined_code = '\n'.join([tc['code'] for tc in tracking_codes])
+        self.etag = hashlib.sha256(json.dumps(tracking_codes, sort_keys=True).encode()).hexdigest()[:32]
+        self.created_at = time.monotonic()
+
+    @staticmethod
+    def build(configs):
+        """Render a bundle from active tracking configs"""
+        return TrackingBundle([{
+            'config_id': config.config_id,
+            'platform': config.platform,
+            'name': config.name,
+            'tracking_id': config.tracking_id,
+            'code': render_snippet(config.platform, config.tracking_id, parse_settings(config.settings))
+        } for config in configs])
+
+class BundleCache:
+    """Per-domain bundle cache, invalidated whenever a domain's configs change.
+
+    Entries also expire after ``ttl`` seconds so that changes made by other
+    worker processes are picked up.
+    """
+
+    def __init__(self, ttl=60, max_size=10000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.bundles = {}  # (user_id, domain_id) -> TrackingBundle
+        self.lock = threading.Lock()
+
+    def get(self, user_id, domain_id):
+        with self.lock:
+            bundle = self.bundles.get((user_id, domain_id))
+            if bundle and time.monotonic() - bundle.created_at < self.ttl:
+                return bundle
+            return None
+
+    def set(self, user_id, domain_id, bundle):
+        with self.lock:
+            if len(self.bundles) >= self.max_size:
+                self.bundles.clear()
+            self.bundles[(user_id, domain_id)] = bundle
+
+    def invalidate(self, user_id, domain_id):
+        """Drop a domain's bundle; configs without a domain are in no bundle"""
+        if domain_id is None:
+            return
+        with self.lock:
+            self.bundles.pop((user_id, domain_id), None)
+
+bundle_cache = BundleCache()
+
+# HTTP caching for tt.js: CDNs and browsers revalidate after SCRIPT_MAX_AGE
+# seconds and may keep serving the stale copy while they do
+SCRIPT_MAX_AGE = 300
+SCRIPT_STALE_WHILE_REVALIDATE = 86400
+
+class LoaderScript:
+    """A domain's tt.js loader with its precompressed variants"""
+    __slots__ = ('body', 'body_gzip', 'body_brotli', 'etag')
+
+    def __init__(self, body, body_gzip, body_brotli, etag):
+        self.body = body
+        self.body_gzip = body_gzip
+        self.body_brotli = body_brotli
+        self.etag = etag
+
+    @staticmethod
+    def build(configs):
+        """Render and compress the loader for a domain's active tracking configs"""
+        body = '\n'.join([
+            LOADER_TEMPLATES[config.platform].render(config.tracking_id)
+            for config in configs
+            if config.platform in LOADER_TEMPLATES and is_valid_tracking_id(config.tracking_id)
+        ]).encode()
+        return LoaderScript(
+            body,
+            # mtime=0 keeps the output, and so the stored bytes, deterministic
+            gzip.compress(body, compresslevel=9, mtime=0),
+            brotli.compress(body) if brotli else None,
+            hashlib.sha256(body).hexdigest()[:32]
+        )
+
+    def variants(self):
+        """Available encodings in order of preference, with their bodies"""
+        variants = []
+        if self.body_brotli is not None:
+            variants.append(('br', self.body_brotli))
+        variants.append(('gzip', self.body_gzip))
+        variants.append(('identity', self.body))
+        return variants
+
+class ScriptCache:
+    """Short-lived in-process LRU cache of loader scripts by domain id.
+
+    Unknown domains are cached as None too, so repeated requests for them
+    don't reach the database either. They are kept in a separate, smaller
+    LRU map, so a flood of made-up ids cannot push out the real scripts.
+    """
+
+    def __init__(self, ttl=30, max_size=10000, max_misses=1000):
+        self.ttl = ttl
+        self.max_size = max_size
+        self.max_misses = max_misses
+        self.scripts = OrderedDict()  # domain_id -> (expires at, LoaderScript), least recently used first
+        self.misses = OrderedDict()  # domain_id -> expires at, least recently used first
+        self.lock = threading.Lock()
+
+    def get(self, domain_id):
+        """Return (found, script)"""
+        now = time.monotonic()
+        with self.lock:
+            cached = self.scripts.get(domain_id)
+            if cached and cached[0] > now:
+                self.scripts.move_to_end(domain_id)
+                return True, cached[1]
+            expires_at = self.misses.get(domain_id)
+            if expires_at and expires_at > now:
+                self.misses.move_to_end(domain_id)
+                return True, None
+            return False, None
+
+    def set(self, domain_id, script):
+        expires_at = time.monotonic() + self.ttl
+        with self.lock:
+            if script is None:
+                self.scripts.pop(domain_id, None)
+                self._put(self.misses, domain_id, expires_at, self.max_misses)
+            else:
+                self.misses.pop(domain_id, None)
+                self._put(self.scripts, domain_id, (expires_at, script), self.max_size)
+
+    @staticmethod
+    def _put(entries, key, value, max_size):
+        entries[key] = value
+        entries.move_to_end(key)
+        while len(entries) > max_size:
+            entries.popitem(last=False)
+
+    def invalidate(self, domain_id):
+        with self.lock:
+            self.scripts.pop(domain_id, None)
+            self.misses.pop(domain_id, None)
+
+script_cache = ScriptCache()
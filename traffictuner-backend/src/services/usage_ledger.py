@@ -0,0 +1,175 @@
+import atexit
+import threading
+import time
+from datetime import datetime
+import logging
+
+from sqlalchemy import event, insert, text
+from sqlalchemy.orm import Session
+
+from src.models.user import db, credits_changed
+from src.models.usage import UsageEntry
+
+logger = logging.getLogger(__name__)
+
+class UsageLedger:
+    """Buffered writer for the usage ledger and its daily rollups.
+
+    Entries recorded during a transaction are staged on the session and
+    only buffered once it commits, so rolled back credit changes never
+    reach the ledger. The buffer is written every ``flush_interval``
+    seconds, or sooner once it holds ``batch_size`` entries, as one
+    multi-row insert into usage_ledger plus one upsert per user and day
+    into usage_daily, in a single transaction. It is also flushed at exit;
+    entries still buffered when a process is killed are lost.
+    """
+
+    ROLLUP_SQL = text("""
+        INSERT INTO usage_daily (user_id, day, credits_spent, credits_added, tokens, cost, entries)
+        VALUES (:user_id, :day, :credits_spent, :credits_added, :tokens, :cost, :entries)
+        ON CONFLICT (user_id, day) DO UPDATE SET
+            credits_spent = usage_daily.credits_spent + excluded.credits_spent,
+            credits_added = usage_daily.credits_added + excluded.credits_added,
+            tokens = usage_daily.tokens + excluded.tokens,
+            cost = usage_daily.cost + excluded.cost,
+            entries = usage_daily.entries + excluded.entries
+    """)
+
+    def __init__(self, app, batch_size=500, flush_interval=5.0):
+        self.app = app
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.buffer = []
+        self.lock = threading.Lock()
+        self.flush_lock = threading.Lock()
+        self.wakeup = threading.Event()
+        self.is_running = False
+        self.flush_thread = None
+
+    def start(self):
+        """Start the background flusher"""
+        if not self.is_running:
+            self.is_running = True
+            self.flush_thread = threading.Thread(target=self._flush_loop, daemon=True)
+            self.flush_thread.start()
+
+    def stop(self):
+        """Stop the background flusher and write what is left"""
+        self.is_running = False
+        self.wakeup.set()
+        if self.flush_thread:
+            self.flush_thread.join()
+        self.flush()
+
+    def record(self, user_id, source, credit_delta=0, tokens=0, cost=0.0, report_id=None, llm_config_id=None,
+               on_commit=True):
+        """Record a ledger entry.
+
+        By default the entry is staged until the current transaction commits.
+        Pass ``on_commit=False`` for usage that happened whatever the
+        transaction's outcome, such as a paid LLM call.
+        """
+        entry = {
+            'user_id': user_id,
+            'report_id': report_id,
+            'llm_config_id': llm_config_id,
+            'source': source,
+            'credit_delta': credit_delta,
+            'tokens': tokens,
+            'cost': cost,
+            'created_at': datetime.utcnow()
+        }
+
+        if on_commit:
+            db.session.info.setdefault('usage_entries', []).append(entry)
+        else:
+            self._buffer([entry])
+
+    def _committed(self, session):
+        entries = session.info.pop('usage_entries', None)
+        if entries:
+            self._buffer(entries)
+
+    def _buffer(self, entries):
+        with self.lock:
+            self.buffer.extend(entries)
+            full = len(self.buffer) >= self.batch_size
+        if full:
+            self.wakeup.set()
+
+    def _rolled_back(self, session):
+        session.info.pop('usage_entries', None)
+
+    def flush(self):
+        """Write buffered entries and their rollups, returning how many were written"""
+        with self.flush_lock:
+            with self.lock:
+                entries, self.buffer = self.buffer, []
+            if not entries:
+                return 0
+
+            rollups = {}
+            for entry in entries:
+                key = (entry['user_id'], entry['created_at'].date().isoformat())
+                rollup = rollups.setdefault(key, {
+                    'user_id': key[0], 'day': key[1], 'credits_spent': 0,
+                    'credits_added': 0, 'tokens': 0, 'cost': 0.0, 'entries': 0
+                })
+                if entry['credit_delta'] < 0:
+                    rollup['credits_spent'] -= entry['credit_delta']
+                else:
+                    rollup['credits_added'] += entry['credit_delta']
+                rollup['tokens'] += entry['tokens']
+                rollup['cost'] += entry['cost']
+                rollup['entries'] += 1
+
+            try:
+                with self.app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(insert(UsageEntry.__table__), entries)
+                        connection.execute(self.ROLLUP_SQL, list(rollups.values()))
+            except Exception as e:
+                # Keep the entries for the next flush
+                with self.lock:
+                    self.buffer[:0] = entries
+                logger.error(f"Failed to write {len(entries)} usage ledger entries: {str(e)}")
+                return 0
+
+            return len(entries)
+
+    def _flush_loop(self):
+        while self.is_running:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                logger.error(f"Usage ledger flush error: {str(e)}")
+                time.sleep(self.flush_interval)
+
+# Global ledger instance
+usage_ledger = None
+
+def _record_credit_change(user_pk, delta, source, report_id):
+    usage_ledger.record(user_pk, source, credit_delta=delta, report_id=report_id)
+
+def init_usage_ledger(app):
+    """Initialize the usage ledger and record every credit change in it"""
+    global usage_ledger
+    usage_ledger = UsageLedger(
+        app,
+        batch_size=app.config.get('USAGE_LEDGER_BATCH_SIZE', 500),
+        flush_interval=app.config.get('USAGE_LEDGER_FLUSH_INTERVAL', 5.0)
+    )
+
+    event.listen(Session, 'after_commit', usage_ledger._committed)
+    event.listen(Session, 'after_rollback', usage_ledger._rolled_back)
+    credits_changed.connect(_record_credit_change)
+
+    usage_ledger.start()
+    atexit.register(usage_ledger.flush)
+    return usage_ledger
+
+def get_usage_ledger():
+    """Get the global usage ledger"""
+    return usage_ledger
@@ -0,0 +1,245 @@
+"""
+Per-User View Cache
+Read-through cache of the JSON payloads behind the dashboard's per-user
+views, invalidated once changes to the user's data are committed
+"""
+
+from flask import has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session, object_session
+from collections import OrderedDict
+import json
+import threading
+import time
+import logging
+
+from src.models.user import db, user_changed
+from src.models.domain import Domain
+from src.models.analysis_report import AnalysisReport
+from src.models.subscription import Subscription
+from src.services.metrics import VIEW_CACHE_REQUESTS, VIEW_CACHE_INVALIDATIONS
+
+logger = logging.getLogger(__name__)
+
+class ViewCacheBackend:
+    """Interface for view cache storage.
+
+    Every user has a generation number that invalidation bumps. Entries
+    remember the generation they were built under and only count while it
+    is current, and a payload built under an older generation is never
+    stored, so a view computed while the user's data was changing cannot
+    outlive the change.
+    """
+
+    def generation(self, user_pk):
+        """Current generation of a user's views"""
+        raise NotImplementedError
+
+    def get(self, user_pk, view):
+        """Return ``(True, payload)`` for a current entry, else ``(False, None)``"""
+        raise NotImplementedError
+
+    def set(self, user_pk, view, payload, generation, ttl):
+        """Store a payload built under ``generation``, unless it has moved on"""
+        raise NotImplementedError
+
+    def invalidate(self, user_pk):
+        """Drop all of a user's views"""
+        raise NotImplementedError
+
+class MemoryViewCacheBackend(ViewCacheBackend):
+    """Per-process LRU storage; invalidations only reach this process.
+
+    Payloads are shared with callers, who must not modify them.
+    """
+
+    def __init__(self, max_entries=10000):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()  # (user_pk, view) -> (expires_at, generation, payload)
+        self.generations = OrderedDict()  # user_pk -> generation, least recently bumped first
+        self.views = set()
+        self.lock = threading.Lock()
+
+    def generation(self, user_pk):
+        with self.lock:
+            return self.generations.get(user_pk, 0)
+
+    def get(self, user_pk, view):
+        key = (user_pk, view)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return False, None
+            expires_at, generation, payload = entry
+            if time.monotonic() >= expires_at or generation != self.generations.get(user_pk, 0):
+                del self.entries[key]
+                return False, None
+            self.entries.move_to_end(key)
+            return True, payload
+
+    def set(self, user_pk, view, payload, generation, ttl):
+        key = (user_pk, view)
+        with self.lock:
+            if generation != self.generations.get(user_pk, 0):
+                return
+            self.views.add(view)
+            self.entries[key] = (time.monotonic() + ttl, generation, payload)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def invalidate(self, user_pk):
+        with self.lock:
+            self.generations[user_pk] = self.generations.pop(user_pk, 0) + 1
+            # Forgetting an old generation is safe: its entries are deleted below
+            while len(self.generations) > self.max_entries:
+                self.generations.popitem(last=False)
+            for view in self.views:
+                self.entries.pop((user_pk, view), None)
+
+class RedisViewCacheBackend(ViewCacheBackend):
+    """Storage shared by every process through Redis.
+
+    ``client`` needs ``get``, ``mget``, ``set`` and ``incr`` with redis-py
+    semantics. Invalidation is a single INCR of the user's generation;
+    entries of older generations are ignored and expire on their own.
+    """
+
+    GENERATION_TTL = 86400
+
+    def __init__(self, client, prefix='tt:view:'):
+        self.client = client
+        self.prefix = prefix
+
+    def _generation_key(self, user_pk):
+        return f'{self.prefix}{user_pk}:generation'
+
+    def generation(self, user_pk):
+        return int(self.client.get(self._generation_key(user_pk)) or 0)
+
+    def get(self, user_pk, view):
+        generation, raw = self.client.mget(self._generation_key(user_pk), f'{self.prefix}{user_pk}:{view}')
+        if raw is None:
+            return False, None
+        entry = json.loads(raw)
+        if entry['generation'] != int(generation or 0):
+            return False, None
+        return True, entry['payload']
+
+    def set(self, user_pk, view, payload, generation, ttl):
+        if generation != self.generation(user_pk):
+            return
+        entry = json.dumps({'generation': generation, 'payload': payload})
+        self.client.set(f'{self.prefix}{user_pk}:{view}', entry, ex=max(1, int(ttl)))
+
+    def invalidate(self, user_pk):
+        key = self._generation_key(user_pk)
+        self.client.incr(key)
+        self.client.expire(key, self.GENERATION_TTL)
+
+class ViewCache:
+    """Read-through cache of per-user view payloads"""
+
+    def __init__(self, backend, ttl=30):
+        self.backend = backend
+        self.ttl = ttl
+
+    def get_or_build(self, view, user_pk, build):
+        """Return the cached payload of a user's view, calling ``build()`` to make it on a miss"""
+        if not self.ttl:
+            return build()
+
+        try:
+            found, payload = self.backend.get(user_pk, view)
+            generation = None if found else self.backend.generation(user_pk)
+        except Exception as e:
+            logger.warning(f"View cache lookup failed: {str(e)}")
+            return build()
+
+        if found:
+            VIEW_CACHE_REQUESTS.inc(view, 'hit')
+            return payload
+
+        VIEW_CACHE_REQUESTS.inc(view, 'miss')
+        payload = build()
+        try:
+            self.backend.set(user_pk, view, payload, generation, self.ttl)
+        except Exception as e:
+            logger.warning(f"View cache store failed: {str(e)}")
+        return payload
+
+    def invalidate(self, user_pk):
+        """Drop a user's views now"""
+        VIEW_CACHE_INVALIDATIONS.inc()
+        try:
+            self.backend.invalidate(user_pk)
+        except Exception as e:
+            logger.error(f"View cache invalidation failed for user {user_pk}: {str(e)}")
+
+    def invalidate_on_commit(self, user_pk, session=None):
+        """Drop a user's views once the current transaction commits.
+
+        Invalidating earlier would let a concurrent request rebuild a view
+        from the data as it was before the commit.
+        """
+        if session is None:
+            if not has_app_context():
+                self.invalidate(user_pk)
+                return
+            session = db.session
+        session.info.setdefault('view_cache_users', set()).add(user_pk)
+
+    def _committed(self, session):
+        for user_pk in session.info.pop('view_cache_users', ()):
+            self.invalidate(user_pk)
+
+    def _rolled_back(self, session):
+        session.info.pop('view_cache_users', None)
+
+def create_backend(app):
+    """Build the view cache backend selected by VIEW_CACHE_BACKEND (memory or redis)"""
+    backend = app.config.get('VIEW_CACHE_BACKEND', 'memory')
+
+    if backend == 'memory':
+        return MemoryViewCacheBackend(app.config.get('VIEW_CACHE_MAX_ENTRIES', 10000))
+
+    if backend == 'redis':
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("VIEW_CACHE_BACKEND=redis requires the redis package")
+        return RedisViewCacheBackend(redis.Redis.from_url(app.config.get('VIEW_CACHE_STORAGE_URI') or 'redis://localhost:6379/0'))
+
+    raise ValueError(f"Unknown view cache backend: {backend}")
+
+# Global cache instance; caching stays off until init_view_cache sets a TTL
+view_cache = ViewCache(MemoryViewCacheBackend(), ttl=0)
+
+def invalidate_user_views(user_pk):
+    """Drop a user's cached views once the current transaction commits"""
+    view_cache.invalidate_on_commit(user_pk)
+
+def _row_changed(mapper, connection, target):
+    view_cache.invalidate_on_commit(target.user_id, object_session(target))
+
+def init_view_cache(app):
+    """Initialize the view cache; VIEW_CACHE_TTL (seconds) of 0 disables it"""
+    view_cache.backend = create_backend(app)
+    view_cache.ttl = app.config.get('VIEW_CACHE_TTL', 30)
+
+    event.listen(Session, 'after_commit', view_cache._committed)
+    event.listen(Session, 'after_rollback', view_cache._rolled_back)
+
+    # Rows the cached views are built from
+    for model in (Domain, AnalysisReport, Subscription):
+        for name in ('after_insert', 'after_update', 'after_delete'):
+            event.listen(model, name, _row_changed)
+
+    # Profile and credit changes, including the bulk credit UPDATEs
+    user_changed.connect(invalidate_user_views, weak=False)
+
+    return view_cache
+
+def get_view_cache():
+    """Get the global view cache instance"""
+    return view_cache
@@ -0,0 +1,116 @@
+import threading
+import time
+from queue import Queue, Empty
+import logging
+
+from src.models.user import db
+from src.models.stripe_event import StripeWebhookEvent
+
+logger = logging.getLogger(__name__)
+
+class WebhookConsumer:
+    """Background consumer for stored Stripe webhook events.
+
+    Events are claimed with a compare-and-set on their status, and a
+    handler's changes are committed in the same transaction that marks the
+    event processed, so each event takes effect exactly once even with
+    several consumers or after a crash. Events queued by other processes,
+    failed events and abandoned claims are picked up by polling.
+    """
+
+    def __init__(self, app, handlers, poll_interval=30):
+        self.app = app
+        self.handlers = handlers
+        self.poll_interval = poll_interval
+        self.event_queue = Queue()
+        self.is_running = False
+        self.consumer_thread = None
+
+    def start(self):
+        """Start the background consumer"""
+        if not self.is_running:
+            self.is_running = True
+            self.consumer_thread = threading.Thread(target=self._consumer_loop, daemon=True)
+            self.consumer_thread.start()
+            logger.info("Webhook consumer started")
+
+    def stop(self):
+        """Stop the background consumer"""
+        self.is_running = False
+        if self.consumer_thread:
+            self.consumer_thread.join()
+        logger.info("Webhook consumer stopped")
+
+    def enqueue(self, event_id):
+        """Queue a stored event for processing"""
+        self.event_queue.put(event_id)
+
+    def _consumer_loop(self):
+        poll = True
+        while self.is_running:
+            try:
+                if poll:
+                    with self.app.app_context():
+                        for event_id in StripeWebhookEvent.pending():
+                            self.event_queue.put(event_id)
+
+                try:
+                    event_id = self.event_queue.get(timeout=self.poll_interval)
+                    poll = False
+                except Empty:
+                    poll = True
+                    continue
+
+                self.process(event_id)
+
+            except Exception as e:
+                logger.error(f"Webhook consumer error: {str(e)}")
+                poll = True
+                time.sleep(self.poll_interval)
+
+    def process(self, event_id):
+        """Process one stored event if it is due, returning True once it has been processed"""
+        with self.app.app_context():
+            event = StripeWebhookEvent.claim(event_id)
+            if not event:
+                return False
+
+            attempt = event.attempts
+            event_type = event.type
+            try:
+                handler = self.handlers.get(event_type)
+                if handler:
+                    handler(event.get_payload())
+
+                if not StripeWebhookEvent.finish(event_id, attempt):
+                    db.session.rollback()
+                    logger.warning(f"Lost the claim on webhook event {event_id}; discarding its changes")
+                    return False
+
+                db.session.commit()
+                logger.info(f"Processed webhook event {event_id} ({event_type})")
+                return True
+
+            except Exception as e:
+                db.session.rollback()
+                logger.error(f"Webhook event {event_id} failed (attempt {attempt}): {str(e)}")
+                try:
+                    StripeWebhookEvent.fail(event_id, attempt, str(e))
+                    db.session.commit()
+                except Exception:
+                    db.session.rollback()
+                return False
+
+# Global consumer instance
+webhook_consumer = None
+
+def init_webhook_consumer(app, handlers):
+    """Initialize the webhook consumer with handlers by Stripe event type"""
+    global webhook_consumer
+    webhook_consumer = WebhookConsumer(app, handlers)
+    webhook_consumer.start()
+    return webhook_consumer
+
+def get_webhook_consumer():
+    """Get the global webhook consumer"""
+    return webhook_consumer